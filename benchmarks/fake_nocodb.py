@@ -0,0 +1,723 @@
+"""
+Локальная замена NocoDB для тестов и нагрузочных прогонов без живой базы.
+
+Повторяет ту часть API v2 (/api/v2/tables/{id}/...), которой пользуется nocodb_client:
+  * GET records: where (eq/neq/is/gt/ge/lt/le/like/nlike/in/blank/notblank, ~and/~or/~not и скобки),
+    sort ("-поле,поле"), fields, limit/offset и pageInfo;
+  * POST/PATCH/DELETE records — одной записью или списком (bulk);
+  * GET/POST/DELETE links/{поле}/records/{id} — связь Progress -> Lessons (Completed_Lessons);
+  * искусственная задержка, доля ошибок 500 и "зависаний" (для проверки таймаутов).
+
+Данные генерируются детерминированно по seed: брони, мероприятия, абонементы,
+клиенты, участники конкурса, уроки и прогресс.
+
+Запуск из корня репозитория:
+    python benchmarks/fake_nocodb.py --port 8090 --latency-ms 40 --jitter-ms 20 --error-rate 0.01
+и затем API с NOCODB_URL=http://127.0.0.1:8090 NOCODB_API_TOKEN=fake.
+
+Служебные эндпоинты: GET /__fake/stats (счётчики вызовов), POST /__fake/reset,
+PATCH /__fake/config (задержка и ошибки на лету).
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import re
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# nocodb_client читает настройки при импорте; самой замене они не нужны
+os.environ.setdefault("NOCODB_URL", "http://127.0.0.1:8090")
+os.environ.setdefault("NOCODB_API_TOKEN", "fake")
+
+from fastapi import Body, FastAPI, Request
+from fastapi.responses import JSONResponse
+
+import booking_logic
+import metrics
+import nocodb_client
+from config import settings
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 1000
+
+
+class FilterError(ValueError):
+    pass
+
+
+# --- Разбор where ---
+
+def _text(value) -> str:
+    """Значение поля так, как его сравнивает NocoDB со строкой из фильтра."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _is_blank(value) -> bool:
+    return value is None or value == "" or value == []
+
+
+def _ordered(value, target: str):
+    """Пара для сравнения: числа как числа, остальное как строки."""
+    try:
+        return float(value), float(target)
+    except (TypeError, ValueError):
+        return _text(value), target
+
+
+def _like(pattern: str):
+    if "%" not in pattern:
+        pattern = f"%{pattern}%"
+    regex = re.compile("^" + ".*".join(re.escape(part) for part in pattern.split("%")) + "$", re.IGNORECASE | re.DOTALL)
+    return lambda value: regex.match(_text(value)) is not None
+
+
+def _compile_condition(field: str, op: str, value: str | None):
+    value = value or ""
+    if op == "eq":
+        return lambda record: _text(record.get(field)) == value
+    if op == "neq":
+        return lambda record: _text(record.get(field)) != value
+    if op in ("gt", "ge", "gte", "lt", "le", "lte"):
+        compare = {
+            "gt": lambda a, b: a > b, "ge": lambda a, b: a >= b, "gte": lambda a, b: a >= b,
+            "lt": lambda a, b: a < b, "le": lambda a, b: a <= b, "lte": lambda a, b: a <= b,
+        }[op]
+
+        def ordered(record):
+            current = record.get(field)
+            if _is_blank(current):
+                return False
+            try:
+                return compare(*_ordered(current, value))
+            except TypeError:
+                return False
+        return ordered
+    if op in ("like", "nlike"):
+        matches = _like(value)
+        return (lambda record: matches(record.get(field))) if op == "like" else (lambda record: not matches(record.get(field)))
+    if op == "in":
+        options = {option.strip() for option in value.split(",")}
+        return lambda record: _text(record.get(field)) in options
+    if op in ("blank", "empty", "null"):
+        return lambda record: _is_blank(record.get(field))
+    if op in ("notblank", "notempty", "notnull"):
+        return lambda record: not _is_blank(record.get(field))
+    if op in ("is", "isnot"):
+        kind = value.lower()
+        checks = {
+            "true": lambda v: v is True or _text(v).lower() in ("true", "1"),
+            "checked": lambda v: v is True or _text(v).lower() in ("true", "1"),
+            "false": lambda v: not v,
+            "notchecked": lambda v: not v,
+            "null": lambda v: v is None,
+            "notnull": lambda v: v is not None,
+            "blank": _is_blank,
+            "empty": _is_blank,
+            "notblank": lambda v: not _is_blank(v),
+            "notempty": lambda v: not _is_blank(v),
+        }
+        if kind not in checks:
+            raise FilterError(f"'{value}' is not supported for '{op}'")
+        check = checks[kind]
+        if op == "is":
+            return lambda record: check(record.get(field))
+        return lambda record: not check(record.get(field))
+    raise FilterError(f"'{op}' is not supported")
+
+
+class WhereParser:
+    """
+    (поле,оп,значение) с ~and/~or/~not и вложенными скобками.
+    ~and связывает сильнее ~or, как в обычной логике.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+
+    def parse(self):
+        predicate = self._or()
+        if self.pos != len(self.text):
+            raise FilterError(f"unexpected '{self.text[self.pos:]}'")
+        return predicate
+
+    def _take(self, token: str) -> bool:
+        if self.text.startswith(token, self.pos):
+            self.pos += len(token)
+            return True
+        return False
+
+    def _or(self):
+        left = self._and()
+        while self._take("~or"):
+            right = self._and()
+            left = (lambda a, b: lambda record: a(record) or b(record))(left, right)
+        return left
+
+    def _and(self):
+        left = self._not()
+        while self._take("~and"):
+            right = self._not()
+            left = (lambda a, b: lambda record: a(record) and b(record))(left, right)
+        return left
+
+    def _not(self):
+        if self._take("~not"):
+            inner = self._not()
+            return lambda record: not inner(record)
+        return self._term()
+
+    def _term(self):
+        if not self._take("("):
+            raise FilterError(f"expected '(' at {self.pos}")
+        if self.text.startswith(("(", "~not"), self.pos):
+            predicate = self._or()
+            if not self._take(")"):
+                raise FilterError(f"expected ')' at {self.pos}")
+            return predicate
+        end = self.text.find(")", self.pos)
+        if end < 0:
+            raise FilterError("unclosed '('")
+        parts = self.text[self.pos:end].split(",", 2)
+        self.pos = end + 1
+        if len(parts) < 2:
+            raise FilterError(f"bad condition '{','.join(parts)}'")
+        return _compile_condition(parts[0].strip(), parts[1].strip(), parts[2] if len(parts) > 2 else None)
+
+
+def compile_where(where: str | None):
+    if not where:
+        return lambda record: True
+    return WhereParser(where).parse()
+
+
+def _sort_key(field: str):
+    # Пустые значения — в конце при любом направлении, как в NocoDB
+    def key(record):
+        value = record.get(field)
+        if _is_blank(value):
+            return (1, 0, "")
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return (0, 0, value)
+        return (0, 1, _text(value))
+    return key
+
+
+def apply_sort(records: list, sort: str | None) -> list:
+    if not sort:
+        return records
+    # Стабильная сортировка с последнего ключа к первому
+    for field in reversed([part.strip() for part in sort.split(",") if part.strip()]):
+        descending = field.startswith("-")
+        field = field.lstrip("-+")
+        blanks = [r for r in records if _is_blank(r.get(field))]
+        filled = sorted((r for r in records if not _is_blank(r.get(field))), key=_sort_key(field), reverse=descending)
+        records = filled + blanks
+    return records
+
+
+# --- Хранилище ---
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S+00:00")
+
+
+class LinkField:
+    """Связь "многие ко многим": поле field_name таблицы table_id ссылается на записи target_table_id."""
+    __slots__ = ("table_id", "field_name", "target_table_id", "display_fields")
+
+    def __init__(self, table_id: str, field_name: str, target_table_id: str, display_fields: tuple[str, ...]):
+        self.table_id = table_id
+        self.field_name = field_name
+        self.target_table_id = target_table_id
+        self.display_fields = display_fields
+
+
+class FakeNocoDB:
+    """Таблицы в памяти: table_id -> {Id: запись}. Связанные записи встраиваются в выдачу списком."""
+
+    def __init__(self, links: dict[str, LinkField] | None = None):
+        self.tables: dict[str, dict[int, dict]] = {}
+        self.next_ids: dict[str, int] = {}
+        self.links = links if links is not None else default_links()
+        # (id поля-связи, Id записи) -> Id связанных записей
+        self.linked: dict[tuple[str, int], list[int]] = {}
+
+    def table(self, table_id: str) -> dict[int, dict]:
+        if table_id not in self.tables:
+            raise KeyError(table_id)
+        return self.tables[table_id]
+
+    def ensure_table(self, table_id: str) -> None:
+        self.tables.setdefault(table_id, {})
+        self.next_ids.setdefault(table_id, 1)
+
+    def insert(self, table_id: str, fields: dict) -> dict:
+        self.ensure_table(table_id)
+        record_id = self.next_ids[table_id]
+        self.next_ids[table_id] += 1
+        now = _now()
+        record = {**fields, "Id": record_id, "CreatedAt": now, "UpdatedAt": now}
+        self.tables[table_id][record_id] = record
+        return record
+
+    def update(self, table_id: str, fields: dict) -> dict | None:
+        record = self.table(table_id).get(_int_id(fields.get("Id")))
+        if record is None:
+            return None
+        record.update({key: value for key, value in fields.items() if key != "Id"})
+        record["UpdatedAt"] = _now()
+        return record
+
+    def delete(self, table_id: str, record_id) -> bool:
+        record_id = _int_id(record_id)
+        if self.table(table_id).pop(record_id, None) is None:
+            return False
+        for (link_id, owner_id) in [key for key in self.linked if key[1] == record_id]:
+            if self.links[link_id].table_id == table_id:
+                del self.linked[(link_id, owner_id)]
+        return True
+
+    def link(self, link_id: str, record_id, target_ids: list) -> None:
+        targets = self.linked.setdefault((link_id, _int_id(record_id)), [])
+        for target_id in map(_int_id, target_ids):
+            if target_id not in targets:
+                targets.append(target_id)
+
+    def unlink(self, link_id: str, record_id, target_ids: list) -> None:
+        targets = self.linked.get((link_id, _int_id(record_id)), [])
+        for target_id in map(_int_id, target_ids):
+            if target_id in targets:
+                targets.remove(target_id)
+
+    def linked_records(self, link_id: str, record_id) -> list[dict]:
+        link = self.links[link_id]
+        target_table = self.tables.get(link.target_table_id, {})
+        records = []
+        for target_id in self.linked.get((link_id, _int_id(record_id)), []):
+            target = target_table.get(target_id)
+            if target is not None:
+                records.append({name: target.get(name) for name in ("Id", *link.display_fields)})
+        return records
+
+    def render(self, table_id: str, record: dict) -> dict:
+        """Запись для выдачи: копия со встроенными связанными записями."""
+        rendered = dict(record)
+        for link_id, link in self.links.items():
+            if link.table_id == table_id:
+                rendered[link.field_name] = self.linked_records(link_id, record["Id"])
+        return rendered
+
+    def select(self, table_id: str, where: str | None = None, sort: str | None = None) -> list[dict]:
+        predicate = compile_where(where)
+        records = [self.render(table_id, record) for record in self.table(table_id).values()]
+        return apply_sort([record for record in records if predicate(record)], sort)
+
+
+def _int_id(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+
+def default_links() -> dict[str, LinkField]:
+    return {
+        nocodb_client.COMPLETED_LESSONS_LINK_ID: LinkField(
+            nocodb_client.PROGRESS_TABLE_ID, "Completed_Lessons", nocodb_client.LESSONS_TABLE_ID, ("Slug", "Title")
+        ),
+    }
+
+
+# --- Генераторы данных ---
+
+ALL_TABLES = (
+    nocodb_client.BOOKINGS_TABLE_ID,
+    nocodb_client.EVENTS_TABLE_ID,
+    nocodb_client.ABONEMENTS_TABLE_ID,
+    nocodb_client.CLIENTS_TABLE_ID,
+    nocodb_client.FIRING_CONTEST_TABLE_ID,
+    nocodb_client.LESSONS_TABLE_ID,
+    nocodb_client.PROGRESS_TABLE_ID,
+)
+
+ACTIVITIES = ("Лепка", "Роспись", "Гончарный круг", "Глазуровка", "")
+EVENT_TITLES = ("Мастер-класс", "Закрытое мероприятие", "Обжиг", "Лекция")
+
+
+def user_ids(count: int, first: int = 100000) -> list[str]:
+    return [str(first + i) for i in range(count)]
+
+
+def _hhmm(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}:00"
+
+
+def generate_bookings(rng: random.Random, users: list[str], dates: list[str], per_day: tuple[int, int] = (0, 6)) -> list[dict]:
+    step = settings.TIME_STEP_MINUTES
+    open_minute = settings.WORKSHOP_OPEN_HOUR * 60
+    close_minute = settings.WORKSHOP_CLOSE_HOUR * 60
+    bookings = []
+    for date_str in dates:
+        for _ in range(rng.randint(*per_day)):
+            duration = rng.choice((60, 90, 120, 180))
+            latest_start = close_minute - duration
+            if latest_start < open_minute:
+                continue
+            start = open_minute + rng.randrange(0, (latest_start - open_minute) // step + 1) * step
+            user = rng.choice(users)
+            bookings.append({
+                "Telegram": f"@user{user}",
+                "Дата посещения": date_str,
+                "Время начала": _hhmm(start),
+                "Время конца": _hhmm(start + duration),
+                "Оборудование": booking_logic.POTTERY_WHEEL_NAME if rng.random() < 0.3 else None,
+                "Что будет делать": rng.choice(ACTIVITIES),
+                "Telegram ID": user,
+            })
+    return bookings
+
+
+def generate_events(rng: random.Random, dates: list[str], share: float = 0.15) -> list[dict]:
+    events = []
+    for date_str in dates:
+        if rng.random() >= share:
+            continue
+        start_hour = rng.randint(settings.WORKSHOP_OPEN_HOUR, settings.WORKSHOP_CLOSE_HOUR - 2)
+        events.append({
+            "Название": rng.choice(EVENT_TITLES),
+            "Дата": date_str,
+            "Начало": f"{start_hour:02d}:00:00",
+            "Конец": f"{start_hour + rng.choice((1, 2)):02d}:00:00",
+            "Занять мастерскую?": rng.random() < 0.7,
+        })
+    return events
+
+
+def generate_abonements(rng: random.Random, users: list[str], share: float = 0.9) -> list[dict]:
+    today = datetime.date.today()
+    abonements = []
+    for user in users:
+        if rng.random() >= share:
+            continue
+        days_left = rng.randint(3, 60)
+        abonements.append({
+            "Telegram ID": user,
+            "Тип": rng.choice(("4 занятия", "8 занятий", "Безлимит")),
+            "Дата окончания": (today + datetime.timedelta(days=days_left)).strftime("%d.%m.%Y"),
+            "Осталось дней": days_left,
+        })
+    return abonements
+
+
+def generate_members(rng: random.Random, users: list[str], share: float) -> list[dict]:
+    return [{"Telegram ID": user} for user in users if rng.random() < share]
+
+
+def generate_lessons(count: int = 12, blocks: int = 3) -> list[dict]:
+    per_block = max(1, -(-count // blocks))
+    return [
+        {
+            "Title": f"Урок {i + 1}",
+            "Slug": f"lesson-{i + 1}",
+            "Block ID": str(i // per_block + 1),
+            "Sort Order": i + 1,
+        }
+        for i in range(count)
+    ]
+
+
+def seed(
+    db: FakeNocoDB,
+    seed_value: int = 0,
+    users: int = 200,
+    days: int = 30,
+    lessons: int = 12,
+    blocks: int = 3,
+    bookings_per_day: tuple[int, int] = (0, 6),
+) -> FakeNocoDB:
+    """Заполняет базу синтетическими данными (одинаковыми при одинаковом seed_value)."""
+    rng = random.Random(seed_value)
+    ids = user_ids(users)
+    today = datetime.date.today()
+    dates = [(today + datetime.timedelta(days=i)).strftime("%d.%m.%Y") for i in range(-3, days)]
+
+    for table_id in ALL_TABLES:
+        db.ensure_table(table_id)
+    for record in generate_bookings(rng, ids, dates, bookings_per_day):
+        db.insert(nocodb_client.BOOKINGS_TABLE_ID, record)
+    for record in generate_events(rng, dates):
+        db.insert(nocodb_client.EVENTS_TABLE_ID, record)
+    for record in generate_abonements(rng, ids):
+        db.insert(nocodb_client.ABONEMENTS_TABLE_ID, record)
+    for record in generate_members(rng, ids, 0.5):
+        db.insert(nocodb_client.CLIENTS_TABLE_ID, record)
+    for record in generate_members(rng, ids, 0.1):
+        db.insert(nocodb_client.FIRING_CONTEST_TABLE_ID, record)
+    lesson_records = [db.insert(nocodb_client.LESSONS_TABLE_ID, record) for record in generate_lessons(lessons, blocks)]
+
+    # Треть учеников уже проходит курс
+    for user in ids:
+        if rng.random() >= 0.3:
+            continue
+        progress = db.insert(nocodb_client.PROGRESS_TABLE_ID, {"Telegram ID": user, "Access Blocks": "1"})
+        done = rng.randint(0, min(4, len(lesson_records)))
+        db.link(nocodb_client.COMPLETED_LESSONS_LINK_ID, progress["Id"], [lesson["Id"] for lesson in lesson_records[:done]])
+    return db
+
+
+# --- HTTP ---
+
+class Faults:
+    """Искусственные задержки и ошибки. Меняются на лету через PATCH /__fake/config."""
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        stall_rate: float = 0.0,
+        stall_seconds: float = 30.0,
+        seed_value: int = 0,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.rng = random.Random(seed_value)
+
+    def as_dict(self) -> dict:
+        return {
+            "latency_ms": self.latency_ms,
+            "jitter_ms": self.jitter_ms,
+            "error_rate": self.error_rate,
+            "stall_rate": self.stall_rate,
+            "stall_seconds": self.stall_seconds,
+        }
+
+    def delay(self) -> float:
+        jitter = self.rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+
+_TABLE_PATH_RE = re.compile(r"^/api/v2/tables/([^/]+)/(records|links)")
+
+
+def _error(status_code: int, message: str) -> JSONResponse:
+    return JSONResponse({"msg": message}, status_code=status_code)
+
+
+def create_app(db: FakeNocoDB | None = None, faults: Faults | None = None, token: str | None = None) -> FastAPI:
+    """ASGI-приложение замены. token=None — заголовок xc-token не проверяется."""
+    db = db if db is not None else seed(FakeNocoDB())
+    faults = faults or Faults()
+    calls: Counter = Counter()
+    table_names = dict(metrics.TABLE_NAMES)
+
+    app = FastAPI(title="Fake NocoDB", docs_url=None, redoc_url=None)
+    app.state.db = db
+    app.state.faults = faults
+    app.state.calls = calls
+
+    @app.middleware("http")
+    async def emulate_network(request: Request, call_next):
+        match = _TABLE_PATH_RE.match(request.url.path)
+        if match is None:
+            return await call_next(request)
+        if token is not None and request.headers.get("xc-token") != token:
+            return _error(401, "Authentication required")
+
+        calls[(request.method, table_names.get(match.group(1), match.group(1)), match.group(2))] += 1
+        delay = faults.delay()
+        if faults.stall_rate and faults.rng.random() < faults.stall_rate:
+            delay = max(delay, faults.stall_seconds)
+        if delay:
+            await asyncio.sleep(delay)
+        if faults.error_rate and faults.rng.random() < faults.error_rate:
+            return _error(500, "Injected error")
+        return await call_next(request)
+
+    def page(records: list, limit: int | None, offset: int | None, fields: str | None) -> dict:
+        limit = min(max(1, limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE)
+        offset = max(0, offset or 0)
+        chunk = records[offset:offset + limit]
+        if fields:
+            names = [name.strip() for name in fields.split(",") if name.strip()]
+            chunk = [{name: record.get(name) for name in names if name in record} for record in chunk]
+        return {
+            "list": chunk,
+            "pageInfo": {
+                "totalRows": len(records),
+                "page": offset // limit + 1,
+                "pageSize": limit,
+                "isFirstPage": offset == 0,
+                "isLastPage": offset + limit >= len(records),
+            },
+        }
+
+    @app.get("/api/v2/tables/{table_id}/records")
+    async def list_records(
+        table_id: str,
+        where: str | None = None,
+        sort: str | None = None,
+        fields: str | None = None,
+        limit: int | None = None,
+        offset: int | None = None,
+    ):
+        try:
+            records = db.select(table_id, where, sort)
+        except KeyError:
+            return _error(404, f"Table '{table_id}' not found")
+        except FilterError as e:
+            return _error(400, f"Invalid where: {e}")
+        return page(records, limit, offset, fields)
+
+    @app.get("/api/v2/tables/{table_id}/records/count")
+    async def count_records(table_id: str, where: str | None = None):
+        try:
+            return {"count": len(db.select(table_id, where))}
+        except KeyError:
+            return _error(404, f"Table '{table_id}' not found")
+        except FilterError as e:
+            return _error(400, f"Invalid where: {e}")
+
+    @app.get("/api/v2/tables/{table_id}/records/{record_id}")
+    async def read_record(table_id: str, record_id: int):
+        try:
+            record = db.table(table_id).get(record_id)
+        except KeyError:
+            return _error(404, f"Table '{table_id}' not found")
+        if record is None:
+            return _error(404, f"Record '{record_id}' not found")
+        return db.render(table_id, record)
+
+    @app.post("/api/v2/tables/{table_id}/records")
+    async def create_records(table_id: str, payload: dict | list = Body(...)):
+        if table_id not in db.tables:
+            return _error(404, f"Table '{table_id}' not found")
+        if isinstance(payload, list):
+            return [{"Id": db.insert(table_id, fields)["Id"]} for fields in payload]
+        return {"Id": db.insert(table_id, payload)["Id"]}
+
+    @app.patch("/api/v2/tables/{table_id}/records")
+    async def update_records(table_id: str, payload: dict | list = Body(...)):
+        if table_id not in db.tables:
+            return _error(404, f"Table '{table_id}' not found")
+        items = payload if isinstance(payload, list) else [payload]
+        if any(db.table(table_id).get(_int_id(item.get("Id"))) is None for item in items):
+            return _error(404, "Record not found")
+        updated = [{"Id": db.update(table_id, item)["Id"]} for item in items]
+        return updated if isinstance(payload, list) else updated[0]
+
+    @app.delete("/api/v2/tables/{table_id}/records")
+    async def delete_records(table_id: str, payload: dict | list = Body(...)):
+        if table_id not in db.tables:
+            return _error(404, f"Table '{table_id}' not found")
+        items = payload if isinstance(payload, list) else [payload]
+        if any(db.table(table_id).get(_int_id(item.get("Id"))) is None for item in items):
+            return _error(404, "Record not found")
+        for item in items:
+            db.delete(table_id, item.get("Id"))
+        deleted = [{"Id": item.get("Id")} for item in items]
+        return deleted if isinstance(payload, list) else deleted[0]
+
+    def check_link(table_id: str, link_id: str, record_id: int) -> JSONResponse | None:
+        link = db.links.get(link_id)
+        if link is None or link.table_id != table_id:
+            return _error(404, f"Field '{link_id}' not found")
+        if db.tables.get(table_id, {}).get(record_id) is None:
+            return _error(404, f"Record '{record_id}' not found")
+        return None
+
+    @app.get("/api/v2/tables/{table_id}/links/{link_id}/records/{record_id}")
+    async def list_links(table_id: str, link_id: str, record_id: int, limit: int | None = None, offset: int | None = None):
+        error = check_link(table_id, link_id, record_id)
+        if error is not None:
+            return error
+        return page(db.linked_records(link_id, record_id), limit, offset, None)
+
+    @app.post("/api/v2/tables/{table_id}/links/{link_id}/records/{record_id}")
+    async def add_links(table_id: str, link_id: str, record_id: int, payload: list | dict = Body(...)):
+        error = check_link(table_id, link_id, record_id)
+        if error is not None:
+            return error
+        items = payload if isinstance(payload, list) else [payload]
+        db.link(link_id, record_id, [item.get("Id") for item in items])
+        db.tables[table_id][record_id]["UpdatedAt"] = _now()
+        return True
+
+    @app.delete("/api/v2/tables/{table_id}/links/{link_id}/records/{record_id}")
+    async def remove_links(table_id: str, link_id: str, record_id: int, payload: list | dict = Body(...)):
+        error = check_link(table_id, link_id, record_id)
+        if error is not None:
+            return error
+        items = payload if isinstance(payload, list) else [payload]
+        db.unlink(link_id, record_id, [item.get("Id") for item in items])
+        db.tables[table_id][record_id]["UpdatedAt"] = _now()
+        return True
+
+    # --- Служебные эндпоинты ---
+
+    @app.get("/__fake/stats")
+    async def stats():
+        return {
+            "total": sum(calls.values()),
+            "calls": [
+                {"method": method, "table": table, "kind": kind, "count": count}
+                for (method, table, kind), count in sorted(calls.items())
+            ],
+            "rows": {table_names.get(table_id, table_id): len(records) for table_id, records in db.tables.items()},
+            "faults": faults.as_dict(),
+        }
+
+    @app.post("/__fake/reset")
+    async def reset_stats():
+        calls.clear()
+        return {"status": "ok"}
+
+    @app.patch("/__fake/config")
+    async def configure(payload: dict = Body(...)):
+        for key, value in payload.items():
+            if key in faults.as_dict():
+                setattr(faults, key, float(value))
+        return faults.as_dict()
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Локальная замена NocoDB API v2")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--seed", type=int, default=0, help="seed генератора данных и ошибок")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--days", type=int, default=30, help="на сколько дней вперёд генерировать брони")
+    parser.add_argument("--lessons", type=int, default=12)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="средняя задержка ответа")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="разброс задержки (+-)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 500")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="доля запросов, которые 'зависают'")
+    parser.add_argument("--stall-seconds", type=float, default=30.0)
+    parser.add_argument("--token", default=None, help="требовать этот xc-token")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    db = seed(FakeNocoDB(), seed_value=args.seed, users=args.users, days=args.days, lessons=args.lessons)
+    faults = Faults(args.latency_ms, args.jitter_ms, args.error_rate, args.stall_rate, args.stall_seconds, args.seed)
+    print(f"NOCODB_URL=http://{args.host}:{args.port}")
+    uvicorn.run(create_app(db, faults, args.token), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Сравнение сериализации ответов API: как было (jsonable_encoder + стандартный JSONResponse,
+без сжатия) и как стало (модель ответа + FastJSONResponse + GZipMiddleware).
+Колонка "экранир." — размер того же ответа с ASCII-экранированием кириллицы (json.dumps по умолчанию).
+
+Запуск из корня репозитория:
+    NOCODB_URL=http://x NOCODB_API_TOKEN=t python benchmarks/json_bench.py
+"""
+import gzip
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import course_logic
+import schemas
+from config import settings
+from fast_json import FastJSONResponse, orjson
+
+ROUNDS = 2000
+
+
+def daily_bookings_payload() -> tuple[dict, type]:
+    lines = []
+    for i in range(1, 17):
+        line = f"{i}. @гость_{i}: 1{i % 10}:00 — 1{i % 10}:30 (📍 Гончарный круг)"
+        line += "\n► Леплю тарелки и кружки, буду покрывать глазурью"
+        lines.append(line)
+    return {"result": "\n\n".join(lines)}, schemas.TextResult
+
+
+def timeline_payload() -> tuple[dict, type]:
+    lessons = [
+        {"Id": i, "Slug": f"lesson-{i}", "Title": f"Урок {i}: Центровка глины и вытягивание стенок", "Block ID": str(i // 8 + 1)}
+        for i in range(1, 41)
+    ]
+    timeline = course_logic.build_timeline(lessons, ["1", "2", "3", "4", "5"], {f"lesson-{i}" for i in range(1, 12)})
+    return {"status": "success", "timeline": timeline, "user_name": "123456789"}, schemas.CourseTimelineResult
+
+
+def calendar_payload() -> tuple[dict, type]:
+    days = [{"date": f"{day:02d}.11.2026", "free_slots": day % 13} for day in range(1, 31)]
+    text = "\n".join(f"{'✅' if d['free_slots'] else '❌'} {d['date']} (Пн): {d['free_slots']}" for d in days)
+    return {"result": text, "days": days}, schemas.CalendarResult
+
+
+def before(content: dict, model: type) -> bytes:
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def after(content: dict, model: type) -> bytes:
+    serialized = model.model_validate(content).model_dump(mode="json", exclude_unset=True)
+    return FastJSONResponse(serialized).body
+
+
+def main() -> None:
+    print(f"orjson: {'да' if orjson is not None else 'нет (stdlib json)'}; повторов: {ROUNDS}\n")
+    header = f"{'ответ':<16}{'вариант':<8}{'мкс/ответ':>11}{'байт':>8}{'экранир.':>11}{'на проводе':>12}"
+    print(header)
+    print("-" * len(header))
+    for name, build in (
+        ("daily_bookings", daily_bookings_payload),
+        ("timeline", timeline_payload),
+        ("calendar", calendar_payload),
+    ):
+        content, model = build()
+        escaped = len(json.dumps(content, separators=(",", ":")).encode("ascii"))
+        for label, render, compressed in (("было", before, False), ("стало", after, True)):
+            body = render(content, model)
+            seconds = timeit.timeit(lambda: render(content, model), number=ROUNDS)
+            wire = len(body)
+            if compressed and wire >= settings.GZIP_MINIMUM_SIZE:
+                wire = len(gzip.compress(body, compresslevel=9))
+            print(f"{name:<16}{label:<8}{seconds / ROUNDS * 1e6:>11.1f}{len(body):>8}{escaped:>11}{wire:>12}")
+
+
+if __name__ == "__main__":
+    main()
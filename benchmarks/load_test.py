@@ -0,0 +1,442 @@
+"""
+Нагрузочный прогон API сценариями бота.
+
+Сценарии (сессии):
+  * booking — available_start_times (заодно проверка абонемента) -> check_duration ->
+    POST /bookings -> my_bookings -> cancel_booking;
+  * course  — страница /course/ и timeline -> complete первого доступного урока;
+  * firing  — calculate_firing_cost и firing_quote.
+
+Отчёт: пропускная способность, p50/p95/p99 по эндпоинтам и сценариям, число вызовов NocoDB
+на запрос и на сессию (из заголовка Server-Timing, см. tracing.py) и исходы сценариев.
+Результат сохраняется в JSON; --compare старый.json печатает разницу с прошлым прогоном.
+
+По умолчанию всё работает в одном процессе без сокетов: API и замена NocoDB
+(fake_nocodb.py) подключаются через httpx.ASGITransport. С --target http://host:port
+нагружается уже запущенный API (его NOCODB_URL должен смотреть на fake_nocodb;
+--fake-url тогда даёт общий счётчик вызовов NocoDB).
+
+Запуск из корня репозитория:
+    python benchmarks/load_test.py --sessions 500 --concurrency 20 --latency-ms 30 --output results.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+import fake_nocodb  # настраивает sys.path и переменные окружения для модулей API
+
+import firing_logic
+
+SERVER_TIMING_CALLS_RE = re.compile(r'nocodb;dur=([\d.]+);desc="(\d+) calls"')
+MY_BOOKING_LINE_RE = re.compile(r"^(\d+)\. (\d{2}\.\d{2}\.\d{4}): (\d{2}:\d{2})", re.MULTILINE)
+DEFAULT_MIX = "booking=0.6,course=0.25,firing=0.15"
+
+
+class Recorder:
+    """Замеры запросов: эндпоинт -> длительности, ошибки и вызовы NocoDB."""
+
+    def __init__(self):
+        self.requests: dict[str, dict] = {}
+        self.flows: dict[str, dict] = {}
+        self.outcomes: dict[str, int] = {}
+
+    def request(self, endpoint: str, duration: float, ok: bool, nocodb_calls: int) -> None:
+        entry = self.requests.setdefault(endpoint, {"durations": [], "errors": 0, "nocodb_calls": 0})
+        entry["durations"].append(duration)
+        entry["nocodb_calls"] += nocodb_calls
+        if not ok:
+            entry["errors"] += 1
+
+    def flow(self, name: str, duration: float, nocodb_calls: int, outcome: str) -> None:
+        entry = self.flows.setdefault(name, {"durations": [], "nocodb_calls": 0})
+        entry["durations"].append(duration)
+        entry["nocodb_calls"] += nocodb_calls
+        key = f"{name}:{outcome}"
+        self.outcomes[key] = self.outcomes.get(key, 0) + 1
+
+
+class Session:
+    """Один пользователь бота: ходит по API и считает вызовы NocoDB своих запросов."""
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, rng: random.Random, telegram_id: str):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.telegram_id = telegram_id
+        self.nocodb_calls = 0
+
+    async def call(self, method: str, endpoint: str, url: str, **kwargs) -> httpx.Response | None:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.request(f"{method} {endpoint}", time.perf_counter() - started, False, 0)
+            return None
+        duration = time.perf_counter() - started
+        match = SERVER_TIMING_CALLS_RE.search(response.headers.get("server-timing", ""))
+        calls = int(match.group(2)) if match else 0
+        self.nocodb_calls += calls
+        self.recorder.request(f"{method} {endpoint}", duration, response.status_code < 500, calls)
+        return response
+
+    # --- Сценарии ---
+
+    async def booking(self) -> str:
+        date = (datetime.date.today() + datetime.timedelta(days=self.rng.randint(1, 14))).strftime("%d.%m.%Y")
+        response = await self.call(
+            "GET", "/api/v1/available_start_times", "/api/v1/available_start_times",
+            params={"date": date, "telegram_id": self.telegram_id},
+        )
+        if response is None or response.status_code != 200:
+            return "error"
+        times = response.json().get("result", "")
+        if times.startswith("❌"):
+            return "no_abonement" if "абонемент" in times else "no_slots"
+        start_time = self.rng.choice(times.split(","))
+
+        response = await self.call(
+            "GET", "/api/v1/check_duration", "/api/v1/check_duration", params={"date": date, "start_time": start_time}
+        )
+        if response is None or response.status_code != 200:
+            return "error"
+        max_duration = float(response.json().get("result") or 0)
+        if max_duration < 1:
+            return "no_slots"
+
+        response = await self.call("POST", "/api/v1/bookings", "/api/v1/bookings", json={
+            "telegram_id": self.telegram_id,
+            "telegram": f"@user{self.telegram_id}",
+            "fullname": f"Нагрузка {self.telegram_id}",
+            "date": date,
+            "start_time": start_time,
+            "duration_hours": min(max_duration, self.rng.choice((1, 1.5, 2))),
+        })
+        if response is None or response.status_code >= 500:
+            return "error"
+        if response.json().get("status") != "success":
+            return "rejected"
+
+        response = await self.call(
+            "GET", "/api/v1/my_bookings", "/api/v1/my_bookings", params={"telegram_id": self.telegram_id}
+        )
+        if response is None or response.status_code != 200:
+            return "error"
+        number = next(
+            (n for n, d, t in MY_BOOKING_LINE_RE.findall(response.json().get("result", "")) if d == date and t == start_time),
+            None,
+        )
+        if number is None:
+            return "not_listed"
+
+        response = await self.call("POST", "/api/v1/cancel_booking", "/api/v1/cancel_booking", json={
+            "telegram_id": self.telegram_id, "booking_number": number,
+        })
+        if response is None or response.status_code >= 500:
+            return "error"
+        return "booked_and_cancelled" if response.json().get("status") == "success" else "cancel_failed"
+
+    async def course(self) -> str:
+        response = await self.call("GET", "/course/", "/course/", params={"telegram_id": self.telegram_id})
+        if response is None or response.status_code >= 500:
+            return "error"
+        response = await self.call(
+            "GET", "/api/v1/course/timeline", "/api/v1/course/timeline", params={"telegram_id": self.telegram_id}
+        )
+        if response is None or response.status_code != 200:
+            return "error"
+        active = [lesson for lesson in response.json().get("timeline") or [] if lesson.get("status") == "active"]
+        if not active:
+            return "nothing_to_complete"
+        response = await self.call("POST", "/api/v1/course/complete", "/api/v1/course/complete", json={
+            "telegram_id": self.telegram_id, "lesson_slug": active[0]["slug"],
+        })
+        if response is None or response.status_code >= 500:
+            return "error"
+        return "completed" if response.json().get("status") == "success" else "complete_failed"
+
+    def _firing_item(self) -> dict:
+        size = self.rng.choice(list(firing_logic.FIRING_PRICES))
+        return {
+            "quantity": self.rng.randint(1, 5),
+            "size": size,
+            "firing_type": self.rng.choice(list(firing_logic.FIRING_PRICES[size])),
+            "glaze_type": self.rng.choice(firing_logic.GLAZE_TYPES),
+        }
+
+    async def firing(self) -> str:
+        response = await self.call(
+            "POST", "/api/v1/calculate_firing_cost", "/api/v1/calculate_firing_cost",
+            json={"telegram_id": self.telegram_id, **self._firing_item()},
+        )
+        if response is None or response.status_code >= 500:
+            return "error"
+        response = await self.call("POST", "/api/v1/firing_quote", "/api/v1/firing_quote", json={
+            "telegram_id": self.telegram_id,
+            "items": [self._firing_item() for _ in range(self.rng.randint(2, 4))],
+        })
+        if response is None or response.status_code >= 500:
+            return "error"
+        return "quoted"
+
+
+# --- Прогон ---
+
+def parse_mix(text: str) -> list[tuple[str, float]]:
+    mix = []
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ("booking", "course", "firing"):
+            raise ValueError(f"неизвестный сценарий: {name}")
+        mix.append((name.strip(), float(weight or 1)))
+    return mix
+
+
+async def run_sessions(client: httpx.AsyncClient, args, recorder: Recorder, count: int, offset: int) -> None:
+    users = fake_nocodb.user_ids(args.users)
+    names, weights = zip(*parse_mix(args.mix))
+    queue: asyncio.Queue = asyncio.Queue()
+    for index in range(offset, offset + count):
+        queue.put_nowait(index)
+
+    async def worker() -> None:
+        while True:
+            try:
+                index = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            # Выбор сценария и пользователя зависит только от seed и номера сессии
+            rng = random.Random(f"{args.seed}:{index}")
+            flow = rng.choices(names, weights)[0]
+            session = Session(client, recorder, rng, rng.choice(users))
+            started = time.perf_counter()
+            try:
+                outcome = await getattr(session, flow)()
+            except Exception as e:
+                outcome = f"exception:{type(e).__name__}"
+            recorder.flow(flow, time.perf_counter() - started, session.nocodb_calls, outcome)
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Перцентиль по ближайшему рангу."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, round(q / 100 * len(ordered) + 0.5 - 1e-9))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _latency(durations: list[float]) -> dict:
+    return {
+        "count": len(durations),
+        "mean_ms": round(sum(durations) / len(durations) * 1000, 2) if durations else 0.0,
+        "p50_ms": round(percentile(durations, 50) * 1000, 2),
+        "p95_ms": round(percentile(durations, 95) * 1000, 2),
+        "p99_ms": round(percentile(durations, 99) * 1000, 2),
+        "max_ms": round(max(durations) * 1000, 2) if durations else 0.0,
+    }
+
+
+def summarize(recorder: Recorder, elapsed: float, fake_calls: int | None) -> dict:
+    total_requests = sum(len(entry["durations"]) for entry in recorder.requests.values())
+    total_sessions = sum(len(entry["durations"]) for entry in recorder.flows.values())
+    nocodb_calls = sum(entry["nocodb_calls"] for entry in recorder.flows.values())
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "requests": total_requests,
+        "sessions": total_sessions,
+        "requests_per_s": round(total_requests / elapsed, 1) if elapsed else 0.0,
+        "sessions_per_s": round(total_sessions / elapsed, 1) if elapsed else 0.0,
+        "errors": sum(entry["errors"] for entry in recorder.requests.values()),
+        "nocodb_calls_per_session": round(nocodb_calls / total_sessions, 2) if total_sessions else 0.0,
+        # Все вызовы, которые увидела замена NocoDB, включая фоновые задачи API
+        "nocodb_calls_total_fake": fake_calls,
+        "endpoints": {
+            endpoint: {
+                **_latency(entry["durations"]),
+                "errors": entry["errors"],
+                "nocodb_calls_per_request": round(entry["nocodb_calls"] / len(entry["durations"]), 2),
+            }
+            for endpoint, entry in sorted(recorder.requests.items())
+        },
+        "flows": {
+            flow: {
+                **_latency(entry["durations"]),
+                "nocodb_calls_per_session": round(entry["nocodb_calls"] / len(entry["durations"]), 2),
+            }
+            for flow, entry in sorted(recorder.flows.items())
+        },
+        "outcomes": dict(sorted(recorder.outcomes.items())),
+    }
+
+
+async def _fake_total(fake_client: httpx.AsyncClient | None) -> int | None:
+    if fake_client is None:
+        return None
+    try:
+        response = await fake_client.get("/__fake/stats")
+        return response.json()["total"]
+    except (httpx.HTTPError, ValueError, KeyError):
+        return None
+
+
+async def _measure(client: httpx.AsyncClient, fake_client: httpx.AsyncClient | None, args) -> dict:
+    if args.warmup:
+        await run_sessions(client, args, Recorder(), args.warmup, offset=args.sessions)
+    before = await _fake_total(fake_client)
+    recorder = Recorder()
+    started = time.perf_counter()
+    await run_sessions(client, args, recorder, args.sessions, offset=0)
+    elapsed = time.perf_counter() - started
+    after = await _fake_total(fake_client)
+    fake_calls = after - before if before is not None and after is not None else None
+    return summarize(recorder, elapsed, fake_calls)
+
+
+async def run_in_process(args) -> dict:
+    """API и замена NocoDB в этом же процессе, без сокетов."""
+    import main
+    import nocodb_client
+
+    # main настраивает логирование на INFO — на прогоне это только шум
+    logging.getLogger().setLevel(logging.WARNING)
+
+    db = fake_nocodb.seed(fake_nocodb.FakeNocoDB(), seed_value=args.seed, users=args.users, days=args.days)
+    faults = fake_nocodb.Faults(args.latency_ms, args.jitter_ms, args.error_rate, seed_value=args.seed)
+    fake_app = fake_nocodb.create_app(db, faults)
+
+    # Клиент, открытый до lifespan, lifespan уже не пересоздаёт
+    await nocodb_client.open_client(httpx.ASGITransport(fake_app))
+    try:
+        async with main.app.router.lifespan_context(main.app):
+            # Исключение в обработчике — это ответ 500, а не падение сессии
+            transport = httpx.ASGITransport(main.app, raise_app_exceptions=False)
+            async with httpx.AsyncClient(transport=transport, base_url="http://api", timeout=args.timeout) as client, \
+                    httpx.AsyncClient(transport=httpx.ASGITransport(fake_app), base_url="http://fake") as fake_client:
+                return await _measure(client, fake_client, args)
+    finally:
+        await nocodb_client.close_client()
+
+
+async def run_over_http(args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.target, timeout=args.timeout, limits=limits) as client:
+        if args.fake_url:
+            async with httpx.AsyncClient(base_url=args.fake_url, timeout=args.timeout) as fake_client:
+                return await _measure(client, fake_client, args)
+        return await _measure(client, None, args)
+
+
+# --- Отчёт ---
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, timeout=5
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_report(result: dict) -> None:
+    summary = result["summary"]
+    print(
+        f"\nСессий: {summary['sessions']}, запросов: {summary['requests']} за {summary['elapsed_s']} с "
+        f"({summary['requests_per_s']} запр/с, {summary['sessions_per_s']} сессий/с), ошибок: {summary['errors']}"
+    )
+    print(f"Вызовов NocoDB на сессию: {summary['nocodb_calls_per_session']}"
+          + (f" (всего у замены: {summary['nocodb_calls_total_fake']})" if summary["nocodb_calls_total_fake"] is not None else ""))
+    header = f"{'эндпоинт':<40} {'n':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'ош.':>5} {'NocoDB':>7}"
+    print("\n" + header + "\n" + "-" * len(header))
+    for endpoint, stats in summary["endpoints"].items():
+        print(
+            f"{endpoint:<40} {stats['count']:>6} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} "
+            f"{stats['p99_ms']:>8.1f} {stats['errors']:>5} {stats['nocodb_calls_per_request']:>7.2f}"
+        )
+    print()
+    for flow, stats in summary["flows"].items():
+        print(
+            f"сценарий {flow:<31} {stats['count']:>6} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} "
+            f"{stats['p99_ms']:>8.1f} {'':>5} {stats['nocodb_calls_per_session']:>7.2f}"
+        )
+    print("\nИсходы: " + ", ".join(f"{key}={count}" for key, count in summary["outcomes"].items()))
+
+
+def print_comparison(result: dict, baseline: dict) -> None:
+    """Разница p50/p95 и вызовов NocoDB с прошлым прогоном (отрицательная — стало лучше)."""
+    print(f"\nСравнение с {baseline['meta'].get('commit') or 'прошлым прогоном'}:")
+    old_endpoints = baseline["summary"]["endpoints"]
+    for endpoint, stats in result["summary"]["endpoints"].items():
+        old = old_endpoints.get(endpoint)
+        if old is None:
+            continue
+        print(
+            f"{endpoint:<40} p50 {stats['p50_ms'] - old['p50_ms']:+8.1f} мс  p95 {stats['p95_ms'] - old['p95_ms']:+8.1f} мс  "
+            f"NocoDB {stats['nocodb_calls_per_request'] - old['nocodb_calls_per_request']:+.2f}"
+        )
+    old_summary = baseline["summary"]
+    print(
+        f"{'всего':<40} запр/с {result['summary']['requests_per_s'] - old_summary['requests_per_s']:+.1f}  "
+        f"NocoDB на сессию {result['summary']['nocodb_calls_per_session'] - old_summary['nocodb_calls_per_session']:+.2f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон сценариев бота")
+    parser.add_argument("--sessions", type=int, default=300, help="сколько сессий замерять")
+    parser.add_argument("--warmup", type=int, default=20, help="сессий прогрева (не входят в отчёт)")
+    parser.add_argument("--concurrency", type=int, default=10, help="одновременных пользователей")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="доли сценариев, например booking=0.6,course=0.25,firing=0.15")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="задержка замены NocoDB (в процессе)")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=30.0, help="таймаут запроса к API, сек")
+    parser.add_argument("--target", default="asgi", help="asgi (в процессе) или URL запущенного API")
+    parser.add_argument("--fake-url", default=None, help="URL fake_nocodb для счётчика вызовов при --target URL")
+    parser.add_argument("--output", default=None, help="куда сохранить результат (JSON)")
+    parser.add_argument("--compare", default=None, help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    if args.target == "asgi":
+        summary = asyncio.run(run_in_process(args))
+    else:
+        summary = asyncio.run(run_over_http(args))
+
+    result = {
+        "meta": {
+            "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "args": vars(args),
+        },
+        "summary": summary,
+    }
+    print_report(result)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(result, json.load(f))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\nРезультат сохранён в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+
+import booking_logic
+import day_cache
+import nocodb_client
+import shared_state
+import tracing
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# --- Итоги допуска брони ---
+ADMITTED = "admitted"        # Бронь создана
+DUPLICATE = "duplicate"      # У юзера уже есть бронь на это время
+NO_CAPACITY = "no_capacity"  # Места на запрошенную длительность нет
+FAILED = "failed"            # NocoDB не приняла запись или не отдала брони на дату
+REJECTED = "rejected"        # Дата в прошлом или вне абонемента (проверяется до допуска)
+
+
+class AdmissionResult:
+    __slots__ = ("status", "booking_id", "max_duration")
+
+    def __init__(self, status: str, booking_id=None, max_duration: float = 0.0):
+        self.status = status
+        self.booking_id = booking_id
+        self.max_duration = max_duration
+
+
+# --- Очередь на дату ---
+# Дата -> [замок, сколько корутин его держат или ждут]. asyncio.Lock пропускает
+# ожидающих по очереди (FIFO), так что это и есть очередь допуска на дату.
+_date_locks: dict[str, list] = {}
+
+
+@asynccontextmanager
+async def date_lock(date_str: str):
+    """
+    Сериализует допуск броней на одну дату: внутри процесса — очередью asyncio.Lock,
+    между воркерами (SHARED_STATE_ENABLED) — ещё и файловым замком.
+    """
+    entry = _date_locks.setdefault(date_str, [asyncio.Lock(), 0])
+    entry[1] += 1
+    started = time.perf_counter()
+    try:
+        async with AsyncExitStack() as stack:
+            await stack.enter_async_context(entry[0])
+            if shared_state.enabled():
+                await stack.enter_async_context(shared_state.process_lock(f"date-{date_str}"))
+            # Сколько бронь простояла в очереди на дату — видно в трассе запроса
+            tracing.add_span("lock_wait", started, date=date_str)
+            yield
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            del _date_locks[date_str]
+
+
+@asynccontextmanager
+async def date_locks(date_strs: list[str]):
+    """Берёт замки сразу нескольких дат — всегда в одном порядке, чтобы не было взаимоблокировок."""
+    async with AsyncExitStack() as stack:
+        for date_str in sorted(set(date_strs)):
+            await stack.enter_async_context(date_lock(date_str))
+        yield
+
+
+def find_duplicate(bookings: list, telegram_id: str, start_time: str) -> dict | None:
+    """Бронь этого юзера с тем же временем начала среди броней одной даты."""
+    for booking in bookings:
+        if (str(booking.get("Telegram ID")) == str(telegram_id) and
+                (booking.get("Время начала") or "")[:5] == start_time):
+            return booking
+    return None
+
+
+async def admit_booking(record: dict, duration_hours: float) -> AdmissionResult:
+    """
+    Проверяет и создаёт бронь под замком её даты:
+    дубль и вместимость проверяются по одному снимку дня (выборка NocoDB по дате),
+    затем запись. Пока бронь проходит допуск, другие брони на эту дату ждут,
+    поэтому две параллельные заявки не могут занять одно и то же место.
+    """
+    date_str = record["Дата посещения"]
+    start_time = record["Время начала"][:5]
+    telegram_id = record["Telegram ID"]
+
+    async with date_lock(date_str):
+        snapshot = await day_cache.get_snapshot(date_str, max_age=settings.ADMISSION_MAX_SNAPSHOT_AGE_SECONDS)
+        if not snapshot.loaded:
+            # Занятость дня неизвестна — не пишем, иначе можно переполнить мастерскую
+            return AdmissionResult(FAILED)
+
+        if find_duplicate(snapshot.bookings, telegram_id, start_time):
+            return AdmissionResult(DUPLICATE)
+
+        max_duration = booking_logic.get_max_duration(
+            start_time_str=start_time,
+            timeline=snapshot.timeline,
+            equipment_required=record.get("Оборудование")
+        )
+        if duration_hours > max_duration:
+            return AdmissionResult(NO_CAPACITY, max_duration=max_duration)
+
+        new_booking = await nocodb_client.create_booking(record)
+        if not new_booking:
+            return AdmissionResult(FAILED, max_duration=max_duration)
+
+        booking_id = new_booking.get("Id")
+        day_cache.add_booking({**record, "Id": booking_id})
+        return AdmissionResult(ADMITTED, booking_id=booking_id, max_duration=max_duration)
+
+
+async def admit_bookings_bulk(records: list[dict], duration_hours: float) -> list[AdmissionResult]:
+    """
+    Пакетный допуск броней на разные даты (одна бронь на дату).
+    Снимки всех дат берутся одной выборкой за период, каждая дата проверяется
+    отдельно (часть может быть отклонена), а принятые брони пишутся в NocoDB
+    одним bulk-запросом. Результаты возвращаются в порядке records.
+    """
+    date_strs = [record["Дата посещения"] for record in records]
+
+    async with date_locks(date_strs):
+        snapshots = await day_cache.get_snapshots(date_strs, max_age=settings.ADMISSION_MAX_SNAPSHOT_AGE_SECONDS)
+
+        results: list[AdmissionResult] = []
+        accepted: list[int] = []
+        for index, record in enumerate(records):
+            snapshot = snapshots[record["Дата посещения"]]
+            start_time = record["Время начала"][:5]
+
+            if not snapshot.loaded:
+                results.append(AdmissionResult(FAILED))
+                continue
+
+            if find_duplicate(snapshot.bookings, record["Telegram ID"], start_time):
+                results.append(AdmissionResult(DUPLICATE))
+                continue
+
+            max_duration = booking_logic.get_max_duration(
+                start_time_str=start_time,
+                timeline=snapshot.timeline,
+                equipment_required=record.get("Оборудование")
+            )
+            if duration_hours > max_duration:
+                results.append(AdmissionResult(NO_CAPACITY, max_duration=max_duration))
+                continue
+
+            results.append(AdmissionResult(FAILED, max_duration=max_duration))
+            accepted.append(index)
+
+        if not accepted:
+            return results
+
+        created = await nocodb_client.create_bookings_bulk([records[index] for index in accepted])
+        if not created or len(created) != len(accepted):
+            # Часть строк могла записаться (таймаут, неполный ответ) — перечитываем даты,
+            # чтобы повтор запроса не создал дублей
+            await _resolve_unconfirmed(records, accepted, results)
+            return results
+
+        for index, created_record in zip(accepted, created):
+            booking_id = created_record.get("Id")
+            day_cache.add_booking({**records[index], "Id": booking_id})
+            results[index].status = ADMITTED
+            results[index].booking_id = booking_id
+
+        return results
+
+
+async def _resolve_unconfirmed(records: list[dict], accepted: list[int], results: list[AdmissionResult]) -> None:
+    """
+    Bulk-запись не подтвердила все строки: перечитываем их даты из NocoDB и ищем брони
+    по Telegram ID и времени начала. До записи дублей на этих датах не было,
+    поэтому найденная бронь — наша. Ненайденные остаются FAILED.
+    """
+    date_strs = [records[index]["Дата посещения"] for index in accepted]
+    snapshots = await day_cache.get_snapshots(date_strs, max_age=0)
+    for index in accepted:
+        record = records[index]
+        snapshot = snapshots[record["Дата посещения"]]
+        if not snapshot.loaded:
+            continue
+        booking = find_duplicate(snapshot.bookings, record["Telegram ID"], record["Время начала"][:5])
+        if booking is not None:
+            results[index].status = ADMITTED
+            results[index].booking_id = booking.get("Id")
+    confirmed = sum(1 for index in accepted if results[index].status == ADMITTED)
+    logger.warning(f"⚠️ Bulk-запись не подтверждена, после перечитывания найдено {confirmed} из {len(accepted)}")
@@ -1,11 +1,14 @@
 import datetime
+from array import array
 from zoneinfo import ZoneInfo
 
+from config import settings
+
 # --- КОНСТАНТЫ И НАСТРОЙКИ МАСТЕРСКОЙ ---
 
-WORKSHOP_OPEN_HOUR = 10   # Час открытия
-WORKSHOP_CLOSE_HOUR = 22  # Час закрытия
-TIME_STEP_MINUTES = 30    # Шаг для проверки слотов (30 минут)
+WORKSHOP_OPEN_HOUR = settings.WORKSHOP_OPEN_HOUR    # Час открытия
+WORKSHOP_CLOSE_HOUR = settings.WORKSHOP_CLOSE_HOUR  # Час закрытия (24 — работа до полуночи)
+TIME_STEP_MINUTES = settings.TIME_STEP_MINUTES      # Шаг для проверки слотов
 TOTAL_SPOTS = 8           # Всего мест в мастерской
 EVENT_BUFFER_MINUTES = 30 # Буфер по времени до и после мероприятий
 
@@ -14,6 +17,94 @@ POTTERY_WHEEL_NAME = "Гончарный круг"
 
 WORKSHOP_TIMEZONE = ZoneInfo("Asia/Novosibirsk")
 
+MINUTES_IN_DAY = 24 * 60
+
+
+# --- ТАЙМЛАЙН ---
+
+class Timeline:
+    """
+    Нагрузка на рабочий день с шагом TIME_STEP_MINUTES.
+    Слот i начинается в open_minute + i * step (минуты от полуночи).
+    Счётчики хранятся в массивах, по одному элементу на слот.
+    """
+    __slots__ = ("open_minute", "step", "size", "people", "wheels", "events", "_run_lengths")
+
+    def __init__(
+        self,
+        open_hour: int = WORKSHOP_OPEN_HOUR,
+        close_hour: int = WORKSHOP_CLOSE_HOUR,
+        step_minutes: int = TIME_STEP_MINUTES,
+    ):
+        self.open_minute = open_hour * 60
+        self.step = step_minutes
+        self.size = max(0, -(-(close_hour * 60 - self.open_minute) // step_minutes))
+        self.people = array("H", bytes(2 * self.size))   # Сколько людей в слоте
+        self.wheels = array("H", bytes(2 * self.size))   # Сколько гончарных кругов занято
+        self.events = array("H", bytes(2 * self.size))   # Сколько мероприятий блокирует слот
+        self._run_lengths: dict[bool, array] = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def slot_minute(self, index: int) -> int:
+        return self.open_minute + index * self.step
+
+    def slot_label(self, index: int) -> str:
+        """Время начала слота в формате 'HH:MM'."""
+        minute = self.slot_minute(index)
+        return f"{minute // 60:02d}:{minute % 60:02d}"
+
+    def slot_index(self, minute: int) -> int | None:
+        """Индекс слота, который начинается ровно в minute, или None."""
+        offset = minute - self.open_minute
+        if offset < 0 or offset % self.step:
+            return None
+        index = offset // self.step
+        return index if index < self.size else None
+
+    def slot_range(self, start_minute: int, end_minute: int) -> tuple[int, int]:
+        """Полуинтервал индексов [lo, hi) слотов, начало которых попадает в [start, end)."""
+        lo = -(-(start_minute - self.open_minute) // self.step)
+        hi = -(-(end_minute - self.open_minute) // self.step)
+        return max(lo, 0), min(hi, self.size)
+
+    def is_slot_free(self, index: int, equipment_required: str | None = None) -> bool:
+        if self.events[index] or self.people[index] >= TOTAL_SPOTS:
+            return False
+        if equipment_required == POTTERY_WHEEL_NAME:
+            return self.wheels[index] < TOTAL_POTTERY_WHEELS
+        return True
+
+    def apply_booking(self, booking: dict, delta: int = 1) -> None:
+        """
+        Добавляет (delta=1) или убирает (delta=-1) одну бронь прямо в счётчиках,
+        без пересчёта всего дня. Стоит O(слотов брони).
+        """
+        start_minute, end_minute = record_minutes(booking["Время начала"], booking["Время конца"])
+        lo, hi = self.slot_range(start_minute, end_minute)
+        needs_wheel = booking.get("Оборудование") == POTTERY_WHEEL_NAME
+        for index in range(lo, hi):
+            self.people[index] += delta
+            if needs_wheel:
+                self.wheels[index] += delta
+        self._run_lengths.clear()
+
+    def run_lengths(self, equipment_required: str | None = None) -> array:
+        """
+        run[i] — сколько свободных слотов подряд начинается с i (0, если слот занят).
+        Считается одним обратным проходом и запоминается для каждого типа оборудования.
+        """
+        needs_wheel = equipment_required == POTTERY_WHEEL_NAME
+        run = self._run_lengths.get(needs_wheel)
+        if run is None:
+            run = array("H", bytes(2 * (self.size + 1)))
+            for index in range(self.size - 1, -1, -1):
+                if self.is_slot_free(index, equipment_required):
+                    run[index] = run[index + 1] + 1
+            self._run_lengths[needs_wheel] = run
+        return run
+
 
 # --- ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ---
 
@@ -21,128 +112,168 @@ def str_to_time(time_str: str) -> datetime.time:
     """Преобразует строку 'HH:MM:SS' в объект datetime.time."""
     return datetime.datetime.strptime(time_str, "%H:%M:%S").time()
 
-def generate_timeline() -> dict:
+def str_to_minutes(time_str: str) -> int:
+    """Преобразует строку 'HH:MM' или 'HH:MM:SS' в минуты от полуночи."""
+    hours, minutes = time_str.split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+def record_minutes(start_str: str, end_str: str) -> tuple[int, int]:
     """
-    Создает пустой "таймлайн" рабочего дня с шагом в 30 минут.
-    Ключ - время, значение - информация о нагрузке.
+    Начало и конец записи в минутах от полуночи.
+    Конец раньше начала (например, 23:00–01:00) считается следующими сутками.
+    Одинаковые начало и конец — запись нулевой длины, она не занимает ни одного слота.
     """
-    timeline = {}
-    current_time = datetime.datetime.combine(datetime.date.today(), datetime.time(WORKSHOP_OPEN_HOUR))
-    end_time = datetime.datetime.combine(datetime.date.today(), datetime.time(WORKSHOP_CLOSE_HOUR))
+    start_minute = str_to_minutes(start_str)
+    end_minute = str_to_minutes(end_str)
+    if end_minute < start_minute:
+        end_minute += MINUTES_IN_DAY
+    return start_minute, end_minute
 
-    while current_time < end_time:
-        timeline[current_time.time()] = {
-            "people_count": 0,
-            "is_blocked_by_event": False,
-            "pottery_wheels_used": 0
-        }
-        current_time += datetime.timedelta(minutes=TIME_STEP_MINUTES)
-    
-    return timeline
+def generate_timeline() -> Timeline:
+    """Создает пустой "таймлайн" рабочего дня."""
+    return Timeline()
+
+def _apply_prefix_sums(target: array, diff: list) -> None:
+    running = 0
+    for i in range(len(target)):
+        running += diff[i]
+        target[i] = running
 
 # --- ОСНОВНЫЕ ЛОГИЧЕСКИЕ ФУНКЦИИ ---
 
-def calculate_timeline_load(bookings: list, events: list) -> dict:
+def calculate_timeline_load(bookings: list, events: list) -> Timeline:
     """
     Рассчитывает нагрузку на каждый временной слот в течение дня.
+    Каждая запись добавляет +1 в начало своего диапазона слотов и -1 после конца
+    (разностный массив), затем один проход префиксных сумм даёт нагрузку —
+    итого O(слотов + записей).
     
     Args:
         bookings: Список словарей с данными о бронированиях из NocoDB.
         events: Список словарей с данными о мероприятиях из NocoDB.
         
     Returns:
-        Словарь (таймлайн) с рассчитанной нагрузкой на каждый слот.
+        Таймлайн с рассчитанной нагрузкой на каждый слот.
     """
-    timeline = generate_timeline()
+    timeline = Timeline()
+    size = timeline.size
+
+    people_diff = [0] * (size + 1)
+    wheels_diff = [0] * (size + 1)
+    events_diff = [0] * (size + 1)
 
     for event in events:
-        start_time_obj = str_to_time(event["Начало"])
-        end_time_obj = str_to_time(event["Конец"])
-        
-        today = datetime.date.today()
-        start_dt = datetime.datetime.combine(today, start_time_obj)
-        end_dt = datetime.datetime.combine(today, end_time_obj)
-        
-        buffer = datetime.timedelta(minutes=EVENT_BUFFER_MINUTES)
-        
-        buffered_start_time = (start_dt - buffer).time()
-        buffered_end_time = (end_dt + buffer).time()
-        
-        for slot_time in timeline:
-            if buffered_start_time <= slot_time < buffered_end_time:
-                timeline[slot_time]["is_blocked_by_event"] = True
+        start_minute, end_minute = record_minutes(event["Начало"], event["Конец"])
+        lo, hi = timeline.slot_range(start_minute - EVENT_BUFFER_MINUTES, end_minute + EVENT_BUFFER_MINUTES)
+        if lo < hi:
+            events_diff[lo] += 1
+            events_diff[hi] -= 1
 
     for booking in bookings:
-        start_time = str_to_time(booking["Время начала"])
-        end_time = str_to_time(booking["Время конца"])
-
-        for slot_time in timeline:
-            if start_time <= slot_time < end_time:
-                timeline[slot_time]["people_count"] += 1
-                
-                if booking.get("Оборудование") == POTTERY_WHEEL_NAME:
-                    timeline[slot_time]["pottery_wheels_used"] += 1
+        start_minute, end_minute = record_minutes(booking["Время начала"], booking["Время конца"])
+        lo, hi = timeline.slot_range(start_minute, end_minute)
+        if lo >= hi:
+            continue
+        people_diff[lo] += 1
+        people_diff[hi] -= 1
+        if booking.get("Оборудование") == POTTERY_WHEEL_NAME:
+            wheels_diff[lo] += 1
+            wheels_diff[hi] -= 1
+
+    _apply_prefix_sums(timeline.people, people_diff)
+    _apply_prefix_sums(timeline.wheels, wheels_diff)
+    _apply_prefix_sums(timeline.events, events_diff)
     
     return timeline
 
 
-def get_available_start_times(timeline: dict, request_date: datetime.date, equipment_required: str | None = None) -> list[str]:
+def _first_future_index(timeline: Timeline, request_date: datetime.date) -> int:
+    """Индекс первого слота, который ещё не начался (для сегодняшней даты)."""
+    if request_date != datetime.date.today():
+        return 0
+    now = datetime.datetime.now(WORKSHOP_TIMEZONE)
+    now_seconds = now.hour * 3600 + now.minute * 60 + now.second + now.microsecond / 1e6
+    # Слоты, начавшиеся не позже текущего момента, уже недоступны
+    index = 0
+    while index < timeline.size and timeline.slot_minute(index) * 60 <= now_seconds:
+        index += 1
+    return index
+
+
+def get_available_start_times(timeline: Timeline, request_date: datetime.date, equipment_required: str | None = None) -> list[str]:
     """
     Находит доступные времена для НАЧАЛА записи.
     Если указано equipment_required, проверяет и его доступность.
     Фильтрует прошедшие слоты для текущего дня.
     """
-    available_times = []
-    
-    today = datetime.date.today()
-    current_time = datetime.datetime.now(WORKSHOP_TIMEZONE).time()
-
+    run = timeline.run_lengths(equipment_required)
     
-    for slot_time, load_info in timeline.items():
-        is_available = not load_info["is_blocked_by_event"] and load_info["people_count"] < TOTAL_SPOTS
-        
-        if equipment_required == POTTERY_WHEEL_NAME:
-            is_available = is_available and (load_info["pottery_wheels_used"] < TOTAL_POTTERY_WHEELS)
-            
-        if request_date == today and slot_time <= current_time:
-            is_available = False
-        
-        if is_available:
-            available_times.append(slot_time.strftime("%H:%M"))
-            
-    return available_times
+    return [
+        timeline.slot_label(index)
+        for index in range(_first_future_index(timeline, request_date), timeline.size)
+        if run[index]
+    ]
 
 
 
-def get_max_duration(start_time_str: str, timeline: dict, equipment_required: str | None = None) -> float:
+def get_max_duration(start_time_str: str, timeline: Timeline, equipment_required: str | None = None) -> float:
     """
     Рассчитывает максимально возможную длительность записи с учетом оборудования.
     """
     start_time = datetime.datetime.strptime(start_time_str, "%H:%M").time()
+    start_index = timeline.slot_index(start_time.hour * 60 + start_time.minute)
     
-    if start_time not in timeline:
+    if start_index is None:
         return 0.0
 
-    max_duration_minutes = 0
-    sorted_slots = sorted(timeline.keys())
-    
-    try:
-        start_index = sorted_slots.index(start_time)
-    except ValueError:
-        return 0.0
+    free_slots = timeline.run_lengths(equipment_required)[start_index]
+            
+    return free_slots * timeline.step / 60.0
+
+
+def get_start_times_with_max_duration(timeline: Timeline, request_date: datetime.date, equipment_required: str | None = None) -> list[tuple[str, float]]:
+    """
+    Все доступные времена начала вместе с максимальной длительностью записи (в часах)
+    за один проход по таймлайну.
+    """
+    run = timeline.run_lengths(equipment_required)
+    hours_per_slot = timeline.step / 60.0
     
-    for i in range(start_index, len(sorted_slots)):
-        slot_time = sorted_slots[i]
-        load_info = timeline[slot_time]
+    return [
+        (timeline.slot_label(index), run[index] * hours_per_slot)
+        for index in range(_first_future_index(timeline, request_date), timeline.size)
+        if run[index]
+    ]
 
-        is_slot_ok = not load_info["is_blocked_by_event"] and load_info["people_count"] < TOTAL_SPOTS
-        
-        if equipment_required == POTTERY_WHEEL_NAME:
-            is_slot_ok = is_slot_ok and (load_info["pottery_wheels_used"] < TOTAL_POTTERY_WHEELS)
-        
-        if is_slot_ok:
-            max_duration_minutes += TIME_STEP_MINUTES
-        else:
-            break
-            
-    return max_duration_minutes / 60.0
\ No newline at end of file
+
+# --- ПАКЕТНЫЕ ФУНКЦИИ (несколько дней за раз) ---
+
+def group_records_by_date(bookings: list, events: list, date_strs: list[str]) -> dict[str, tuple[list, list]]:
+    """
+    Раскладывает брони и мероприятия из выборки за период по датам.
+    Возвращает {дата: (брони, мероприятия)} для каждой даты из date_strs.
+    """
+    grouped = {date_str: ([], []) for date_str in date_strs}
+
+    for booking in bookings:
+        day = grouped.get(booking.get("Дата посещения"))
+        if day is not None:
+            day[0].append(booking)
+
+    for event in events:
+        day = grouped.get(event.get("Дата"))
+        if day is not None:
+            day[1].append(event)
+
+    return grouped
+
+
+def count_available_slots_by_date(timelines: dict[datetime.date, Timeline], equipment_required: str | None = None) -> dict[datetime.date, int]:
+    """
+    Считает количество свободных времён начала для каждого дня.
+    Ключи — даты, значения — таймлайны из calculate_timeline_load.
+    """
+    return {
+        day: len(get_available_start_times(timeline, day, equipment_required=equipment_required))
+        for day, timeline in timelines.items()
+    }
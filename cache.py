@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import sys
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterator
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_size(obj: Any) -> int:
+    """
+    Грубая оценка занимаемой памяти в байтах.
+    Рекурсивно обходит dict/list/tuple/set; для остального берёт sys.getsizeof.
+    """
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += estimate_size(key) + estimate_size(value)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += estimate_size(item)
+    return size
+
+
+class TTLCache:
+    """
+    Кэш в памяти с временем жизни записей, LRU-вытеснением и лимитом по памяти.
+
+    Размер записи считается один раз при вставке функцией sizeof.
+    Самые давно использованные записи вытесняются, пока не выполнятся
+    оба лимита: max_entries и max_bytes. Просроченные записи убираются
+    при обращении и фоновой чисткой (см. start_sweeper).
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float,
+        max_entries: int,
+        max_bytes: int | None = None,
+        sizeof: Callable[[Any], int] = estimate_size,
+        name: str = "",
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.name = name
+        self._sizeof = sizeof
+        # key -> (expires_at, size, value)
+        self._data: OrderedDict[Hashable, tuple[float, int, Any]] = OrderedDict()
+        self._total_bytes = 0
+        # Счётчики для мониторинга
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        _instances.add(self)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "bytes": self._total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, _, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: float | None = None) -> None:
+        if key in self._data:
+            self._remove(key)
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        size = self._sizeof(value) if self.max_bytes is not None else 0
+        self._data[key] = (time.monotonic() + ttl, size, value)
+        self._total_bytes += size
+        self._evict()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        if key not in self._data:
+            return default
+        value = self._data[key][2]
+        self._remove(key)
+        return value
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._total_bytes = 0
+
+    def purge_expired(self) -> int:
+        """Удаляет все просроченные записи. Возвращает, сколько удалено."""
+        now = time.monotonic()
+        expired = [key for key, (expires_at, _, _) in self._data.items() if expires_at <= now]
+        for key in expired:
+            self._remove(key)
+        self.expirations += len(expired)
+        return len(expired)
+
+    def values(self) -> Iterator[Any]:
+        """Живые значения без обновления LRU-порядка."""
+        now = time.monotonic()
+        for expires_at, _, value in list(self._data.values()):
+            if expires_at > now:
+                yield value
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._data.pop(key)
+        self._total_bytes -= size
+
+    def _evict(self) -> None:
+        while len(self._data) > self.max_entries:
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+        if self.max_bytes is None:
+            return
+        # Последнюю (только что вставленную) запись не вытесняем
+        while self._total_bytes > self.max_bytes and len(self._data) > 1:
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+
+
+# Все созданные кэши — их обходит фоновая чистка
+_instances: "weakref.WeakSet[TTLCache]" = weakref.WeakSet()
+_sweeper_task: asyncio.Task | None = None
+
+
+def all_caches() -> list[TTLCache]:
+    return list(_instances)
+
+
+async def _sweep_loop(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        for cache in all_caches():
+            try:
+                cache.purge_expired()
+            except Exception as e:
+                logger.error(f"❌ Ошибка чистки кэша {cache.name}: {e}")
+
+
+def start_sweeper(interval: float) -> None:
+    """Запускает фоновую чистку просроченных записей во всех кэшах (вызывается из lifespan)."""
+    global _sweeper_task
+    if interval <= 0 or _sweeper_task is not None:
+        return
+    _sweeper_task = asyncio.create_task(_sweep_loop(interval))
+
+
+async def stop_sweeper() -> None:
+    global _sweeper_task
+    if _sweeper_task is None:
+        return
+    _sweeper_task.cancel()
+    try:
+        await _sweeper_task
+    except asyncio.CancelledError:
+        pass
+    _sweeper_task = None
@@ -8,5 +8,82 @@ class Settings(BaseSettings):
     NOCODB_URL: str
     NOCODB_API_TOKEN: str
 
+    # --- HTTP-клиент NocoDB (пул соединений) ---
+    NOCODB_MAX_CONNECTIONS: int = 20        # Максимум одновременных соединений
+    NOCODB_MAX_KEEPALIVE: int = 10          # Сколько соединений держим "тёплыми"
+    NOCODB_KEEPALIVE_EXPIRY: float = 30.0   # Через сколько секунд закрываем простаивающее соединение
+    NOCODB_HTTP2: bool = False              # HTTP/2 (нужен пакет h2)
+    NOCODB_CONNECT_TIMEOUT: float = 5.0     # Таймаут установки соединения, сек
+    NOCODB_READ_TIMEOUT: float = 10.0       # Таймаут на чтение (GET), сек
+    NOCODB_WRITE_TIMEOUT: float = 15.0      # Таймаут на запись (POST/DELETE), сек
+    NOCODB_POOL_TIMEOUT: float = 5.0        # Сколько ждём свободное соединение из пула, сек
+    NOCODB_FANOUT_LIMIT: int = 4            # Сколько независимых запросов одного обработчика идут параллельно
+    NOCODB_DATES_PER_QUERY: int = 30        # Сколько дат помещаем в один фильтр where
+    NOCODB_PAGE_SIZE: int = 100             # Размер страницы при постраничном чтении
+
+    # --- Рабочий день мастерской ---
+    WORKSHOP_OPEN_HOUR: int = 10            # Час открытия (0–23)
+    WORKSHOP_CLOSE_HOUR: int = 22           # Час закрытия (1–24, 24 — до полуночи)
+    TIME_STEP_MINUTES: int = 30             # Шаг слотов, минут
+
+    # --- Допуск броней ---
+    ADMISSION_MAX_SNAPSHOT_AGE_SECONDS: float = 5.0  # Снимок дня старше этого перечитывается перед записью
+    BULK_BOOKING_MAX_DATES: int = 12        # Максимум дат в одной пакетной (повторяющейся) записи
+
+    # --- Календарь свободных дней ---
+    CALENDAR_MAX_DAYS: int = 31             # Максимальная длина окна календаря, дней
+
+    # --- Кэш "снимков дня" (брони + мероприятия + таймлайн) ---
+    DAY_CACHE_TTL_SECONDS: float = 60.0     # Сколько снимок считается свежим после последней сверки, сек
+    DAY_CACHE_MAX_AGE_SECONDS: float = 900.0  # Максимальный возраст снимка, после него — полная перезагрузка
+    OCCUPANCY_RECONCILE_INTERVAL_SECONDS: float = 15.0  # Период фоновой сверки с NocoDB (0 — выключить)
+    DAY_CACHE_MAX_DATES: int = 366          # Сколько дат держим одновременно
+    DAY_CACHE_MAX_BYTES: int = 16 * 1024 * 1024  # Лимит памяти под снимки, байт
+
+    # --- Карта отмены броней ("Мои записи" -> номер -> Id брони) ---
+    CANCEL_MAP_TTL_SECONDS: float = 1800.0  # Сколько живёт список для отмены, сек
+    CANCEL_MAP_MAX_USERS: int = 10000       # Сколько пользователей держим одновременно
+    CANCEL_MAP_MAX_BYTES: int = 4 * 1024 * 1024  # Лимит памяти, байт
+    CACHE_SWEEP_INTERVAL_SECONDS: float = 60.0  # Период фоновой чистки просроченных записей кэшей (0 — выключить)
+
+    # --- Кэш статуса участника (абонемент, клиент, конкурс) ---
+    MEMBER_CACHE_TTL_SECONDS: float = 600.0         # Сколько помним найденную запись, сек
+    MEMBER_CACHE_NEGATIVE_TTL_SECONDS: float = 60.0 # Сколько помним "не найден", сек
+    MEMBER_CACHE_MAX_USERS: int = 10000             # Сколько пользователей держим в каждом кэше
+    MEMBER_PRELOAD_ENABLED: bool = False            # Держать Clients и участников конкурса целиком в памяти
+    MEMBER_PRELOAD_INTERVAL_SECONDS: float = 300.0  # Период перезагрузки этих таблиц, сек
+
+    # --- Курс ---
+    LESSON_CATALOG_TTL_SECONDS: float = 600.0  # Период фонового обновления каталога уроков, сек (0 — только вручную)
+    PROGRESS_CACHE_TTL_SECONDS: float = 600.0  # Сколько помним прогресс ученика, сек
+    PROGRESS_CACHE_MAX_USERS: int = 10000      # Сколько учеников держим в кэше
+    ADMIN_TOKEN: str = ""                      # Токен для служебных эндпоинтов (пусто — они выключены)
+
+    # --- Ответы API ---
+    GZIP_MINIMUM_SIZE: int = 1000              # Сжимаем ответы от этого размера, байт
+
+    # --- Метрики ---
+    METRICS_ENABLED: bool = True               # Замерять запросы и отдавать /metrics (формат Prometheus)
+    TRACING_ENABLED: bool = True               # Трассировать вызовы NocoDB в запросе (заголовок Server-Timing)
+    TRACE_LOG_REQUESTS: bool = True            # Строка-сводка в лог на каждый запрос
+    TRACE_SLOW_REQUEST_MS: float = 0.0         # Дольше этого — в лог всё дерево вызовов, мс (0 — выключено)
+
+    # --- Статика веб-приложения курса (/course) ---
+    STATIC_BUILD_ON_STARTUP: bool = True       # Собирать статику (хэши в именах + сжатые копии) при старте
+    STATIC_BUILD_DIR: str = "build/course"     # Куда класть собранную статику
+
+    # --- Общее состояние для нескольких воркеров (uvicorn --workers N / WEB_CONCURRENCY) ---
+    SHARED_STATE_ENABLED: bool = False          # Карта отмены, снимки дня и замки допуска — в общем файле SQLite
+    SHARED_STATE_PATH: str = "shared_state.sqlite3"  # Файл общего состояния (рядом — папка .locks с замками)
+    SHARED_LOCK_POLL_SECONDS: float = 0.02      # Как часто пробуем взять занятый межпроцессный замок, сек
+
+    # --- Локальная реплика NocoDB (SQLite) ---
+    REPLICA_ENABLED: bool = False               # Отвечать на чтения из локальной копии таблиц
+    REPLICA_PATH: str = "replica.sqlite3"       # Файл реплики
+    REPLICA_SYNC_INTERVAL_SECONDS: float = 10.0 # Период синхронизации по UpdatedAt, сек
+    REPLICA_MAX_STALENESS_SECONDS: float = 60.0 # Старше этого реплика не используется, чтения идут в NocoDB
+    REPLICA_FULL_SYNC_EVERY: int = 30           # Каждый N-й цикл — полная перезаливка (ловит записи без UpdatedAt)
+    REPLICA_DELETION_SWEEP_SECONDS: float = 60.0 # Как часто сверять Id таблиц с NocoDB (ловит удаления)
+
 # Создаем единый экземпляр настроек для всего приложения
-settings = Settings()
\ No newline at end of file
+settings = Settings()
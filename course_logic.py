@@ -1,20 +1,37 @@
-def calculate_timeline(all_lessons: list, user_progress: dict) -> list[dict]:
-    """
-    Превращает сырые данные в красивый список для фронтенда.
-    Определяет статусы: completed, active, locked.
-    """
-    timeline = []
-    
-    access_blocks_str = user_progress.get("Access Blocks", "")
-    allowed_blocks = [b.strip() for b in access_blocks_str.split(",") if b.strip()]
-    
-    completed_list = user_progress.get("Completed_Lessons", [])
+def parse_access_blocks(access_blocks_str: str | None) -> list[str]:
+    """"1, 2" -> ["1", "2"]"""
+    return [b.strip() for b in (access_blocks_str or "").split(",") if b.strip()]
+
+
+def parse_completed_slugs(user_progress: dict) -> set:
+    """Slug'и пройденных уроков из связанного поля Completed_Lessons."""
+    completed_list = user_progress.get("Completed_Lessons") or []
     completed_slugs = set()
+    if not isinstance(completed_list, list):
+        return completed_slugs
     for item in completed_list:
         if isinstance(item, dict):
             completed_slugs.add(item.get("Slug"))
         else:
             pass
+    return completed_slugs
+
+
+def calculate_timeline(all_lessons: list, user_progress: dict) -> list[dict]:
+    """
+    Превращает сырые данные в красивый список для фронтенда.
+    Определяет статусы: completed, active, locked.
+    """
+    return build_timeline(
+        all_lessons,
+        parse_access_blocks(user_progress.get("Access Blocks", "")),
+        parse_completed_slugs(user_progress),
+    )
+
+
+def build_timeline(all_lessons: list, allowed_blocks: list[str], completed_slugs: set) -> list[dict]:
+    """То же, что calculate_timeline, но по уже разобранному прогрессу (из кэша)."""
+    timeline = []
 
     found_active = False
     
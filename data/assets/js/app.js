@@ -6,11 +6,23 @@ tg.expand(); // Раскрыть на весь экран
 // В реальном тесте на ПК может быть пусто, поэтому ставим заглушку для тестов
 const telegramId = tg.initDataUnsafe?.user?.id || "123456789"; 
 
-// URL твоего API (если локально - http://127.0.0.1:8000)
-// Когда зальешь на Amvera, поменяй на /api/v1/course/timeline
-const API_URL = "http://127.0.0.1:8000/api/v1/course/timeline"; 
+// API на том же сервере, что и страница (и локально, и на Amvera)
+const API_URL = "/api/v1/course/timeline";
 
-async function loadTimeline() {
+// Сервер (/course/?telegram_id=...) может встроить таймлайн прямо в страницу
+const INITIAL_DATA = window.__COURSE_DATA__;
+
+function loadTimeline() {
+    if (INITIAL_DATA && INITIAL_DATA.status === "success") {
+        renderHeader(INITIAL_DATA.user_name);
+        renderTimeline(INITIAL_DATA.timeline);
+        return;
+    }
+    refreshTimeline();
+}
+
+// Запрос к API — когда данных в странице нет или их нужно обновить
+async function refreshTimeline() {
     try {
         const response = await fetch(`${API_URL}?telegram_id=${telegramId}`);
         const data = await response.json();
@@ -77,4 +89,11 @@ function renderTimeline(lessons) {
 }
 
 // Запуск
-loadTimeline();
\ No newline at end of file
+loadTimeline();
+
+// Вернулись на страницу кнопкой "Назад" (страница из кэша браузера) — прогресс мог измениться
+window.addEventListener("pageshow", (event) => {
+    if (event.persisted) {
+        refreshTimeline();
+    }
+});
\ No newline at end of file
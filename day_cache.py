@@ -0,0 +1,368 @@
+import asyncio
+import logging
+import time
+
+import httpx
+
+import booking_logic
+import nocodb_client
+import shared_state
+from cache import TTLCache, estimate_size
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _fingerprint(records: list) -> tuple[int, str]:
+    """Количество записей и максимальный UpdatedAt — то же, что отдаёт NocoDB при сверке."""
+    return len(records), max((record.get("UpdatedAt") or "" for record in records), default="")
+
+
+class DaySnapshot:
+    """
+    "Снимок дня": брони и мероприятия на дату плюс рассчитанная нагрузка.
+    Собственные записи API меняют снимок на месте, а фоновая сверка
+    подтверждает, что он совпадает с NocoDB.
+
+    version растёт при каждом изменении снимка.
+    verified_at — когда снимок последний раз совпал с NocoDB (time.monotonic()).
+    local_writes — сколько наших записей применено с момента последней сверки.
+    loaded — False у "пустого" дня, отданного вместо неудачной загрузки из NocoDB:
+    по нему нельзя судить о занятости, и в кэш он не попадает.
+    """
+    __slots__ = (
+        "date_str", "bookings", "events", "timeline", "version",
+        "verified_at", "bookings_fingerprint", "events_fingerprint", "local_writes",
+        "loaded",
+    )
+
+    def __init__(self, date_str: str, bookings: list, events: list, version: int = 1, loaded: bool = True):
+        self.date_str = date_str
+        self.bookings = bookings
+        self.events = events
+        self.timeline = booking_logic.calculate_timeline_load(bookings, events)
+        self.version = version
+        self.verified_at = time.monotonic()
+        self.bookings_fingerprint = _fingerprint(bookings)
+        self.events_fingerprint = _fingerprint(events)
+        self.local_writes = 0
+        self.loaded = loaded
+
+    def is_fresh(self, max_age: float | None = None) -> bool:
+        if max_age is None:
+            max_age = settings.DAY_CACHE_TTL_SECONDS
+        return time.monotonic() - self.verified_at < max_age
+
+    def add_booking(self, booking: dict) -> None:
+        self.bookings.append(booking)
+        self.timeline.apply_booking(booking, 1)
+        self.version += 1
+        self.local_writes += 1
+
+    def remove_booking(self, booking_id) -> bool:
+        for index, booking in enumerate(self.bookings):
+            if booking.get("Id") == booking_id:
+                del self.bookings[index]
+                self.timeline.apply_booking(booking, -1)
+                self.version += 1
+                self.local_writes += 1
+                return True
+        return False
+
+    def matches(self, bookings_fingerprint: tuple[int, str], events_fingerprint: tuple[int, str]) -> bool:
+        """
+        Совпадает ли снимок с NocoDB: количество записей и последний UpdatedAt.
+        Снимок с нашими записями (local_writes > 0) сюда не передаётся: у наших записей
+        локально нет UpdatedAt, поэтому такие даты сверка просто перезагружает.
+        """
+        if events_fingerprint != self.events_fingerprint:
+            return False
+        if bookings_fingerprint[0] != len(self.bookings):
+            return False
+        return bookings_fingerprint[1] == self.bookings_fingerprint[1]
+
+    def mark_verified(self, bookings_fingerprint: tuple[int, str]) -> None:
+        self.bookings_fingerprint = bookings_fingerprint
+        self.local_writes = 0
+        self.verified_at = time.monotonic()
+
+
+def _snapshot_size(snapshot: DaySnapshot) -> int:
+    # Таймлайн пересчитывается из списков, поэтому считаем только сырые данные
+    return estimate_size(snapshot.bookings) + estimate_size(snapshot.events)
+
+
+_cache = TTLCache(
+    ttl_seconds=settings.DAY_CACHE_MAX_AGE_SECONDS,
+    max_entries=settings.DAY_CACHE_MAX_DATES,
+    max_bytes=settings.DAY_CACHE_MAX_BYTES,
+    sizeof=_snapshot_size,
+    name="day_snapshots",
+)
+# Дата -> задача загрузки. Параллельные промахи по одной дате ждут один запрос.
+_inflight: dict[str, asyncio.Task] = {}
+# Даты, в которые мы писали, пока шла загрузка: такой результат может быть устаревшим
+_dirty_while_loading: set[str] = set()
+# Счётчик собственных записей: пакетная загрузка не кэширует результат, если он сдвинулся
+_write_seq = 0
+
+_reconciler_task: asyncio.Task | None = None
+
+
+# --- Общее состояние для нескольких воркеров (SHARED_STATE_ENABLED) ---
+# Каждый воркер держит снимки в памяти, но источник истины — shared_state:
+# версия снимка там общая, и воркер с отставшей версией перечитывает снимок оттуда.
+
+def _wall_time(monotonic_time: float) -> float:
+    return time.time() - (time.monotonic() - monotonic_time)
+
+
+def _import_shared(date_str: str) -> DaySnapshot | None:
+    loaded = shared_state.load_snapshot(date_str)
+    if loaded is None:
+        return None
+    version, verified_at, local_writes, bookings, events = loaded
+    snapshot = DaySnapshot(date_str, bookings, events, version=version)
+    snapshot.verified_at = time.monotonic() - (time.time() - verified_at)
+    snapshot.local_writes = local_writes
+    _cache.set(date_str, snapshot)
+    return snapshot
+
+
+def _current_snapshot(date_str: str) -> DaySnapshot | None:
+    """Снимок из памяти, а при общем состоянии — подтянутый до последней версии других воркеров."""
+    snapshot = _cache.get(date_str)
+    if not shared_state.enabled():
+        return snapshot
+    if snapshot is not None and snapshot.version == shared_state.snapshot_version(date_str) and snapshot.is_fresh():
+        return snapshot
+    return _import_shared(date_str) or snapshot
+
+
+def _publish(snapshot: DaySnapshot) -> None:
+    """Отдаёт изменённый нами снимок остальным воркерам."""
+    if shared_state.enabled():
+        snapshot.version = shared_state.publish_snapshot(
+            snapshot.date_str, snapshot.bookings, snapshot.events,
+            _wall_time(snapshot.verified_at), snapshot.local_writes,
+        )
+
+
+def _store(snapshot: DaySnapshot, base_version: int | None) -> DaySnapshot:
+    """
+    Кладёт загруженный из NocoDB снимок в кэш. При общем состоянии публикует его,
+    только если версия не менялась с начала загрузки; иначе берёт более новый снимок другого воркера.
+    """
+    if base_version is not None:
+        version = shared_state.publish_snapshot(
+            snapshot.date_str, snapshot.bookings, snapshot.events, time.time(), expected_version=base_version
+        )
+        if version is None:
+            return _import_shared(snapshot.date_str) or snapshot
+        snapshot.version = version
+    _cache.set(snapshot.date_str, snapshot)
+    return snapshot
+
+
+def _base_version(date_str: str) -> int | None:
+    return shared_state.snapshot_version(date_str) if shared_state.enabled() else None
+
+
+def _fresh_snapshot(date_str: str, max_age: float | None = None) -> DaySnapshot | None:
+    snapshot = _current_snapshot(date_str)
+    if snapshot is not None and snapshot.is_fresh(max_age):
+        return snapshot
+    return None
+
+
+async def _load(date_str: str) -> DaySnapshot:
+    base_version = _base_version(date_str)
+    try:
+        bookings, events = await nocodb_client.gather_limited(
+            nocodb_client.get_bookings_by_date(date_str, raise_errors=True),
+            nocodb_client.get_events_by_date(date_str, raise_errors=True),
+        )
+    except httpx.HTTPError as e:
+        # Как и раньше, отвечаем "пустым" днём, но в кэш его не кладём
+        logger.error(f"❌ Не удалось загрузить день {date_str} из NocoDB: {e}")
+        return DaySnapshot(date_str, [], [], loaded=False)
+
+    previous = _cache.get(date_str)
+    snapshot = DaySnapshot(date_str, bookings, events, version=previous.version + 1 if previous else 1)
+    if date_str in _dirty_while_loading:
+        _dirty_while_loading.discard(date_str)
+        _cache.pop(date_str)
+        return snapshot
+    return _store(snapshot, base_version)
+
+
+def _start_load(date_str: str) -> asyncio.Task:
+    task = _inflight.get(date_str)
+    if task is None:
+        task = asyncio.create_task(_load(date_str))
+        _inflight[date_str] = task
+        task.add_done_callback(lambda _: _inflight.pop(date_str, None))
+    return task
+
+
+async def get_snapshot(date_str: str, max_age: float | None = None) -> DaySnapshot:
+    """
+    Возвращает снимок дня из памяти или загружает его из NocoDB.
+    max_age ужесточает требование к свежести (секунд с последней сверки),
+    по умолчанию — DAY_CACHE_TTL_SECONDS.
+    """
+    snapshot = _fresh_snapshot(date_str, max_age)
+    if snapshot is not None:
+        return snapshot
+    return await asyncio.shield(_start_load(date_str))
+
+
+async def get_snapshots(date_strs: list[str], max_age: float | None = None) -> dict[str, DaySnapshot]:
+    """
+    Возвращает снимки для нескольких дат. Недостающие (или старше max_age) даты
+    загружаются одной выборкой за период (брони и мероприятия параллельно) и кладутся в кэш.
+    """
+    snapshots = {}
+    missing = []
+    for date_str in date_strs:
+        snapshot = _fresh_snapshot(date_str, max_age)
+        if snapshot is None:
+            missing.append(date_str)
+        else:
+            snapshots[date_str] = snapshot
+
+    if not missing:
+        return snapshots
+
+    write_seq_before = _write_seq
+    base_versions = {date_str: _base_version(date_str) for date_str in missing}
+    try:
+        bookings, events = await nocodb_client.gather_limited(
+            nocodb_client.get_bookings_by_dates(missing, raise_errors=True),
+            nocodb_client.get_events_by_dates(missing, raise_errors=True),
+        )
+    except httpx.HTTPError as e:
+        logger.error(f"❌ Не удалось загрузить даты {missing[0]}…{missing[-1]} из NocoDB: {e}")
+        for date_str in missing:
+            snapshots[date_str] = DaySnapshot(date_str, [], [], loaded=False)
+        return snapshots
+
+    cacheable = _write_seq == write_seq_before
+    grouped = booking_logic.group_records_by_date(bookings, events, missing)
+    for date_str, (day_bookings, day_events) in grouped.items():
+        previous = _cache.get(date_str)
+        snapshot = DaySnapshot(date_str, day_bookings, day_events, version=previous.version + 1 if previous else 1)
+        if cacheable and date_str not in _inflight and _fresh_snapshot(date_str, max_age) is None:
+            snapshot = _store(snapshot, base_versions[date_str])
+        snapshots[date_str] = snapshot
+
+    return snapshots
+
+
+def invalidate(date_str: str) -> None:
+    """Выкидывает дату из кэша — следующий запрос загрузит её заново."""
+    _cache.pop(date_str)
+
+
+def add_booking(booking: dict) -> None:
+    """Добавляет только что созданную бронь в снимок её даты (если он в памяти)."""
+    global _write_seq
+    _write_seq += 1
+    date_str = booking.get("Дата посещения")
+    if date_str in _inflight:
+        _dirty_while_loading.add(date_str)
+    snapshot = _current_snapshot(date_str)
+    if snapshot is not None:
+        snapshot.add_booking(booking)
+        _publish(snapshot)
+
+
+def remove_booking(booking_id) -> None:
+    """Убирает удалённую бронь из снимка, в котором она лежит."""
+    global _write_seq
+    _write_seq += 1
+    # Дата удалённой брони неизвестна, поэтому не доверяем ни одной идущей загрузке
+    _dirty_while_loading.update(_inflight)
+    if shared_state.enabled():
+        # Снимок с этой бронью может быть у любого воркера — помечаем его недействительным,
+        # и каждый воркер перечитает дату из NocoDB
+        shared_state.invalidate_snapshots_with_booking(booking_id)
+        for snapshot in list(_cache.values()):
+            if any(booking.get("Id") == booking_id for booking in snapshot.bookings):
+                _cache.pop(snapshot.date_str)
+        return
+    for snapshot in _cache.values():
+        if snapshot.remove_booking(booking_id):
+            return
+
+
+# --- Фоновая сверка с NocoDB ---
+
+async def reconcile() -> None:
+    """
+    Сверяет все снимки в памяти с NocoDB двумя лёгкими запросами
+    (количество и последний UpdatedAt по датам) и перезагружает разошедшиеся даты.
+    Даты, куда мы писали сами, перезагружаются всегда: иначе правка админа,
+    сделанная в ту же дату, спряталась бы за нашими записями.
+    """
+    snapshots = [snapshot for snapshot in _cache.values() if snapshot.date_str not in _inflight]
+    if not snapshots:
+        return
+
+    date_strs = [snapshot.date_str for snapshot in snapshots]
+    versions_before = {snapshot.date_str: snapshot.version for snapshot in snapshots}
+    try:
+        bookings_fps, events_fps = await nocodb_client.gather_limited(
+            nocodb_client.get_bookings_fingerprints(date_strs),
+            nocodb_client.get_events_fingerprints(date_strs),
+        )
+    except httpx.HTTPError as e:
+        logger.warning(f"⚠️ Сверка снимков с NocoDB не удалась: {e}")
+        return
+
+    drifted = []
+    for snapshot in snapshots:
+        date_str = snapshot.date_str
+        if snapshot.version != versions_before[date_str]:
+            # Пока шла сверка, мы сами изменили снимок — проверим в следующий раз
+            continue
+        if snapshot.local_writes == 0 and snapshot.matches(bookings_fps[date_str], events_fps[date_str]):
+            snapshot.mark_verified(bookings_fps[date_str])
+            if shared_state.enabled():
+                shared_state.mark_snapshot_verified(date_str, snapshot.version, time.time())
+        else:
+            drifted.append(date_str)
+
+    if drifted:
+        logger.info(f"🔄 Снимки разошлись с NocoDB, перезагружаем: {', '.join(drifted)}")
+        await asyncio.gather(*(_start_load(date_str) for date_str in drifted))
+
+
+async def _reconcile_loop(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await reconcile()
+        except Exception as e:
+            logger.error(f"❌ Ошибка фоновой сверки снимков: {e}")
+
+
+def start_reconciler() -> None:
+    """Запускает фоновую сверку (вызывается из lifespan)."""
+    global _reconciler_task
+    interval = settings.OCCUPANCY_RECONCILE_INTERVAL_SECONDS
+    if interval <= 0 or _reconciler_task is not None:
+        return
+    _reconciler_task = asyncio.create_task(_reconcile_loop(interval))
+
+
+async def stop_reconciler() -> None:
+    global _reconciler_task
+    if _reconciler_task is None:
+        return
+    _reconciler_task.cancel()
+    try:
+        await _reconciler_task
+    except asyncio.CancelledError:
+        pass
+    _reconciler_task = None
@@ -0,0 +1,24 @@
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен: без него работает stdlib json, тоже без \uXXXX
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """JSON в UTF-8 как есть: кириллица не превращается в \\uXXXX и весит вдвое меньше."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """Класс ответа по умолчанию для всего API (orjson, если установлен)."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
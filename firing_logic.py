@@ -44,30 +44,40 @@ WORKSHOP_GLAZE_PRICES = {
     }
 }
 
+# Типы глазури. Доплату за глазурь берём только за "из мастерской" и не за утель.
+GLAZE_TYPES = ("без глазури", "своя", "из мастерской")
+WORKSHOP_GLAZE = "из мастерской"
+
+
+def _compile_price_table() -> dict[tuple[str, str, str], int]:
+    """Плоская таблица (размер, обжиг, глазурь) -> цена одного изделия."""
+    table = {}
+    for size, size_prices in FIRING_PRICES.items():
+        for firing_type, base_cost in size_prices.items():
+            for glaze_type in GLAZE_TYPES:
+                glaze_surcharge = 0
+                if glaze_type == WORKSHOP_GLAZE and firing_type != "утель":
+                    glaze_surcharge = WORKSHOP_GLAZE_PRICES.get(size, {}).get(firing_type, 0)
+                table[(size, firing_type, glaze_type)] = base_cost + glaze_surcharge
+    return table
+
+
+PRICE_TABLE = _compile_price_table()
+
+
 def calculate_base_item_cost(size: str, firing_type: str, glaze_type: str) -> int:
     """
     Считает стоимость ОДНОГО изделия без учета скидок клиента.
     Возвращает цену или -1, если параметры неверны.
     """
+    price = PRICE_TABLE.get((size, firing_type, glaze_type))
+    if price is not None:
+        return price
+
+    # Медленный путь: другой регистр или незнакомый тип глазури (считается как своя)
     size = size.lower()
     firing_type = firing_type.lower()
     glaze_type = glaze_type.lower()
-
-    size_prices = FIRING_PRICES.get(size)
-    if not size_prices:
-        return -1
-    
-    base_cost = size_prices.get(firing_type)
-    if base_cost is None:
-        return -1
-
-    glaze_surcharge = 0
-    if glaze_type == "из мастерской":
-        if firing_type == "утель":
-            glaze_surcharge = 0
-        else:
-            glaze_prices = WORKSHOP_GLAZE_PRICES.get(size)
-            if glaze_prices:
-                glaze_surcharge = glaze_prices.get(firing_type, 0)
-
-    return base_cost + glaze_surcharge
\ No newline at end of file
+    if glaze_type not in GLAZE_TYPES:
+        glaze_type = "своя"
+    return PRICE_TABLE.get((size, firing_type, glaze_type), -1)
@@ -0,0 +1,86 @@
+import hashlib
+
+from fastapi import Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.datastructures import Headers
+from starlette.types import Receive, Scope, Send
+
+# Данные меняются в любой момент: клиент может хранить ответ, но обязан переспрашивать
+NO_CACHE = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Сильный ETag из версий или содержимого данных."""
+    digest = hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Совпадает ли ETag с заголовком If-None-Match запроса."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in header.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def set_validators(response: Response, etag: str, cache_control: str = NO_CACHE) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+
+
+def not_modified(etag: str, cache_control: str = NO_CACHE) -> Response:
+    """Ответ 304 без тела — клиент показывает то, что у него уже есть."""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def conditional(request: Request, response: Response, etag: str, cache_control: str = NO_CACHE) -> Response | None:
+    """
+    Проставляет ETag/Cache-Control на ответ и возвращает 304, если у клиента уже эта версия.
+    Использование: `cached = conditional(...)`, и если он не None — вернуть его.
+    """
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+    set_validators(response, etag, cache_control)
+    return None
+
+
+# --- Accept-Encoding ---
+
+def _encoding_weights(accept_encoding: str) -> dict[str, float]:
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, *params = (item.strip() for item in part.split(";"))
+        if not name:
+            continue
+        weight = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.lower()] = weight
+    return weights
+
+
+def accepts_encoding(accept_encoding: str, encoding: str) -> bool:
+    """
+    Принимает ли клиент кодировку по заголовку Accept-Encoding.
+    q=0 — явный отказ ("gzip;q=0"); "*" действует на кодировки, не названные явно.
+    """
+    weights = _encoding_weights(accept_encoding)
+    return weights.get(encoding, weights.get("*", 0.0)) > 0
+
+
+class NegotiatingGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware, который учитывает q-значения: Starlette ищет "gzip" подстрокой и сжимает даже при gzip;q=0."""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and not accepts_encoding(Headers(scope=scope).get("accept-encoding", ""), "gzip"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
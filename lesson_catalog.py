@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import time
+
+import http_cache
+import nocodb_client
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LessonCatalog:
+    """
+    Каталог уроков: список в порядке "Sort Order" и индексы по Slug и по блоку.
+    Каталог не меняется на месте — при обновлении строится новый объект.
+    """
+    __slots__ = ("lessons", "by_slug", "by_block", "version", "loaded_at", "etag")
+
+    def __init__(self, lessons: list, version: int = 1):
+        self.lessons = lessons
+        self.by_slug: dict[str, dict] = {}
+        # Блок -> позиции его уроков в lessons (по возрастанию)
+        self.by_block: dict[str, list[int]] = {}
+        for position, lesson in enumerate(lessons):
+            slug = lesson.get("Slug")
+            if slug is not None:
+                self.by_slug.setdefault(slug, lesson)
+            self.by_block.setdefault(lesson.get("Block ID"), []).append(position)
+        self.version = version
+        self.loaded_at = time.monotonic()
+        # Считается по содержимому, поэтому одинаков во всех воркерах и после перезапуска
+        self.etag = http_cache.make_etag(
+            [(lesson.get("Id"), lesson.get("Slug"), lesson.get("Title"), lesson.get("Block ID")) for lesson in lessons]
+        )
+
+    def lesson_id(self, slug: str):
+        """Id урока в NocoDB по его slug (или None)."""
+        lesson = self.by_slug.get(slug)
+        return lesson.get("Id") if lesson else None
+
+    def lessons_in_blocks(self, blocks: list[str]) -> list:
+        """Уроки открытых блоков в порядке каталога — без прохода по всем урокам."""
+        positions = sorted(position for block in set(blocks) for position in self.by_block.get(block, ()))
+        return [self.lessons[position] for position in positions]
+
+
+_catalog: LessonCatalog | None = None
+_loading: asyncio.Task | None = None
+_refresh_task: asyncio.Task | None = None
+
+
+async def _load() -> LessonCatalog | None:
+    global _catalog
+    try:
+        lessons = await nocodb_client.get_all_lessons(raise_errors=True)
+        if not lessons and _catalog is not None:
+            # Пустой ответ не затирает рабочий каталог
+            logger.warning("⚠️ NocoDB вернула пустой список уроков, оставляем прежний каталог")
+            return _catalog
+        _catalog = LessonCatalog(lessons, version=_catalog.version + 1 if _catalog else 1)
+    except Exception as e:
+        # Сеть или неожиданный ответ (ValueError/KeyError) — остаёмся на прежнем каталоге
+        logger.error(f"❌ Не удалось загрузить каталог уроков: {e}")
+    return _catalog
+
+
+def _loading_done(_: asyncio.Task) -> None:
+    global _loading
+    _loading = None
+
+
+async def refresh() -> LessonCatalog | None:
+    """Перечитывает каталог из NocoDB (параллельные вызовы ждут одну загрузку)."""
+    global _loading
+    if _loading is None:
+        _loading = asyncio.create_task(_load())
+        _loading.add_done_callback(_loading_done)
+    return await asyncio.shield(_loading)
+
+
+async def get_catalog() -> LessonCatalog | None:
+    """
+    Текущий каталог. Загружается при первом обращении, дальше обновляется
+    в фоне раз в LESSON_CATALOG_TTL_SECONDS или по команде администратора.
+    """
+    if _catalog is not None and _catalog.lessons:
+        return _catalog
+    return await refresh()
+
+
+async def _refresh_loop(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await refresh()
+        except Exception as e:
+            logger.error(f"❌ Ошибка фонового обновления каталога уроков: {e}")
+
+
+def start() -> None:
+    """Запускает фоновое обновление каталога (вызывается из lifespan)."""
+    global _refresh_task
+    interval = settings.LESSON_CATALOG_TTL_SECONDS
+    if interval <= 0 or _refresh_task is not None:
+        return
+    _refresh_task = asyncio.create_task(_refresh_loop(interval))
+
+
+async def stop() -> None:
+    global _refresh_task
+    if _refresh_task is None:
+        return
+    _refresh_task.cancel()
+    try:
+        await _refresh_task
+    except asyncio.CancelledError:
+        pass
+    _refresh_task = None
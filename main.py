@@ -2,16 +2,30 @@ import sys
 import os
 import datetime
 import logging
-from fastapi import FastAPI, Query, HTTPException
-from fastapi.responses import RedirectResponse
-from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Query, HTTPException, Request
+from fastapi.responses import PlainTextResponse, RedirectResponse
 from starlette.responses import Response
 from datetime import timedelta 
 
 import nocodb_client
 import booking_logic
+import booking_admission
+import day_cache
+import replica
+import cache
+import session_store
+import member_cache
+import lesson_catalog
+import http_cache
+import static_assets
+from fast_json import FastJSONResponse
+import shared_state
 import schemas
 import firing_logic
+import metrics
+import tracing
+from config import settings
 from routers import course 
 
 logging.basicConfig(
@@ -21,23 +35,62 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Открывает общий пул соединений к NocoDB на время жизни процесса
+    и запускает фоновые задачи: реплику (если включена), сверку снимков дня, чистку кэшей
+    предзагрузку участников (если включена) и обновление каталога уроков.
+    """
+    await nocodb_client.open_client()
+    await replica.start()
+    day_cache.start_reconciler()
+    cache.start_sweeper(settings.CACHE_SWEEP_INTERVAL_SECONDS)
+    member_cache.start()
+    lesson_catalog.start()
+    try:
+        yield
+    finally:
+        await lesson_catalog.stop()
+        await member_cache.stop()
+        await cache.stop_sweeper()
+        await day_cache.stop_reconciler()
+        await replica.stop()
+        shared_state.close()
+        await nocodb_client.close_client()
+
+
 app = FastAPI(
     title="ArtChaos API",
     description="API для управления бронированиями в творческой мастерской.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
+# Сжимаем крупные ответы API; статика /course уже лежит сжатой и middleware её не трогает
+app.add_middleware(http_cache.NegotiatingGZipMiddleware, minimum_size=settings.GZIP_MINIMUM_SIZE)
+if settings.TRACING_ENABLED:
+    app.add_middleware(tracing.TracingMiddleware)
+if settings.METRICS_ENABLED:
+    # Добавлен последним — значит, внешний: замеряет и время сжатия
+    app.add_middleware(metrics.MetricsMiddleware)
+
 app.include_router(course.router)
+app.include_router(course.page_router)
 
 DATA_DIRECTORY = "data" 
 
 if not os.path.exists(DATA_DIRECTORY):
     os.makedirs(DATA_DIRECTORY)
 
-app.mount("/course", StaticFiles(directory=DATA_DIRECTORY), name="course")
+# Хэши в именах файлов и сжатые копии; без сборки раздаём data как есть
+STATIC_DIRECTORY = static_assets.prepare(DATA_DIRECTORY, settings.STATIC_BUILD_DIR, settings.STATIC_BUILD_ON_STARTUP)
 
-USER_BOOKING_CACHE = {}
-CACHE_LIFETIME_MINUTES = 30
+app.mount("/course", static_assets.PrecompressedStaticFiles(directory=STATIC_DIRECTORY), name="course")
+
+WEEKDAY_NAMES = ["пн", "вт", "ср", "чт", "пт", "сб", "вс"]
 
 def parse_date_from_str(date_str: str) -> datetime.date:
     """Парсит дату из строки формата 'dd.mm.yyyy'."""
@@ -46,11 +99,39 @@ def parse_date_from_str(date_str: str) -> datetime.date:
     except ValueError:
         raise HTTPException(status_code=400, detail="Неверный формат даты. Ожидается dd.mm.yyyy")
 
+def check_abonement_window(abonement_data: dict | None, requested_date: datetime.date, date_str: str) -> str | None:
+    """
+    Проверяет, что абонемент есть и действует на запрашиваемую дату.
+    Возвращает текст ошибки для пользователя или None, если всё в порядке.
+    """
+    if not abonement_data:
+        return "❌ У тебя не найден действующий абонемент :( Пожалуйста, напиши об этой ошибке @egor_savenko"
+        
+    days_left = int(abonement_data.get("Осталось дней", 0))
+    
+    today = datetime.date.today()
+    delta_days = (requested_date - today).days
+    
+    if delta_days < 0:
+        return "❌ Нельзя записаться на прошедшую дату. Пожалуйста, напиши об этой ошибке @egor_savenko"
+
+    if delta_days > days_left:
+        return f"❌ Твой абонемент истекает раньше, чем {date_str}. Ты можешь записаться на даты в пределах оставшихся {days_left} дней."
+
+    return None
+
 @app.get("/")
 async def root():
     return RedirectResponse(url="/docs")
 
-@app.get("/api/v1/available_start_times")
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Метрики процесса в текстовом формате Prometheus."""
+    if not settings.METRICS_ENABLED:
+        return PlainTextResponse("metrics disabled\n", status_code=404)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/v1/available_start_times", response_model=schemas.TextResult)
 async def get_start_times(
     date_str: str = Query(..., alias="date"), 
     telegram_id: str = Query(..., alias="telegram_id"),
@@ -63,34 +144,57 @@ async def get_start_times(
     """
     requested_date = parse_date_from_str(date_str)
     
-    abonement_data = await nocodb_client.get_abonement_by_telegram_id(telegram_id)
+    # Абонемент и снимок дня не зависят друг от друга — грузим параллельно
+    abonement_data, snapshot = await nocodb_client.gather_limited(
+        member_cache.get_abonement(telegram_id),
+        day_cache.get_snapshot(date_str),
+    )
     
-    if not abonement_data:
-        return {"result": "❌ У тебя не найден действующий абонемент :( Пожалуйста, напиши об этой ошибке @egor_savenko"}
-        
-    days_left = int(abonement_data.get("Осталось дней", 0))
+    abonement_error = check_abonement_window(abonement_data, requested_date, date_str)
+    if abonement_error:
+        return {"result": abonement_error}
     
-    today = datetime.date.today()
-    delta_days = (requested_date - today).days
+    available_times = booking_logic.get_available_start_times(snapshot.timeline, requested_date, equipment_required=equipment)
     
-    if delta_days < 0:
-        return {"result": "❌ Нельзя записаться на прошедшую дату. Пожалуйста, напиши об этой ошибке @egor_savenko"}
+    if not available_times:
+        return {"result": f"❌ На {date_str} нет свободных мест. Попробуй выбрать другую дату."}
 
-    if delta_days > days_left:
-        return {"result": f"❌ Твой абонемент истекает раньше, чем {date_str}. Ты можешь записаться на даты в пределах оставшихся {days_left} дней."}
+    result_string = ",".join(available_times)
+    return {"result": result_string}
 
+
+@app.get("/api/v1/available_slots", response_model=schemas.SlotsResult)
+async def get_available_slots(
+    date_str: str = Query(..., alias="date"), 
+    telegram_id: str = Query(..., alias="telegram_id"),
+    equipment: str | None = Query(None)
+):
+    """
+    Эндпоинт "всё сразу": доступные времена начала вместе с максимальной длительностью.
+    Заменяет пару запросов available_start_times + check_duration одним.
+    Возвращает JSON вида {"result": "10:00 — до 2.5 ч\n...", "slots": [{"start_time": "10:00", "max_duration": 2.5}, ...]}
+    """
+    requested_date = parse_date_from_str(date_str)
     
-    bookings = await nocodb_client.get_bookings_by_date(date_str)
-    events = await nocodb_client.get_events_by_date(date_str)
-    timeline = booking_logic.calculate_timeline_load(bookings, events)
+    abonement_data, snapshot = await nocodb_client.gather_limited(
+        member_cache.get_abonement(telegram_id),
+        day_cache.get_snapshot(date_str),
+    )
     
-    available_times = booking_logic.get_available_start_times(timeline, requested_date, equipment_required=equipment)
+    abonement_error = check_abonement_window(abonement_data, requested_date, date_str)
+    if abonement_error:
+        return {"result": abonement_error, "slots": []}
     
-    if not available_times:
-        return {"result": f"❌ На {date_str} нет свободных мест. Попробуй выбрать другую дату."}
+    slots = booking_logic.get_start_times_with_max_duration(snapshot.timeline, requested_date, equipment_required=equipment)
+    
+    if not slots:
+        return {"result": f"❌ На {date_str} нет свободных мест. Попробуй выбрать другую дату.", "slots": []}
 
-    result_string = ",".join(available_times)
-    return {"result": result_string}
+    result_string = "\n".join(f"{start_time} — до {max_duration:g} ч" for start_time, max_duration in slots)
+    return {
+        "result": result_string,
+        "slots": [{"start_time": start_time, "max_duration": max_duration} for start_time, max_duration in slots]
+    }
 
 
 @app.get("/api/v1/check_duration")
@@ -105,16 +209,54 @@ async def check_duration(
     """
     parse_date_from_str(date_str)
     
-    bookings = await nocodb_client.get_bookings_by_date(date_str)
-    events = await nocodb_client.get_events_by_date(date_str)
+    snapshot = await day_cache.get_snapshot(date_str)
     
-    timeline = booking_logic.calculate_timeline_load(bookings, events)
-    
-    max_duration = booking_logic.get_max_duration(start_time, timeline, equipment_required=equipment)
+    max_duration = booking_logic.get_max_duration(start_time, snapshot.timeline, equipment_required=equipment)
 
     return {"result": max_duration}
 
 
+@app.get("/api/v1/availability_calendar", response_model=schemas.CalendarResult)
+async def get_availability_calendar(
+    telegram_id: str = Query(..., alias="telegram_id"),
+    equipment: str | None = Query(None)
+):
+    """
+    Эндпоинт "календаря": сколько свободных времён начала есть в каждый день
+    в пределах действия абонемента (но не дальше CALENDAR_MAX_DAYS).
+    Весь период грузится парой запросов к NocoDB, а не по два на каждый день.
+    Возвращает JSON вида {"result": "...", "days": [{"date": "18.10.2026", "free_slots": 12}, ...]}
+    """
+    abonement_data = await member_cache.get_abonement(telegram_id)
+    
+    if not abonement_data:
+        return {"result": "❌ У тебя не найден действующий абонемент :( Пожалуйста, напиши об этой ошибке @egor_savenko", "days": []}
+        
+    days_left = int(abonement_data.get("Осталось дней", 0))
+    window_days = min(days_left, settings.CALENDAR_MAX_DAYS - 1)
+    
+    if window_days < 0:
+        return {"result": "❌ Твой абонемент уже закончился.", "days": []}
+    
+    today = datetime.date.today()
+    dates = [today + timedelta(days=i) for i in range(window_days + 1)]
+    date_strs = [day.strftime("%d.%m.%Y") for day in dates]
+    
+    snapshots = await day_cache.get_snapshots(date_strs)
+    timelines = {day: snapshots[date_str].timeline for day, date_str in zip(dates, date_strs)}
+    free_slots = booking_logic.count_available_slots_by_date(timelines, equipment_required=equipment)
+    
+    days = []
+    formatted_lines = []
+    for day, date_str in zip(dates, date_strs):
+        count = free_slots[day]
+        days.append({"date": date_str, "free_slots": count})
+        mark = "✅" if count else "❌"
+        formatted_lines.append(f"{mark} {date_str} ({WEEKDAY_NAMES[day.weekday()]}): {count}")
+    
+    return {"result": "\n".join(formatted_lines), "days": days}
+
+
 @app.post("/api/v1/bookings", status_code=201) # status_code=201 означает "Created"
 async def create_booking(booking_data: schemas.BookingCreate):
     """
@@ -130,36 +272,6 @@ async def create_booking(booking_data: schemas.BookingCreate):
         logger.error(f"⚠️ Ошибка парсинга даты: {e} | {err_msg}")
         return {"status": "error", "result": "Неверный формат даты. Попробуй ещё раз или напиши @egor_savenko."}
     
-    # Проверка на дубли
-    existing_bookings = await nocodb_client.get_all_bookings_by_telegram_id(booking_data.telegram_id)
-    start_dt_check = datetime.datetime.strptime(booking_data.start_time, "%H:%M").time()
-    
-    for b in existing_bookings:
-        if (b["Дата посещения"] == booking_data.date and 
-            b["Время начала"][:5] == booking_data.start_time):
-            
-            logger.warning(f"⚠️ ДУБЛЬ ЗАПРОСА. Бронь на {booking_data.date} {booking_data.start_time} уже существует для этого юзера.")
-            return {"status": "error", "result": "Ты уже записан на это время! Возможно, это произошло случайно. Лучше проверь свои записи."}
-    
-    logger.info("🔍 Проверяем доступность слотов...")
-    
-    latest_bookings = await nocodb_client.get_bookings_by_date(booking_data.date)
-    latest_events = await nocodb_client.get_events_by_date(booking_data.date)
-    
-    timeline = booking_logic.calculate_timeline_load(latest_bookings, latest_events)
-    
-    current_max_duration = booking_logic.get_max_duration(
-        start_time_str=booking_data.start_time,
-        timeline=timeline,
-        equipment_required=booking_data.equipment
-    )
-    
-    logger.info(f"⏱ Доступная длительность: {current_max_duration} ч. Запрошено: {booking_data.duration_hours} ч.")
-    
-    if booking_data.duration_hours > current_max_duration:
-        logger.warning(f"⛔️ ОТКАЗ: Нет места. Доступно {current_max_duration}, надо {booking_data.duration_hours}")
-        return {"status": "error", "result": "Это время или его часть только что заняли 😕."}
-    
     start_dt = datetime.datetime.strptime(booking_data.start_time, "%H:%M")
     duration = timedelta(hours=booking_data.duration_hours)
     end_dt = start_dt + duration
@@ -179,28 +291,150 @@ async def create_booking(booking_data: schemas.BookingCreate):
         "Telegram ID": booking_data.telegram_id
     }
     
-    logger.info(f"📤 Отправляем запрос в NocoDB: {data_for_nocodb}")
+    logger.info(f"🔍 Проверяем дубли и доступность слотов, затем отправляем в NocoDB: {data_for_nocodb}")
     
-    new_booking = await nocodb_client.create_booking(data_for_nocodb)
+    with tracing.span("admission", date=booking_data.date):
+        admission = await booking_admission.admit_booking(data_for_nocodb, booking_data.duration_hours)
     
-    if not new_booking:
+    if admission.status == booking_admission.DUPLICATE:
+        logger.warning(f"⚠️ ДУБЛЬ ЗАПРОСА. Бронь на {booking_data.date} {booking_data.start_time} уже существует для этого юзера.")
+        return {"status": "error", "result": "Ты уже записан на это время! Возможно, это произошло случайно. Лучше проверь свои записи."}
+    
+    logger.info(f"⏱ Доступная длительность: {admission.max_duration} ч. Запрошено: {booking_data.duration_hours} ч.")
+    
+    if admission.status == booking_admission.NO_CAPACITY:
+        logger.warning(f"⛔️ ОТКАЗ: Нет места. Доступно {admission.max_duration}, надо {booking_data.duration_hours}")
+        return {"status": "error", "result": "Это время или его часть только что заняли 😕."}
+    
+    if admission.status == booking_admission.FAILED:
         logger.error("❌ NocoDB вернула пустой ответ или ошибку.")
         return {"status": "error", "result": "Техническая ошибка сервера. Попробуй позже или напиши @egor_savenko."}
     
-    logger.info(f"✅ Бронь успешно создана! ID: {new_booking.get('Id')}")    
+    logger.info(f"✅ Бронь успешно создана! ID: {admission.booking_id}")    
     
     return {
             "status": "success", 
             "result": end_time_str,
-            "booking_id": new_booking.get('Id')
+            "booking_id": admission.booking_id
+        }
+    
+    
+@app.post("/api/v1/bookings/bulk", status_code=201)
+async def create_bookings_bulk(bulk_data: schemas.BookingBulkCreate):
+    """
+    Эндпоинт для пакетной (повторяющейся) записи: одно и то же время на несколько дат.
+    Даты берутся из списка dates и/или из правила recurrence. Каждая дата
+    проверяется отдельно: прошедшие и вне абонемента, а затем занятые отклоняются,
+    остальные создаются одним запросом.
+    """
+    
+    logger.info(f"🚀 ПАКЕТНАЯ ЗАПИСЬ. Telegram ID: {bulk_data.telegram_id}. Данные: {bulk_data.model_dump()}")
+    
+    date_strs = list(dict.fromkeys(bulk_data.dates))
+    # Проверяем число дат до разворачивания правила, чтобы не строить огромный список
+    if len(date_strs) + (bulk_data.recurrence.count if bulk_data.recurrence else 0) > settings.BULK_BOOKING_MAX_DATES:
+        return {"status": "error", "result": f"За раз можно записаться не больше чем на {settings.BULK_BOOKING_MAX_DATES} дат."}
+    try:
+        for date_str in date_strs:
+            parse_date_from_str(date_str)
+        if bulk_data.recurrence:
+            rule = bulk_data.recurrence
+            first_date = parse_date_from_str(rule.start_date)
+            for i in range(rule.count):
+                date_strs.append((first_date + timedelta(days=i * rule.interval_days)).strftime("%d.%m.%Y"))
+        start_dt = datetime.datetime.strptime(bulk_data.start_time, "%H:%M")
+    except Exception as e:
+        logger.error(f"⚠️ Ошибка в датах пакетной записи: {e}")
+        return {"status": "error", "result": "Неверный формат даты или времени. Попробуй ещё раз или напиши @egor_savenko."}
+    
+    # Убираем повторы, сохраняя порядок
+    date_strs = list(dict.fromkeys(date_strs))
+    if not date_strs:
+        return {"status": "error", "result": "Не указано ни одной даты."}
+    
+    end_dt = start_dt + timedelta(hours=bulk_data.duration_hours)
+    end_time_str = end_dt.strftime("%H:%M")
+    
+    telegram_field_value = bulk_data.telegram
+    if bulk_data.telegram == "—" or bulk_data.telegram == "":
+        telegram_field_value = bulk_data.fullname
+    
+    # Та же проверка абонемента, что и при выборе времени для одной брони
+    abonement_data = await member_cache.get_abonement(bulk_data.telegram_id)
+    date_errors = {}
+    for date_str in date_strs:
+        abonement_error = check_abonement_window(abonement_data, parse_date_from_str(date_str), date_str)
+        if abonement_error:
+            date_errors[date_str] = abonement_error
+    
+    records = [
+        {
+            "Telegram": telegram_field_value,
+            "Дата посещения": date_str,
+            "Время начала": start_dt.strftime("%H:%M:%S"),
+            "Время конца": end_dt.strftime("%H:%M:%S"),
+            "Оборудование": bulk_data.equipment,
+            "Что будет делать": bulk_data.activity,
+            "Telegram ID": bulk_data.telegram_id
+        }
+        for date_str in date_strs
+        if date_str not in date_errors
+    ]
+    
+    admitted = []
+    if records:
+        with tracing.span("admission", dates=len(records)):
+            admitted = await booking_admission.admit_bookings_bulk(records, bulk_data.duration_hours)
+    admitted_iter = iter(admitted)
+    admissions = [
+        booking_admission.AdmissionResult(booking_admission.REJECTED) if date_str in date_errors else next(admitted_iter)
+        for date_str in date_strs
+    ]
+    
+    reasons = {
+        booking_admission.DUPLICATE: "ты уже записан на это время",
+        booking_admission.NO_CAPACITY: "это время занято",
+        booking_admission.FAILED: "техническая ошибка",
+    }
+    lines = []
+    bookings = []
+    for date_str, admission in zip(date_strs, admissions):
+        bookings.append({
+            "date": date_str,
+            "status": admission.status,
+            "booking_id": admission.booking_id,
+            "max_duration": admission.max_duration,
+        })
+        if admission.status == booking_admission.ADMITTED:
+            lines.append(f"✅ {date_str}: {bulk_data.start_time} — {end_time_str}")
+        elif admission.status == booking_admission.REJECTED:
+            lines.append(f"❌ {date_str}: {date_errors[date_str].removeprefix('❌ ')}")
+        else:
+            lines.append(f"❌ {date_str}: {reasons[admission.status]}")
+    
+    admitted_count = sum(1 for admission in admissions if admission.status == booking_admission.ADMITTED)
+    logger.info(f"✅ Пакетная запись: создано {admitted_count} из {len(date_strs)}")
+    
+    if admitted_count == len(date_strs):
+        status = "success"
+    elif admitted_count:
+        status = "partial"
+    else:
+        status = "error"
+    
+    return {
+            "status": status,
+            "result": "\n".join(lines),
+            "bookings": bookings
         }
     
     
-@app.get("/api/v1/my_bookings")
-async def get_my_bookings(telegram_id: str):
+@app.get("/api/v1/my_bookings", response_model=schemas.TextResult)
+async def get_my_bookings(telegram_id: str, request: Request, response: Response):
     """
     Находит будущие брони пользователя по Telegram ID, форматирует их в красивую строку
     и кэширует ID броней для последующей отмены.
+    ETag считается по самим броням и мероприятиям на их даты (If-None-Match -> 304).
     """
     all_bookings = await nocodb_client.get_all_bookings_by_telegram_id(telegram_id)
     
@@ -228,18 +462,26 @@ async def get_my_bookings(telegram_id: str):
     if not future_bookings:
         return {"result": "У тебя пока нет записей.\nХочешь записаться? 👇"}
 
-    # --- Получаем мероприятия, проверим пересечения ниже ---
-    unique_dates = {b["Дата посещения"] for b in future_bookings}
-    events_map = {} 
-    
-    for date_str in unique_dates:
-        events = await nocodb_client.get_events_by_date(date_str)
-        if events:
-            events_map[date_str] = events
+    # Карту "номер -> Id" обновляем и при 304: клиент покажет прежний список с теми же номерами
+    booking_map = {str(i): booking["Id"] for i, booking in enumerate(future_bookings, 1)}
+    session_store.cancel_maps.set(telegram_id, booking_map)
+
+    # --- Мероприятия на все даты берём из снимков дня, проверим пересечения ниже ---
+    unique_dates = sorted({b["Дата посещения"] for b in future_bookings})
+    snapshots = await day_cache.get_snapshots(unique_dates)
+    events_map = {date_str: snapshots[date_str].events for date_str in unique_dates}
+
+    etag = http_cache.make_etag(
+        [(b["Id"], b["Дата посещения"], b["Время начала"], b["Время конца"], b.get("Оборудование"), b.get("Что будет делать"))
+         for b in future_bookings],
+        [(date_str, snapshots[date_str].events_fingerprint) for date_str in unique_dates],
+    )
+    cached = http_cache.conditional(request, response, etag)
+    if cached is not None:
+        return cached
     
     # --- Форматирование списка ---
     formatted_lines = ["Твои записи:"]
-    booking_map = {} 
 
     for i, booking in enumerate(future_bookings, 1):
         start_time_short = booking['Время начала'][:5]
@@ -269,33 +511,41 @@ async def get_my_bookings(telegram_id: str):
                     break 
             
         formatted_lines.append(line)
-        booking_map[str(i)] = booking['Id']
-
-    USER_BOOKING_CACHE[telegram_id] = {
-        "map": booking_map,
-        "timestamp": datetime.datetime.now()
-    }
 
     final_text = "\n\n".join(formatted_lines)
     return {"result": final_text}
 
 
-@app.get("/api/v1/daily_bookings")
-async def get_daily_bookings(date_str: str = Query(..., alias="date")):
+@app.get("/api/v1/daily_bookings", response_model=schemas.TextResult)
+async def get_daily_bookings(request: Request, response: Response, date_str: str = Query(..., alias="date")):
     """
     Возвращает список всех броней на конкретную дату.
+    ETag считается по выводимым полям броней: неизменившийся день отдаётся как 304 без форматирования.
+    Версия снимка для этого не годится — она начинается заново, когда дата загружается повторно.
     """
     try:
         parse_date_from_str(date_str)
     except Exception:
          return {"result": "Неверный формат даты. Пожалуйста, попробуй ещё раз или напиши @egor_savenko"}
 
-    bookings = await nocodb_client.get_bookings_by_date(date_str)
+    snapshot = await day_cache.get_snapshot(date_str)
 
-    if not bookings:
+    # Если день не удалось загрузить, "пустой" ответ не кэшируем
+    if snapshot.loaded:
+        etag = http_cache.make_etag(date_str, [
+            (booking.get("Telegram"), booking.get("Время начала"), booking.get("Время конца"),
+             booking.get("Оборудование"), booking.get("Что будет делать"))
+            for booking in snapshot.bookings
+        ])
+        cached = http_cache.conditional(request, response, etag)
+        if cached is not None:
+            return cached
+
+    if not snapshot.bookings:
         return {"result": f"Ой, кажется, ты будешь первым :)"}
 
-    bookings.sort(key=lambda b: b["Время начала"])
+    # Список из кэша общий для всех запросов, поэтому сортируем копию
+    bookings = sorted(snapshot.bookings, key=lambda b: b["Время начала"])
     
     formatted_lines = []
 
@@ -329,25 +579,17 @@ async def cancel_booking(cancel_data: schemas.BookingCancel):
     telegram_id = cancel_data.telegram_id
     booking_number = cancel_data.booking_number
     
-    # --- Сценарий: Кэш не найден или устарел ---
-    cached_user_data = USER_BOOKING_CACHE.get(telegram_id)
+    # --- Сценарий: Список не найден или устарел (хранилище само удаляет его по TTL) ---
+    booking_map = session_store.cancel_maps.get(telegram_id)
     
-    if not cached_user_data:
+    if not booking_map:
         return {
             "status": "error",
             "message": "Список записей устарел. Пожалуйста, открой 'Мои записи' и попробуй снова."
         }
-    
-    cache_age = datetime.datetime.now() - cached_user_data["timestamp"]
-    if cache_age > timedelta(minutes=CACHE_LIFETIME_MINUTES):
-        del USER_BOOKING_CACHE[telegram_id] # Чистим устаревший кэш
-        return {
-            "status": "error",
-            "message": "Список записей устарел (прошло более 30 минут). Пожалуйста, открой 'Мои записи' и попробуй снова."
-        }
 
     # --- Сценарий: Номер записи не найден в кэше ---
-    booking_id_to_delete = cached_user_data["map"].get(booking_number)
+    booking_id_to_delete = booking_map.get(booking_number)
     
     if not booking_id_to_delete:
         return {
@@ -359,7 +601,8 @@ async def cancel_booking(cancel_data: schemas.BookingCancel):
     success = await nocodb_client.delete_booking_by_id(booking_id_to_delete)
     
     if success:
-        del USER_BOOKING_CACHE[telegram_id]
+        day_cache.remove_booking(booking_id_to_delete)
+        session_store.cancel_maps.delete(telegram_id)
         return {
             "status": "success",
             "message": "✅ Запись успешно отменена!"
@@ -389,7 +632,8 @@ async def calculate_firing_cost(data: schemas.FiringCalculationRequest):
     total_cost = item_base_cost * data.quantity
     logger.info(f"💰 Базовая стоимость: {total_cost} руб.")
 
-    is_client = await nocodb_client.check_client_exists(data.telegram_id)
+    # Скидка участникам конкурса сейчас выключена, поэтому конкурс не проверяем
+    is_client = await member_cache.is_client(data.telegram_id)
     
     if not is_client:
         logger.info("👤 Пользователь не найден в Clients. Наценка +25%.")
@@ -397,8 +641,6 @@ async def calculate_firing_cost(data: schemas.FiringCalculationRequest):
     else:
         logger.info("👤 Пользователь найден в Clients. Цена стандартная.")
 
-    is_contestant = await nocodb_client.check_contest_participant(data.telegram_id)
-    
     # if is_contestant:
         # logger.info("🏆 Участник конкурса! Скидка -15%.")
         # total_cost = total_cost * 0.85
@@ -407,4 +649,43 @@ async def calculate_firing_cost(data: schemas.FiringCalculationRequest):
 
     logger.info(f"✅ Итоговая цена: {final_price}")
 
-    return {"result": final_price}
\ No newline at end of file
+    return {"result": final_price}
+
+
+@app.post("/api/v1/firing_quote", status_code=200)
+async def firing_quote(data: schemas.FiringQuoteRequest):
+    """
+    Рассчитывает стоимость обжига сразу для нескольких позиций.
+    Статус клиента проверяется один раз на весь расчёт.
+    """
+    logger.info(f"🔥 РАСЧЕТ ОБЖИГА (корзина). ID: {data.telegram_id}. Позиций: {len(data.items)}")
+
+    if not data.items:
+        return {"result": "Ошибка: Не указано ни одного изделия.", "total": 0, "items": []}
+
+    unit_prices = []
+    for item in data.items:
+        unit_price = firing_logic.calculate_base_item_cost(item.size, item.firing_type, item.glaze_type)
+        if unit_price == -1 or item.quantity < 1:
+            logger.error(f"❌ Неверные параметры обжига: {item.size}, {item.firing_type}, {item.quantity} шт")
+            return {"result": f"Ошибка: Неверно указан размер, тип обжига или количество ({item.size}, {item.firing_type}).", "total": 0, "items": []}
+        unit_prices.append(unit_price)
+
+    is_client = await member_cache.is_client(data.telegram_id)
+    markup = 1 if is_client else 1.25
+    if not is_client:
+        logger.info("👤 Пользователь не найден в Clients. Наценка +25%.")
+
+    items = []
+    formatted_lines = []
+    for item, unit_price in zip(data.items, unit_prices):
+        price = round(unit_price * item.quantity * markup)
+        items.append({**item.model_dump(), "price": price})
+        formatted_lines.append(f"• {item.size}, {item.firing_type}, {item.glaze_type} × {item.quantity}: {price} руб.")
+
+    total = sum(item["price"] for item in items)
+    formatted_lines.append(f"Итого: {total} руб.")
+
+    logger.info(f"✅ Итоговая цена корзины: {total}")
+
+    return {"result": "\n".join(formatted_lines), "total": total, "items": items}
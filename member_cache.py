@@ -0,0 +1,188 @@
+import asyncio
+import datetime
+import logging
+import time
+
+import httpx
+
+import nocodb_client
+from cache import TTLCache
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Статус участника меняется редко, поэтому абонемент, "клиент" и "участник конкурса"
+# кэшируются по Telegram ID. Отрицательные ответы ("не найден") тоже кэшируются,
+# но короче — чтобы только что купленный абонемент появился быстро.
+# Ошибки NocoDB не кэшируются.
+
+_NOT_FOUND = object()
+
+# Telegram ID -> (дата окончания, запись абонемента) или _NOT_FOUND
+_abonements = TTLCache(
+    ttl_seconds=settings.MEMBER_CACHE_TTL_SECONDS,
+    max_entries=settings.MEMBER_CACHE_MAX_USERS,
+    name="abonements",
+)
+# Telegram ID -> bool
+_clients = TTLCache(
+    ttl_seconds=settings.MEMBER_CACHE_TTL_SECONDS,
+    max_entries=settings.MEMBER_CACHE_MAX_USERS,
+    name="clients",
+)
+_contestants = TTLCache(
+    ttl_seconds=settings.MEMBER_CACHE_TTL_SECONDS,
+    max_entries=settings.MEMBER_CACHE_MAX_USERS,
+    name="contestants",
+)
+
+# Предзагрузка целых таблиц в множества (MEMBER_PRELOAD_ENABLED)
+_client_ids: set[str] = set()
+_contest_ids: set[str] = set()
+_preloaded_at: dict[str, float] = {}   # "clients" / "contest" -> time.monotonic()
+_preload_task: asyncio.Task | None = None
+
+
+def _preloaded(name: str) -> bool:
+    """Множество загружено и не старше двух периодов обновления."""
+    loaded_at = _preloaded_at.get(name)
+    if loaded_at is None:
+        return False
+    return time.monotonic() - loaded_at < 2 * settings.MEMBER_PRELOAD_INTERVAL_SECONDS
+
+
+# --- Абонементы ---
+
+def _with_days_left(expires_on: datetime.date, abonement: dict) -> dict:
+    """Копия записи с "Осталось дней", пересчитанным на сегодня из даты окончания."""
+    days_left = (expires_on - datetime.date.today()).days
+    return {**abonement, "Осталось дней": days_left}
+
+
+async def get_abonement(telegram_id: str) -> dict | None:
+    """
+    Абонемент пользователя (как nocodb_client.get_abonement_by_telegram_id).
+    В кэше хранится дата окончания, поэтому "Осталось дней" не устаревает внутри TTL.
+    """
+    key = str(telegram_id)
+    cached = _abonements.get(key)
+    if cached is _NOT_FOUND:
+        return None
+    if cached is not None:
+        return _with_days_left(*cached)
+
+    try:
+        abonement = await nocodb_client.get_abonement_by_telegram_id(key, raise_errors=True)
+    except httpx.HTTPError as e:
+        logger.error(f"❌ Не удалось получить абонемент {key}: {e}")
+        return None
+
+    if abonement is None:
+        _abonements.set(key, _NOT_FOUND, ttl_seconds=settings.MEMBER_CACHE_NEGATIVE_TTL_SECONDS)
+        return None
+
+    try:
+        days_left = int(abonement.get("Осталось дней", 0))
+    except (TypeError, ValueError):
+        days_left = 0
+    expires_on = datetime.date.today() + datetime.timedelta(days=days_left)
+    _abonements.set(key, (expires_on, abonement))
+    return _with_days_left(expires_on, abonement)
+
+
+# --- Клиенты и конкурс ---
+
+async def _cached_flag(
+    cache: TTLCache,
+    preload_name: str,
+    preloaded_ids: set[str],
+    check,
+    telegram_id: str,
+) -> bool:
+    key = str(telegram_id)
+    if _preloaded(preload_name):
+        return key in preloaded_ids
+
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    try:
+        found = await check(key, raise_errors=True)
+    except Exception as e:
+        logger.error(f"❌ Не удалось проверить {cache.name} для {key}: {e}")
+        return False
+
+    cache.set(key, found, ttl_seconds=None if found else settings.MEMBER_CACHE_NEGATIVE_TTL_SECONDS)
+    return found
+
+
+async def is_client(telegram_id: str) -> bool:
+    """Есть ли пользователь в таблице Clients."""
+    return await _cached_flag(_clients, "clients", _client_ids, nocodb_client.check_client_exists, telegram_id)
+
+
+async def is_contestant(telegram_id: str) -> bool:
+    """Участвует ли пользователь в конкурсе."""
+    return await _cached_flag(_contestants, "contest", _contest_ids, nocodb_client.check_contest_participant, telegram_id)
+
+
+def invalidate(telegram_id: str) -> None:
+    """Забывает всё, что известно о пользователе."""
+    key = str(telegram_id)
+    _abonements.pop(key)
+    _clients.pop(key)
+    _contestants.pop(key)
+
+
+# --- Предзагрузка ---
+
+async def preload() -> None:
+    """Загружает Telegram ID из Clients и таблицы конкурса целиком."""
+    global _client_ids, _contest_ids
+
+    async def load(name: str, table_id: str) -> set[str] | None:
+        try:
+            ids = await nocodb_client.get_all_telegram_ids(table_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Предзагрузка {name} не удалась: {e}")
+            return None
+        _preloaded_at[name] = time.monotonic()
+        return ids
+
+    client_ids, contest_ids = await nocodb_client.gather_limited(
+        load("clients", nocodb_client.CLIENTS_TABLE_ID),
+        load("contest", nocodb_client.FIRING_CONTEST_TABLE_ID),
+    )
+    if client_ids is not None:
+        _client_ids = client_ids
+    if contest_ids is not None:
+        _contest_ids = contest_ids
+    logger.info(f"👥 Предзагрузка участников: клиентов {len(_client_ids)}, участников конкурса {len(_contest_ids)}")
+
+
+async def _preload_loop() -> None:
+    while True:
+        await preload()
+        await asyncio.sleep(settings.MEMBER_PRELOAD_INTERVAL_SECONDS)
+
+
+def start() -> None:
+    """Запускает периодическую предзагрузку (если MEMBER_PRELOAD_ENABLED)."""
+    global _preload_task
+    if not settings.MEMBER_PRELOAD_ENABLED or _preload_task is not None:
+        return
+    _preload_task = asyncio.create_task(_preload_loop())
+
+
+async def stop() -> None:
+    global _preload_task
+    if _preload_task is None:
+        return
+    _preload_task.cancel()
+    try:
+        await _preload_task
+    except asyncio.CancelledError:
+        pass
+    _preload_task = None
+    _preloaded_at.clear()
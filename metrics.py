@@ -0,0 +1,224 @@
+"""
+Метрики процесса в формате Prometheus (эндпоинт /metrics).
+
+Всё хранится в памяти процесса простыми счётчиками: наблюдение — это поиск корзины
+bisect'ом и пара сложений, поэтому метрики можно держать включёнными всегда.
+При нескольких воркерах у каждого свои метрики (Prometheus различает их по instance/pid).
+"""
+import bisect
+import math
+import os
+import re
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import cache
+import session_store
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: dict[tuple, float] = {}
+        REGISTRY.append(self)
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    def dec(self, *labels, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float) -> None:
+        self._values[labels] = value
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        # labels -> [счётчики по корзинам (не накопленные) + корзина +Inf, сумма]
+        self._values: dict[tuple, list] = {}
+        REGISTRY.append(self)
+
+    def observe(self, value: float, *labels) -> None:
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+REGISTRY: list = []
+
+# --- HTTP API ---
+http_request_duration = Histogram(
+    "artchaos_http_request_duration_seconds", "Время обработки запроса к API", ("method", "route", "status")
+)
+http_requests_in_flight = Gauge("artchaos_http_requests_in_flight", "Запросы к API в обработке")
+http_exceptions = Counter("artchaos_http_exceptions_total", "Необработанные исключения в обработчиках", ("route",))
+
+# --- NocoDB ---
+nocodb_request_duration = Histogram(
+    "artchaos_nocodb_request_duration_seconds", "Время запроса к NocoDB", ("table", "operation", "status")
+)
+nocodb_requests_in_flight = Gauge("artchaos_nocodb_requests_in_flight", "Запросы к NocoDB в полёте")
+nocodb_errors = Counter(
+    "artchaos_nocodb_errors_total", "Ошибки запросов к NocoDB (HTTP-статус >= 400 или сетевые)", ("table", "operation", "kind")
+)
+nocodb_timeouts = Counter("artchaos_nocodb_timeouts_total", "Таймауты запросов к NocoDB", ("table", "operation"))
+
+# Имена таблиц для меток: table_id -> имя (заполняет nocodb_client)
+TABLE_NAMES: dict[str, str] = {}
+_TABLE_ID_RE = re.compile(r"/tables/([^/?]+)(/links)?")
+
+
+def nocodb_labels(method: str, url: str) -> tuple[str, str]:
+    """(таблица, операция) по URL запроса к NocoDB: ("bookings", "GET records")."""
+    match = _TABLE_ID_RE.search(url)
+    if match is None:
+        return "other", method
+    table = TABLE_NAMES.get(match.group(1), match.group(1))
+    return table, f"{method} {'links' if match.group(2) else 'records'}"
+
+
+# --- Кэши (снимаются в момент сбора) ---
+
+def _cache_lines() -> list[str]:
+    metrics = (
+        ("artchaos_cache_hits_total", "counter", "Попадания в кэш", "hits"),
+        ("artchaos_cache_misses_total", "counter", "Промахи кэша", "misses"),
+        ("artchaos_cache_evictions_total", "counter", "Вытеснения из кэша (LRU/память)", "evictions"),
+        ("artchaos_cache_expirations_total", "counter", "Записи, удалённые по TTL", "expirations"),
+        ("artchaos_cache_entries", "gauge", "Записей в кэше", "entries"),
+        ("artchaos_cache_bytes", "gauge", "Оценка памяти под кэш, байт", "bytes"),
+    )
+    stats = [(instance.name or "unnamed", instance.stats()) for instance in cache.all_caches()]
+    # Общие хранилища (SQLite) считают только свои попадания/промахи и число записей
+    stats += [(store.name, store.stats()) for store in session_store.shared_stores()]
+    lines = []
+    for name, kind, help_text, key in metrics:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for cache_name, values in stats:
+            if key in values:
+                lines.append(f'{name}{{cache="{_escape(cache_name)}"}} {values[key]}')
+    lines.append("# HELP artchaos_cache_hit_ratio Доля попаданий в кэш с запуска процесса")
+    lines.append("# TYPE artchaos_cache_hit_ratio gauge")
+    for cache_name, values in stats:
+        lookups = values["hits"] + values["misses"]
+        ratio = values["hits"] / lookups if lookups else 0.0
+        lines.append(f'artchaos_cache_hit_ratio{{cache="{_escape(cache_name)}"}} {_number(ratio)}')
+    return lines
+
+
+def render() -> str:
+    """Все метрики в текстовом формате Prometheus 0.0.4."""
+    lines = [
+        "# HELP artchaos_process_info Процесс API (метрики считаются отдельно в каждом воркере)",
+        "# TYPE artchaos_process_info gauge",
+        f'artchaos_process_info{{pid="{os.getpid()}"}} 1',
+    ]
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    lines.extend(_cache_lines())
+    return "\n".join(lines) + "\n"
+
+
+# --- Middleware для API ---
+
+class MetricsMiddleware:
+    """
+    Замеряет каждый HTTP-запрос. Метка route — шаблон пути (/api/v1/bookings),
+    а не сам путь, чтобы число серий не росло от параметров.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            http_exceptions.inc(_route_label(scope))
+            raise
+        finally:
+            http_requests_in_flight.dec()
+            http_request_duration.observe(
+                time.perf_counter() - started, scope["method"], _route_label(scope), str(status_code)
+            )
+
+
+def _route_label(scope: Scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
@@ -1,8 +1,12 @@
+import asyncio
 import logging
 import httpx
-import datetime
-from urllib.parse import quote
+import time
+from typing import AsyncIterator
 
+import metrics
+import replica
+import tracing
 from config import settings
 
 # --- КОНСТАНТЫ: ID ТАБЛИЦ В NOCODB ---
@@ -13,6 +17,19 @@ CLIENTS_TABLE_ID = "mq217glyrctsqrh"
 FIRING_CONTEST_TABLE_ID = "m8opdrugw7vxnnz"
 LESSONS_TABLE_ID = "myl53r82w4rt3yo"
 PROGRESS_TABLE_ID = "mdhmuk06amqut8a"
+# Поле-связь Progress -> Lessons (Completed_Lessons)
+COMPLETED_LESSONS_LINK_ID = "cko3o2xhzsm3yrs"
+
+# Имена таблиц для меток метрик
+metrics.TABLE_NAMES.update({
+    BOOKINGS_TABLE_ID: "bookings",
+    EVENTS_TABLE_ID: "events",
+    ABONEMENTS_TABLE_ID: "abonements",
+    CLIENTS_TABLE_ID: "clients",
+    FIRING_CONTEST_TABLE_ID: "firing_contest",
+    LESSONS_TABLE_ID: "lessons",
+    PROGRESS_TABLE_ID: "progress",
+})
 
 # --- Константы и базовые настройки ---
 BASE_URL = f"{settings.NOCODB_URL}/api/v2/tables"
@@ -20,8 +37,253 @@ HEADERS = {
     "xc-token": settings.NOCODB_API_TOKEN
 }
 
+READ_TIMEOUT = httpx.Timeout(
+    settings.NOCODB_READ_TIMEOUT,
+    connect=settings.NOCODB_CONNECT_TIMEOUT,
+    pool=settings.NOCODB_POOL_TIMEOUT,
+)
+WRITE_TIMEOUT = httpx.Timeout(
+    settings.NOCODB_WRITE_TIMEOUT,
+    connect=settings.NOCODB_CONNECT_TIMEOUT,
+    pool=settings.NOCODB_POOL_TIMEOUT,
+)
+
+# Больше строк за один запрос NocoDB не отдаёт (limit по умолчанию ограничен 1000)
+MAX_PAGE_SIZE = 1000
+# Сколько Id перечисляем в одном фильтре (Id,in,...) — чтобы не упереться в длину URL
+IDS_PER_QUERY = 200
+
 logger = logging.getLogger(__name__)
 
+_client: httpx.AsyncClient | None = None
+
+
+# --- Общий HTTP-клиент (один пул соединений на процесс) ---
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _build_client(transport: httpx.AsyncBaseTransport | None = None) -> httpx.AsyncClient:
+    http2 = settings.NOCODB_HTTP2
+    if http2 and not _http2_available():
+        logger.warning("⚠️ NOCODB_HTTP2 включён, но пакет h2 не установлен. Работаем по HTTP/1.1.")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=settings.NOCODB_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.NOCODB_MAX_KEEPALIVE,
+        keepalive_expiry=settings.NOCODB_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        headers=HEADERS,
+        limits=limits,
+        timeout=READ_TIMEOUT,
+        http2=http2,
+        transport=transport,
+    )
+
+
+async def open_client(transport: httpx.AsyncBaseTransport | None = None) -> None:
+    """Открывает общий клиент. Вызывается из lifespan приложения."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        return
+    _client = _build_client(transport)
+    logger.info("🔌 HTTP-клиент NocoDB открыт.")
+
+
+async def close_client() -> None:
+    """Закрывает общий клиент и все соединения пула."""
+    global _client
+    if _client is None:
+        return
+    await _client.aclose()
+    _client = None
+    logger.info("🔌 HTTP-клиент NocoDB закрыт.")
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Возвращает общий клиент.
+    Если lifespan не запускался (например, скрипт или REPL), создаёт клиент лениво.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def _request(method: str, url: str, **kwargs) -> httpx.Response:
+    """Выполняет запрос через общий клиент с таймаутом по типу операции."""
+    if "timeout" not in kwargs:
+        kwargs["timeout"] = READ_TIMEOUT if method == "GET" else WRITE_TIMEOUT
+    table, operation = metrics.nocodb_labels(method, url)
+    status = "error"
+    response = None
+    metrics.nocodb_requests_in_flight.inc()
+    started = time.perf_counter()
+    try:
+        response = await get_client().request(method, url, **kwargs)
+        status = str(response.status_code)
+        if response.status_code >= 400:
+            metrics.nocodb_errors.inc(table, operation, f"http_{response.status_code}")
+        return response
+    except httpx.TimeoutException:
+        status = "timeout"
+        metrics.nocodb_timeouts.inc(table, operation)
+        raise
+    except httpx.HTTPError as e:
+        metrics.nocodb_errors.inc(table, operation, type(e).__name__)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.nocodb_requests_in_flight.dec()
+        metrics.nocodb_request_duration.observe(elapsed, table, operation, status)
+        size = len(response.content) if response is not None else 0
+        tracing.record_nocodb(table, operation, kwargs.get("params"), status, started, elapsed, size)
+
+
+async def gather_limited(*aws, limit: int | None = None) -> list:
+    """
+    Выполняет независимые запросы к NocoDB параллельно, но не больше limit одновременно.
+    Результаты возвращаются в том же порядке, что и аргументы (как у asyncio.gather).
+    Семафор свой на каждый вызов, поэтому вложенные gather_limited не блокируют друг друга.
+    """
+    semaphore = asyncio.Semaphore(limit or settings.NOCODB_FANOUT_LIMIT)
+
+    async def run(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(run(aw) for aw in aws))
+
+
+def _any_of_filter(field_name: str, values: list[str]) -> str:
+    """Собирает условие "поле равно любому из значений": (f,eq,a)~or(f,eq,b)..."""
+    return "~or".join(f"({field_name},eq,{value})" for value in values)
+
+
+def _chunks(values: list, size: int) -> list[list]:
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+# --- Постраничное чтение ---
+
+async def _fetch_page(table_id: str, params: dict, offset: int, page_size: int) -> dict:
+    request_url = f"{BASE_URL}/{table_id}/records"
+    response = await _request("GET", request_url, params={**params, "limit": page_size, "offset": offset})
+    response.raise_for_status()
+    return response.json()
+
+
+async def iter_records(
+    table_id: str,
+    where: str | None = None,
+    sort: str | None = None,
+    fields: str | None = None,
+    page_size: int | None = None,
+    prefetch: bool = True,
+    max_records: int | None = None,
+) -> AsyncIterator[dict]:
+    """
+    Асинхронно отдаёт записи таблицы по одной, проходя страницы по pageInfo.
+
+    prefetch=True запрашивает следующую страницу, пока вызывающий код
+    обрабатывает текущую. max_records останавливает чтение досрочно.
+    При досрочном выходе из цикла генератор лучше закрывать явно
+    (contextlib.aclosing), тогда запрос следующей страницы отменится сразу.
+    Ошибки NocoDB (httpx.HTTPError) пробрасываются наружу.
+    """
+    page_size = page_size or settings.NOCODB_PAGE_SIZE
+    if max_records is not None:
+        page_size = max(1, min(page_size, max_records))
+
+    params = {}
+    if where:
+        params["where"] = where
+    if sort:
+        params["sort"] = sort
+    if fields:
+        params["fields"] = fields
+
+    offset = 0
+    yielded = 0
+    next_page: asyncio.Task | None = asyncio.create_task(_fetch_page(table_id, params, offset, page_size))
+
+    try:
+        while next_page is not None:
+            payload = await next_page
+            next_page = None
+
+            page = payload.get("list", [])
+            page_info = payload.get("pageInfo") or {}
+            offset += len(page)
+
+            is_last = page_info.get("isLastPage", True) or not page
+            if max_records is not None and yielded + len(page) >= max_records:
+                is_last = True
+
+            if not is_last:
+                next_page = _fetch_page(table_id, params, offset, page_size)
+                if prefetch:
+                    next_page = asyncio.create_task(next_page)
+
+            for record in page:
+                if max_records is not None and yielded >= max_records:
+                    return
+                yield record
+                yielded += 1
+    finally:
+        if next_page is not None:
+            if isinstance(next_page, asyncio.Task):
+                next_page.cancel()
+            else:
+                next_page.close()
+
+
+async def _collect(table_id: str, **kwargs) -> list:
+    """Читает выборку целиком в список."""
+    return [record async for record in iter_records(table_id, **kwargs)]
+
+
+async def _first(table_id: str, where: str) -> dict | None:
+    """Первая запись по фильтру или None (запрашивается ровно одна строка)."""
+    records = await _collect(table_id, where=where, max_records=1, prefetch=False)
+    return records[0] if records else None
+
+
+async def list_record_ids(table_id: str) -> list[int]:
+    """
+    Все Id таблицы по возрастанию. Страницы берутся по Id (Id > последнего прочитанного),
+    а не по offset: удаление строки посреди чтения не сдвигает следующие страницы.
+    """
+    ids: list[int] = []
+    while True:
+        params = {"fields": "Id", "sort": "Id"}
+        if ids:
+            params["where"] = f"(Id,gt,{ids[-1]})"
+        payload = await _fetch_page(table_id, params, 0, MAX_PAGE_SIZE)
+        page = [record["Id"] for record in payload.get("list", [])]
+        ids.extend(page)
+        if len(page) < MAX_PAGE_SIZE:
+            return ids
+
+
+async def get_existing_ids(table_id: str, record_ids: list[int]) -> set[int]:
+    """Какие из перечисленных Id ещё есть в таблице."""
+    existing: set[int] = set()
+    for chunk in _chunks(record_ids, IDS_PER_QUERY):
+        where = f"(Id,in,{','.join(str(record_id) for record_id in chunk)})"
+        records = await _collect(table_id, where=where, fields="Id", page_size=MAX_PAGE_SIZE)
+        existing.update(record["Id"] for record in records)
+    return existing
+
+
 # --- Функции для получения данных из NocoDB ---
 
 async def get_all_bookings_by_username(username: str) -> list:
@@ -29,92 +291,207 @@ async def get_all_bookings_by_username(username: str) -> list:
     
     username_field_name = "Telegram"
     
-    filter_query = quote(f"({username_field_name},eq,{username})")
+    if replica.is_fresh(BOOKINGS_TABLE_ID):
+        return replica.find(BOOKINGS_TABLE_ID, field_equals={username_field_name: username})
     
-    request_url = f"{BASE_URL}/{BOOKINGS_TABLE_ID}/records?where={filter_query}"
+    try:
+        return await _collect(BOOKINGS_TABLE_ID, where=f"({username_field_name},eq,{username})")
+    except httpx.HTTPStatusError as e:
+        logger.error(f"Ошибка при запросе к NocoDB (all bookings by username): {e}")
+        return []
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(request_url, headers=HEADERS)
-            response.raise_for_status() 
-            return response.json().get("list", [])
-        except httpx.HTTPStatusError as e:
-            print(f"Ошибка при запросе к NocoDB (all bookings by username): {e}")
-            return []
-        
 async def get_all_bookings_by_telegram_id(telegram_id: str) -> list:
     """Получает ВСЕ бронирования для указанного Telegram ID."""
     
     id_field_name = "Telegram ID"
     
-    filter_query = quote(f"({id_field_name},eq,{telegram_id})")
+    if replica.is_fresh(BOOKINGS_TABLE_ID):
+        return replica.find(BOOKINGS_TABLE_ID, telegram_id=telegram_id)
     
-    request_url = f"{BASE_URL}/{BOOKINGS_TABLE_ID}/records?where={filter_query}"
-    
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(request_url, headers=HEADERS)
-            response.raise_for_status() 
-            return response.json().get("list", [])
-        except httpx.HTTPStatusError as e:
-            print(f"Ошибка при запросе к NocoDB (all bookings by telegram_id): {e}")
-            return []
+    try:
+        return await _collect(BOOKINGS_TABLE_ID, where=f"({id_field_name},eq,{telegram_id})")
+    except httpx.HTTPStatusError as e:
+        logger.error(f"Ошибка при запросе к NocoDB (all bookings by telegram_id): {e}")
+        return []
 
-async def get_bookings_by_date(date_str: str) -> list:
-    """Получает все бронирования (Bookings) на указанную дату (поле — строка)."""
+async def get_bookings_by_date(date_str: str, raise_errors: bool = False) -> list:
+    """
+    Получает все бронирования (Bookings) на указанную дату (поле — строка).
+    С raise_errors=True ошибки NocoDB пробрасываются наружу, а не превращаются
+    в пустой список (нужно кэшу, чтобы не запомнить "пустой" день).
+    """
     
     date_field_name = "Дата посещения"
-    # date_str = date.strftime("%Y-%m-%d")
-    filter_query = quote(f"({date_field_name},eq,{date_str})")
     
-    request_url = f"{BASE_URL}/{BOOKINGS_TABLE_ID}/records?where={filter_query}"
+    if replica.is_fresh(BOOKINGS_TABLE_ID):
+        return replica.find(BOOKINGS_TABLE_ID, date_keys=[date_str])
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(request_url, headers=HEADERS)
-            response.raise_for_status() 
-            return response.json().get("list", [])
-        except httpx.HTTPStatusError as e:
-            print(f"Ошибка при запросе к NocoDB (Bookings): {e}")
-            return []
+    try:
+        return await _collect(BOOKINGS_TABLE_ID, where=f"({date_field_name},eq,{date_str})")
+    except httpx.HTTPStatusError as e:
+        if raise_errors:
+            raise
+        logger.error(f"Ошибка при запросе к NocoDB (Bookings): {e}")
+        return []
 
-async def get_events_by_date(date_str: str) -> list:
+async def get_events_by_date(date_str: str, raise_errors: bool = False) -> list:
     """Получает все мероприятия (Events), которые блокируют мастерскую на указанную дату."""
     
     date_field_name = "Дата"
     blocking_field_name = "Занять мастерскую?"
-    # date_str = date.strftime("%Y-%m-%d")
     
-    filter_query = quote(f"({date_field_name},eq,{date_str})~and({blocking_field_name},is,true)")
+    if replica.is_fresh(EVENTS_TABLE_ID):
+        return [e for e in replica.find(EVENTS_TABLE_ID, date_keys=[date_str]) if e.get(blocking_field_name)]
     
-    request_url = f"{BASE_URL}/{EVENTS_TABLE_ID}/records?where={filter_query}"
+    where = f"({date_field_name},eq,{date_str})~and({blocking_field_name},is,true)"
+    
+    try:
+        return await _collect(EVENTS_TABLE_ID, where=where)
+    except httpx.HTTPStatusError as e:
+        if raise_errors:
+            raise
+        logger.error(f"Ошибка при запросе к NocoDB (Events): {e}")
+        return []
+
+async def get_bookings_by_dates(date_strs: list[str], raise_errors: bool = False) -> list:
+    """Получает бронирования сразу на несколько дат (постранично, пачками дат)."""
+    date_field_name = "Дата посещения"
+
+    unique_dates = sorted(set(date_strs))
+    if not unique_dates:
+        return []
+
+    if replica.is_fresh(BOOKINGS_TABLE_ID):
+        return replica.find(BOOKINGS_TABLE_ID, date_keys=unique_dates)
+
+    async def fetch_chunk(chunk: list[str]) -> list:
+        try:
+            return await _collect(BOOKINGS_TABLE_ID, where=_any_of_filter(date_field_name, chunk))
+        except httpx.HTTPStatusError as e:
+            if raise_errors:
+                raise
+            logger.error(f"Ошибка при запросе к NocoDB (Bookings по датам): {e}")
+            return []
+
+    chunks = _chunks(unique_dates, settings.NOCODB_DATES_PER_QUERY)
+    results = await gather_limited(*(fetch_chunk(chunk) for chunk in chunks))
+    return [booking for chunk_bookings in results for booking in chunk_bookings]
+
+async def get_events_by_dates(date_strs: list[str], raise_errors: bool = False) -> list:
+    """
+    Получает блокирующие мероприятия сразу на несколько дат одним запросом
+    (даты, не влезающие в один URL, уходят параллельными пачками).
+    """
+    date_field_name = "Дата"
+    blocking_field_name = "Занять мастерскую?"
     
-    async with httpx.AsyncClient() as client:
+    unique_dates = sorted(set(date_strs))
+    if not unique_dates:
+        return []
+
+    if replica.is_fresh(EVENTS_TABLE_ID):
+        return [e for e in replica.find(EVENTS_TABLE_ID, date_keys=unique_dates) if e.get(blocking_field_name)]
+
+    async def fetch_chunk(chunk: list[str]) -> list:
+        dates_filter = _any_of_filter(date_field_name, chunk)
+        where = f"({dates_filter})~and({blocking_field_name},is,true)"
+        
         try:
-            response = await client.get(request_url, headers=HEADERS)
-            response.raise_for_status()
-            return response.json().get("list", [])
+            return await _collect(EVENTS_TABLE_ID, where=where)
         except httpx.HTTPStatusError as e:
-            print(f"Ошибка при запросе к NocoDB (Events): {e}")
+            if raise_errors:
+                raise
+            logger.error(f"Ошибка при запросе к NocoDB (Events по датам): {e}")
             return []
 
+    chunks = _chunks(unique_dates, settings.NOCODB_DATES_PER_QUERY)
+    results = await gather_limited(*(fetch_chunk(chunk) for chunk in chunks))
+    return [event for chunk_events in results for event in chunk_events]
+
+
+async def _date_fingerprints(table_id: str, date_field_name: str, date_strs: list[str], extra_filter: str = "") -> dict[str, tuple[int, str]]:
+    """
+    "Отпечатки" дат: сколько записей и максимальный UpdatedAt на каждую дату.
+    Запрашиваются только служебные поля, поэтому ответ маленький.
+    Ошибки NocoDB пробрасываются наружу.
+    """
+    async def fetch_chunk(chunk: list[str]) -> list:
+        where = f"({_any_of_filter(date_field_name, chunk)})"
+        if extra_filter:
+            where += f"~and{extra_filter}"
+        return await _collect(table_id, where=where, fields=f"Id,UpdatedAt,{date_field_name}")
+
+    chunks = _chunks(sorted(set(date_strs)), settings.NOCODB_DATES_PER_QUERY)
+    results = await gather_limited(*(fetch_chunk(chunk) for chunk in chunks))
+    return _fingerprints_from_records([record for records in results for record in records], date_field_name, date_strs)
+
+def _fingerprints_from_records(records: list, date_field_name: str, date_strs: list[str]) -> dict[str, tuple[int, str]]:
+    fingerprints = {date_str: (0, "") for date_str in date_strs}
+    for record in records:
+        date_str = record.get(date_field_name)
+        if date_str not in fingerprints:
+            continue
+        count, updated_at = fingerprints[date_str]
+        fingerprints[date_str] = (count + 1, max(updated_at, record.get("UpdatedAt") or ""))
+    return fingerprints
+
+async def get_bookings_fingerprints(date_strs: list[str]) -> dict[str, tuple[int, str]]:
+    """Количество броней и их последний UpdatedAt по каждой дате."""
+    if replica.is_fresh(BOOKINGS_TABLE_ID):
+        return _fingerprints_from_records(await get_bookings_by_dates(date_strs), "Дата посещения", date_strs)
+    return await _date_fingerprints(BOOKINGS_TABLE_ID, "Дата посещения", date_strs)
+
+async def get_events_fingerprints(date_strs: list[str]) -> dict[str, tuple[int, str]]:
+    """Количество блокирующих мероприятий и их последний UpdatedAt по каждой дате."""
+    if replica.is_fresh(EVENTS_TABLE_ID):
+        return _fingerprints_from_records(await get_events_by_dates(date_strs), "Дата", date_strs)
+    return await _date_fingerprints(EVENTS_TABLE_ID, "Дата", date_strs, "(Занять мастерскую?,is,true)")
+
 async def create_booking(booking_data: dict) -> dict | None:
     """Создает новую запись в таблице Bookings."""
     
     request_url = f"{BASE_URL}/{BOOKINGS_TABLE_ID}/records"
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(request_url, headers=HEADERS, json=booking_data)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error(f"❌ Ошибка NocoDB create_booking: {e}")
-            logger.error(f"📄 Ответ сервера: {e.response.text}")
-            return None
-        except Exception as e:
-            logger.error(f"❌ Неизвестная ошибка create_booking: {e}")
-            return None
+    try:
+        response = await _request("POST", request_url, json=booking_data)
+        response.raise_for_status()
+        created = response.json()
+        replica.upsert(BOOKINGS_TABLE_ID, {**booking_data, **created})
+        return created
+    except httpx.HTTPStatusError as e:
+        logger.error(f"❌ Ошибка NocoDB create_booking: {e}")
+        logger.error(f"📄 Ответ сервера: {e.response.text}")
+        return None
+    except Exception as e:
+        logger.error(f"❌ Неизвестная ошибка create_booking: {e}")
+        return None
+    
+    
+async def create_bookings_bulk(bookings_data: list[dict]) -> list | None:
+    """
+    Создает несколько записей в Bookings одним запросом (bulk insert).
+    Возвращает список созданных записей ({"Id": ...}) в том же порядке или None при ошибке.
+    """
+    
+    request_url = f"{BASE_URL}/{BOOKINGS_TABLE_ID}/records"
+    
+    try:
+        response = await _request("POST", request_url, json=bookings_data)
+        response.raise_for_status()
+        created = response.json()
+        if len(created) != len(bookings_data):
+            # Строки не сопоставить с запросом — реплику догонит синхронизация
+            return created
+        for booking_data, created_record in zip(bookings_data, created):
+            replica.upsert(BOOKINGS_TABLE_ID, {**booking_data, **created_record})
+        return created
+    except httpx.HTTPStatusError as e:
+        logger.error(f"❌ Ошибка NocoDB create_bookings_bulk: {e}")
+        logger.error(f"📄 Ответ сервера: {e.response.text}")
+        return None
+    except Exception as e:
+        logger.error(f"❌ Неизвестная ошибка create_bookings_bulk: {e}")
+        return None
         
         
 async def delete_booking_by_id(booking_id: str) -> bool:
@@ -122,118 +499,120 @@ async def delete_booking_by_id(booking_id: str) -> bool:
     
     request_url = f"{BASE_URL}/{BOOKINGS_TABLE_ID}/records"
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.request("DELETE", request_url, headers=HEADERS, json={"Id": booking_id})
-            
-            response.raise_for_status()
-            
-            return True
-        except httpx.HTTPStatusError as e:
-            print(f"Ошибка при удалении записи {booking_id} из NocoDB: {e}")
-            print(f"Тело ответа: {e.response.text}")
-            return False
-        except Exception as e:
-            print(f"Неизвестная ошибка при удалении: {e}")
-            return False
+    try:
+        response = await _request("DELETE", request_url, json={"Id": booking_id})
         
+        response.raise_for_status()
+        
+        replica.delete(BOOKINGS_TABLE_ID, booking_id)
+        return True
+    except httpx.HTTPStatusError as e:
+        logger.error(f"❌ Ошибка при удалении записи {booking_id} из NocoDB: {e}. Тело ответа: {e.response.text}")
+        return False
+    except Exception as e:
+        logger.error(f"❌ Неизвестная ошибка при удалении записи {booking_id}: {e}")
+        return False
+    
 
-async def get_abonement_by_telegram_id(telegram_id: str) -> dict | None:
+async def get_abonement_by_telegram_id(telegram_id: str, raise_errors: bool = False) -> dict | None:
     """
     Находит абонемент пользователя по его Telegram ID.
     Если найдено несколько - возвращает первый.
+    С raise_errors=True ошибка не превращается в "абонемента нет" (нужно кэшу).
     """
     id_field_name = "Telegram ID"
-    filter_query = quote(f"({id_field_name},eq,{telegram_id})")
     
-    request_url = f"{BASE_URL}/{ABONEMENTS_TABLE_ID}/records?where={filter_query}"
+    if replica.is_fresh(ABONEMENTS_TABLE_ID):
+        return next(iter(replica.find(ABONEMENTS_TABLE_ID, telegram_id=telegram_id, limit=1)), None)
+    
+    try:
+        return await _first(ABONEMENTS_TABLE_ID, where=f"({id_field_name},eq,{telegram_id})")
+    except httpx.HTTPStatusError as e:
+        if raise_errors:
+            raise
+        logger.error(f"Ошибка при запросе к NocoDB (Abonements): {e}")
+        return None
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(request_url, headers=HEADERS)
-            response.raise_for_status()
-            
-            results = response.json().get("list", [])
-            if results:
-                return results[0]
-            return None
-        except httpx.HTTPStatusError as e:
-            print(f"Ошибка при запросе к NocoDB (Abonements): {e}")
-            return None
-        
 
-async def check_client_exists(telegram_id: str) -> bool:
+async def check_client_exists(telegram_id: str, raise_errors: bool = False) -> bool:
     """Проверяет, есть ли пользователь в таблице Clients."""
     id_field_name = "Telegram ID" 
     
-    filter_query = quote(f"({id_field_name},eq,{telegram_id})")
-    request_url = f"{BASE_URL}/{CLIENTS_TABLE_ID}/records?where={filter_query}"
+    if replica.is_fresh(CLIENTS_TABLE_ID):
+        return bool(replica.find(CLIENTS_TABLE_ID, telegram_id=telegram_id, limit=1))
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(request_url, headers=HEADERS)
-            response.raise_for_status()
-            return bool(response.json().get("list"))
-        except Exception as e:
-            logger.error(f"Ошибка проверки клиента {telegram_id}: {e}")
-            return False
-
-async def check_contest_participant(telegram_id: str) -> bool:
+    try:
+        return await _first(CLIENTS_TABLE_ID, where=f"({id_field_name},eq,{telegram_id})") is not None
+    except Exception as e:
+        if raise_errors:
+            raise
+        logger.error(f"Ошибка проверки клиента {telegram_id}: {e}")
+        return False
+
+async def check_contest_participant(telegram_id: str, raise_errors: bool = False) -> bool:
     """Проверяет, участвует ли пользователь в конкурсе."""
     id_field_name = "Telegram ID"
     
-    filter_query = quote(f"({id_field_name},eq,{telegram_id})")
-    request_url = f"{BASE_URL}/{FIRING_CONTEST_TABLE_ID}/records?where={filter_query}"
+    try:
+        return await _first(FIRING_CONTEST_TABLE_ID, where=f"({id_field_name},eq,{telegram_id})") is not None
+    except Exception as e:
+        if raise_errors:
+            raise
+        logger.error(f"Ошибка проверки конкурса {telegram_id}: {e}")
+        return False
+
+
+async def get_all_telegram_ids(table_id: str) -> set[str]:
+    """
+    Все Telegram ID таблицы (Clients, конкурс) — для предзагрузки в память.
+    Ошибки пробрасываются: пустое множество означало бы "никто не клиент".
+    """
+    id_field_name = "Telegram ID"
+    
+    if replica.is_fresh(table_id):
+        records = replica.find(table_id)
+    else:
+        records = await _collect(table_id, fields=id_field_name)
+    return {str(record[id_field_name]) for record in records if record.get(id_field_name) is not None}
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(request_url, headers=HEADERS)
-            response.raise_for_status()
-            return bool(response.json().get("list"))
-        except Exception as e:
-            logger.error(f"Ошибка проверки конкурса {telegram_id}: {e}")
-            return False
-        
 
 # --- МЕТОДЫ КУРСА ---
 
-async def get_all_lessons() -> list:
+async def get_all_lessons(raise_errors: bool = False) -> list:
     """Получает список уроков из базы, отсортированных по порядку."""
-    sort_field = quote("Sort Order")
-    request_url = f"{BASE_URL}/{LESSONS_TABLE_ID}/records?sort={sort_field}"
+    if replica.is_fresh(LESSONS_TABLE_ID):
+        lessons = replica.find(LESSONS_TABLE_ID)
+        lessons.sort(key=lambda lesson: (lesson.get("Sort Order") is None, lesson.get("Sort Order") or 0))
+        return lessons
+    
+    try:
+        return await _collect(LESSONS_TABLE_ID, sort="Sort Order")
+    except Exception as e:
+        if raise_errors:
+            raise
+        logger.error(f"Ошибка получения уроков: {e}")
+        return []
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(request_url, headers=HEADERS)
-            response.raise_for_status()
-            return response.json().get("list", [])
-        except Exception as e:
-            logger.error(f"Ошибка получения уроков: {e}")
-            return []
-        
 
-async def get_user_course_progress(telegram_id: str) -> dict | None:
+async def get_user_course_progress(telegram_id: str, raise_errors: bool = False) -> dict | None:
     """
     Получает прогресс пользователя.
     Важно: нужно подгрузить связанные данные (Completed Lessons).
+    С raise_errors=True ошибка не превращается в "прогресса нет" (иначе создадим дубль).
     """
     id_field = "Telegram ID"
-    filter_query = quote(f"({id_field},eq,{telegram_id})")
     
-    request_url = f"{BASE_URL}/{PROGRESS_TABLE_ID}/records?where={filter_query}"
+    if replica.is_fresh(PROGRESS_TABLE_ID):
+        return next(iter(replica.find(PROGRESS_TABLE_ID, telegram_id=telegram_id, limit=1)), None)
+    
+    try:
+        return await _first(PROGRESS_TABLE_ID, where=f"({id_field},eq,{telegram_id})")
+    except Exception as e:
+        if raise_errors:
+            raise
+        logger.error(f"Ошибка получения прогресса {telegram_id}: {e}")
+        return None
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(request_url, headers=HEADERS)
-            response.raise_for_status()
-            results = response.json().get("list", [])
-            if results:
-                return results[0]
-            return None
-        except Exception as e:
-            logger.error(f"Ошибка получения прогресса {telegram_id}: {e}")
-            return None
-        
 
 async def create_user_progress(telegram_id: str, default_blocks: str = "basic") -> dict | None:
     """Создает запись прогресса для нового ученика."""
@@ -242,19 +621,20 @@ async def create_user_progress(telegram_id: str, default_blocks: str = "basic")
         "Telegram ID": telegram_id,
         "Access Blocks": default_blocks,
     }
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(request_url, headers=HEADERS, json=data)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error(f"❌ Ошибка создания прогресса (NocoDB 400): {e}")
-            logger.error(f"📄 Ответ сервера: {e.response.text}") 
-            return None
-        except Exception as e:
-            logger.error(f"Ошибка создания прогресса: {e}")
-            return None
-        
+    try:
+        response = await _request("POST", request_url, json=data)
+        response.raise_for_status()
+        created = response.json()
+        replica.upsert(PROGRESS_TABLE_ID, {**data, **created})
+        return created
+    except httpx.HTTPStatusError as e:
+        logger.error(f"❌ Ошибка создания прогресса (NocoDB 400): {e}")
+        logger.error(f"📄 Ответ сервера: {e.response.text}") 
+        return None
+    except Exception as e:
+        logger.error(f"Ошибка создания прогресса: {e}")
+        return None
+    
 
 async def mark_lesson_as_completed(telegram_id: str, lesson_id_in_db: int):
     """
@@ -264,21 +644,32 @@ async def mark_lesson_as_completed(telegram_id: str, lesson_id_in_db: int):
     if not user_progress:
         return False
     
-    progress_record_id = user_progress["Id"]
-    
-    link_field_id = "cko3o2xhzsm3yrs"
-    
-    request_url = f"{BASE_URL}/{PROGRESS_TABLE_ID}/links/{link_field_id}/records/{progress_record_id}"
+    return await link_completed_lesson(telegram_id, user_progress["Id"], lesson_id_in_db)
+
+
+async def link_completed_lesson(telegram_id: str, progress_record_id: int, lesson_id_in_db: int) -> bool:
+    """
+    Привязывает урок к записи прогресса (один запрос, если Id записи уже известен).
+    """
+    request_url = f"{BASE_URL}/{PROGRESS_TABLE_ID}/links/{COMPLETED_LESSONS_LINK_ID}/records/{progress_record_id}"
     
     body = [{"Id": lesson_id_in_db}]
 
-    async with httpx.AsyncClient() as client:
+    try:
+        response = await _request("POST", request_url, json=body)
+        response.raise_for_status()
+    except Exception as e:
+        logger.error(f"Ошибка привязки урока: {e}")
+        if isinstance(e, httpx.HTTPStatusError):
+             logger.error(f"Детали: {e.response.text}")
+        return False
+
+    if replica.enabled():
+        # Привязка может не менять UpdatedAt прогресса, поэтому обновляем запись в реплике сами
         try:
-            response = await client.post(request_url, headers=HEADERS, json=body)
-            response.raise_for_status()
-            return True
-        except Exception as e:
-            logger.error(f"Ошибка привязки урока: {e}")
-            if isinstance(e, httpx.HTTPStatusError):
-                 logger.error(f"Детали: {e.response.text}")
-            return False
\ No newline at end of file
+            fresh_progress = await _first(PROGRESS_TABLE_ID, where=f"(Telegram ID,eq,{telegram_id})")
+            if fresh_progress:
+                replica.upsert(PROGRESS_TABLE_ID, fresh_progress)
+        except httpx.HTTPError as e:
+            logger.warning(f"⚠️ Реплика: не удалось обновить прогресс {telegram_id}: {e}")
+    return True
\ No newline at end of file
@@ -0,0 +1,88 @@
+import logging
+
+import course_logic
+import nocodb_client
+import session_store
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Прогресс ученика по Telegram ID: {"id": Id записи, "blocks": [...], "completed": [slug, ...], "version": n}.
+# Заполняется из ответов NocoDB (в том числе из ответа на создание записи)
+# и обновляется на месте при прохождении урока — повторно запись не читаем.
+_progress = session_store.make_store(
+    name="course_progress",
+    ttl_seconds=settings.PROGRESS_CACHE_TTL_SECONDS,
+    max_entries=settings.PROGRESS_CACHE_MAX_USERS,
+)
+
+
+def _from_record(record: dict, version: int = 1) -> dict:
+    return {
+        "id": record["Id"],
+        "blocks": course_logic.parse_access_blocks(record.get("Access Blocks")),
+        "completed": sorted(slug for slug in course_logic.parse_completed_slugs(record) if slug),
+        "version": version,
+    }
+
+
+async def get_or_create(telegram_id: str, default_blocks: str = "1") -> dict | None:
+    """
+    Прогресс ученика из кэша; при промахе — из NocoDB, а нового ученика
+    создаём и берём Id из ответа на создание (без повторного чтения).
+    None — если NocoDB недоступна.
+    """
+    key = str(telegram_id)
+    progress = _progress.get(key)
+    if progress is not None:
+        return progress
+
+    try:
+        record = await nocodb_client.get_user_course_progress(key, raise_errors=True)
+    except Exception as e:
+        logger.error(f"❌ Не удалось получить прогресс {key}: {e}")
+        return None
+
+    if record is None:
+        created = await nocodb_client.create_user_progress(key, default_blocks=default_blocks)
+        if not created or created.get("Id") is None:
+            return None
+        record = {"Id": created["Id"], "Access Blocks": default_blocks}
+
+    progress = _from_record(record)
+    _progress.set(key, progress)
+    return progress
+
+
+async def mark_completed(telegram_id: str, lesson_id, lesson_slug: str) -> bool:
+    """
+    Отмечает урок пройденным: один запрос на привязку, затем правка кэша на месте.
+    Запись прогресса здесь не создаём: её заводит открытие курса, а без неё
+    (как и раньше) возвращаем False.
+    """
+    key = str(telegram_id)
+    progress = _progress.get(key)
+    if progress is None:
+        try:
+            record = await nocodb_client.get_user_course_progress(key, raise_errors=True)
+        except Exception as e:
+            logger.error(f"❌ Не удалось получить прогресс {key}: {e}")
+            return False
+        if record is None:
+            logger.warning(f"⚠️ Урок не отмечен: у {key} нет записи прогресса")
+            return False
+        progress = _from_record(record)
+
+    if not await nocodb_client.link_completed_lesson(key, progress["id"], lesson_id):
+        return False
+
+    if lesson_slug not in progress["completed"]:
+        progress["completed"] = sorted([*progress["completed"], lesson_slug])
+    progress["version"] += 1
+    # Общее хранилище хранит копию, поэтому записываем обратно
+    _progress.set(key, progress)
+    return True
+
+
+def invalidate(telegram_id: str) -> None:
+    _progress.delete(str(telegram_id))
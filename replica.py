@@ -0,0 +1,276 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from contextlib import aclosing, contextmanager
+
+import nocodb_client
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Какие поля записи выносим в индексируемые колонки: table_id -> (поле даты, поле Telegram ID)
+# Ссылки на константы nocodb_client берутся при первом обращении (модули импортируют друг друга).
+def _mirrored_tables() -> dict[str, tuple[str | None, str | None]]:
+    return {
+        nocodb_client.BOOKINGS_TABLE_ID: ("Дата посещения", "Telegram ID"),
+        nocodb_client.EVENTS_TABLE_ID: ("Дата", None),
+        nocodb_client.ABONEMENTS_TABLE_ID: (None, "Telegram ID"),
+        nocodb_client.CLIENTS_TABLE_ID: (None, "Telegram ID"),
+        nocodb_client.LESSONS_TABLE_ID: (None, None),
+        nocodb_client.PROGRESS_TABLE_ID: (None, "Telegram ID"),
+    }
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    table_id    TEXT    NOT NULL,
+    id          INTEGER NOT NULL,
+    updated_at  TEXT,
+    date_key    TEXT,
+    telegram_id TEXT,
+    data        TEXT    NOT NULL,
+    PRIMARY KEY (table_id, id)
+);
+CREATE INDEX IF NOT EXISTS idx_records_date ON records (table_id, date_key);
+CREATE INDEX IF NOT EXISTS idx_records_telegram ON records (table_id, telegram_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    table_id  TEXT PRIMARY KEY,
+    watermark TEXT,
+    synced_at REAL
+);
+"""
+
+_db: sqlite3.Connection | None = None
+_synced_at: dict[str, float] = {}     # table_id -> time.time() последней успешной синхронизации
+_watermarks: dict[str, str] = {}      # table_id -> максимальный UpdatedAt в реплике
+_swept_at: dict[str, float] = {}      # table_id -> time.time() последней проверки удалений
+_sync_task: asyncio.Task | None = None
+
+
+# --- Хранилище ---
+
+def _open() -> sqlite3.Connection:
+    db = sqlite3.connect(settings.REPLICA_PATH, check_same_thread=False, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute("PRAGMA busy_timeout=5000")  # Файл могут писать несколько воркеров
+    db.executescript(SCHEMA)
+    for table_id, watermark, synced_at in db.execute("SELECT table_id, watermark, synced_at FROM sync_state"):
+        _watermarks[table_id] = watermark or ""
+        _synced_at[table_id] = synced_at or 0.0
+    return db
+
+
+def _row(table_id: str, record: dict) -> tuple:
+    date_field, telegram_field = _mirrored_tables()[table_id]
+    telegram_id = record.get(telegram_field) if telegram_field else None
+    return (
+        table_id,
+        record["Id"],
+        record.get("UpdatedAt"),
+        record.get(date_field) if date_field else None,
+        str(telegram_id) if telegram_id is not None else None,
+        json.dumps(record, ensure_ascii=False),
+    )
+
+
+def _upsert_many(table_id: str, records: list[dict]) -> None:
+    _db.executemany(
+        "INSERT OR REPLACE INTO records (table_id, id, updated_at, date_key, telegram_id, data) VALUES (?, ?, ?, ?, ?, ?)",
+        [_row(table_id, record) for record in records if record.get("Id") is not None],
+    )
+
+
+@contextmanager
+def _transaction():
+    _db.execute("BEGIN")
+    try:
+        yield
+    except Exception:
+        _db.execute("ROLLBACK")
+        raise
+    _db.execute("COMMIT")
+
+
+def _mark_synced(table_id: str) -> None:
+    now = time.time()
+    _synced_at[table_id] = now
+    _db.execute(
+        "INSERT OR REPLACE INTO sync_state (table_id, watermark, synced_at) VALUES (?, ?, ?)",
+        (table_id, _watermarks.get(table_id, ""), now),
+    )
+
+
+def enabled() -> bool:
+    return _db is not None
+
+
+def is_fresh(table_id: str) -> bool:
+    """
+    Можно ли отвечать на чтения этой таблицы из реплики: синхронизирована недавно,
+    и удаления проверялись не реже, чем раз в REPLICA_DELETION_SWEEP_SECONDS (с запасом на застой).
+    """
+    if _db is None:
+        return False
+    now = time.time()
+    if now - _swept_at.get(table_id, 0.0) > settings.REPLICA_DELETION_SWEEP_SECONDS + settings.REPLICA_MAX_STALENESS_SECONDS:
+        return False
+    return now - _synced_at.get(table_id, 0.0) <= settings.REPLICA_MAX_STALENESS_SECONDS
+
+
+def find(
+    table_id: str,
+    date_keys: list[str] | None = None,
+    telegram_id: str | None = None,
+    field_equals: dict | None = None,
+    limit: int | None = None,
+) -> list[dict]:
+    """Читает записи таблицы из реплики по индексируемым полям (и, при необходимости, по любым полям JSON)."""
+    query = "SELECT data FROM records WHERE table_id = ?"
+    params: list = [table_id]
+    if date_keys is not None:
+        query += f" AND date_key IN ({','.join('?' * len(date_keys))})"
+        params.extend(date_keys)
+    if telegram_id is not None:
+        query += " AND telegram_id = ?"
+        params.append(str(telegram_id))
+    for field_name, value in (field_equals or {}).items():
+        query += " AND json_extract(data, ?) = ?"
+        params.extend([f'$."{field_name}"', value])
+    query += " ORDER BY id"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    return [json.loads(data) for (data,) in _db.execute(query, params)]
+
+
+def upsert(table_id: str, record: dict) -> None:
+    """Сразу применяет нашу запись в NocoDB к реплике."""
+    if _db is not None and table_id in _mirrored_tables():
+        _upsert_many(table_id, [record])
+
+
+def delete(table_id: str, record_id) -> None:
+    """Сразу применяет наше удаление в NocoDB к реплике."""
+    if _db is not None:
+        _db.execute("DELETE FROM records WHERE table_id = ? AND id = ?", (table_id, record_id))
+
+
+# --- Синхронизация ---
+
+async def _sync_delta(table_id: str) -> int:
+    """
+    Забирает записи, изменённые после водяного знака: читаем по убыванию UpdatedAt
+    и останавливаемся на первой записи старше него. Записи без UpdatedAt
+    подхватывает полная синхронизация. Возвращает число записей.
+    """
+    watermark = _watermarks.get(table_id, "")
+    changed = []
+    records_iter = nocodb_client.iter_records(table_id, where="(UpdatedAt,notblank)", sort="-UpdatedAt")
+    async with aclosing(records_iter) as records:
+        async for record in records:
+            updated_at = record.get("UpdatedAt") or ""
+            if watermark and updated_at < watermark:
+                break
+            changed.append(record)
+
+    if changed:
+        with _transaction():
+            _upsert_many(table_id, changed)
+        _watermarks[table_id] = max(watermark, *(record.get("UpdatedAt") or "" for record in changed))
+    return len(changed)
+
+
+async def _sync_deletions(table_id: str) -> int:
+    """
+    Удаляет из реплики записи, которых больше нет в NocoDB: дельта по UpdatedAt удалений не видит.
+    Читаем только Id (страницами по Id, максимального размера) — поэтому это делается
+    реже дельты, раз в REPLICA_DELETION_SWEEP_SECONDS. Записи с Id больше последнего
+    прочитанного не трогаем (их могли добавить во время чтения), а "пропавшие"
+    перед удалением перепроверяем запросом (Id,in,...). Возвращает число удалённых записей.
+    """
+    ids = set(await nocodb_client.list_record_ids(table_id))
+    query = "SELECT id FROM records WHERE table_id = ?"
+    params: list = [table_id]
+    if ids:
+        query += " AND id <= ?"
+        params.append(max(ids))
+    suspects = [record_id for (record_id,) in _db.execute(query, params) if record_id not in ids]
+    missing = []
+    if suspects:
+        existing = await nocodb_client.get_existing_ids(table_id, suspects)
+        missing = [record_id for record_id in suspects if record_id not in existing]
+    if missing:
+        with _transaction():
+            _db.executemany("DELETE FROM records WHERE table_id = ? AND id = ?", [(table_id, record_id) for record_id in missing])
+    _swept_at[table_id] = time.time()
+    return len(missing)
+
+
+async def _sync_full(table_id: str) -> int:
+    """Полная перезаливка таблицы: ловит удаления и записи без UpdatedAt."""
+    records = [record async for record in nocodb_client.iter_records(table_id)]
+    with _transaction():
+        _db.execute("DELETE FROM records WHERE table_id = ?", (table_id,))
+        _upsert_many(table_id, records)
+    _watermarks[table_id] = max((record.get("UpdatedAt") or "" for record in records), default="")
+    _swept_at[table_id] = time.time()
+    return len(records)
+
+
+async def sync_once(full: bool = False) -> None:
+    """Один цикл синхронизации всех зеркалируемых таблиц."""
+
+    async def sync_table(table_id: str) -> None:
+        try:
+            if full or not _watermarks.get(table_id):
+                count = await _sync_full(table_id)
+            else:
+                count = await _sync_delta(table_id)
+                if time.time() - _swept_at.get(table_id, 0.0) >= settings.REPLICA_DELETION_SWEEP_SECONDS:
+                    count += await _sync_deletions(table_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Реплика: не удалось синхронизировать таблицу {table_id}: {e}")
+            return
+        _mark_synced(table_id)
+        if count:
+            logger.info(f"🗄 Реплика: таблица {table_id}, обновлено записей: {count}")
+
+    await nocodb_client.gather_limited(*(sync_table(table_id) for table_id in _mirrored_tables()))
+
+
+async def _sync_loop() -> None:
+    cycle = 0
+    while True:
+        full = cycle % settings.REPLICA_FULL_SYNC_EVERY == 0
+        await sync_once(full=full)
+        cycle += 1
+        await asyncio.sleep(settings.REPLICA_SYNC_INTERVAL_SECONDS)
+
+
+async def start() -> None:
+    """Открывает файл реплики и запускает фоновую синхронизацию (если REPLICA_ENABLED)."""
+    global _db, _sync_task
+    if not settings.REPLICA_ENABLED or _db is not None:
+        return
+    _db = _open()
+    _sync_task = asyncio.create_task(_sync_loop())
+    logger.info(f"🗄 Реплика NocoDB включена: {settings.REPLICA_PATH}")
+
+
+async def stop() -> None:
+    global _db, _sync_task
+    if _sync_task is not None:
+        _sync_task.cancel()
+        try:
+            await _sync_task
+        except asyncio.CancelledError:
+            pass
+        _sync_task = None
+    if _db is not None:
+        _db.close()
+        _db = None
+    _synced_at.clear()
+    _watermarks.clear()
+    _swept_at.clear()
@@ -1,7 +1,17 @@
-from fastapi import APIRouter
-import nocodb_client
+import os
+import re
+import secrets
+
+from fastapi import APIRouter, Header, Request, Response
+from fastapi.responses import HTMLResponse, RedirectResponse
 import course_logic
+import fast_json
+import http_cache
+import lesson_catalog
+import progress_cache
 import schemas
+import static_assets
+from config import settings
 
 
 router = APIRouter(
@@ -9,60 +19,174 @@ router = APIRouter(
     tags=["Course"]
 )
 
+# Сама страница курса (/course/) — отдельный роутер без префикса API.
+# Подключается раньше, чем статика на /course.
+page_router = APIRouter(tags=["Course"])
+
 
-@router.get("/timeline")
-async def get_course_timeline(telegram_id: str):
+async def _timeline_state(telegram_id: str) -> tuple[dict, object]:
     """
-    Возвращает структуру курса с учетом прогресса.
+    Прогресс и каталог для таймлайна: (ошибка, None) или (прогресс, каталог).
+    ETag можно посчитать до сборки самого таймлайна.
     """
-    user_progress = await nocodb_client.get_user_course_progress(telegram_id)
-    
-    if not user_progress:
-        await nocodb_client.create_user_progress(telegram_id, default_blocks="1")
-        user_progress = await nocodb_client.get_user_course_progress(telegram_id)
+    user_progress = await progress_cache.get_or_create(telegram_id, default_blocks="1")
 
     if not user_progress:
         return {
             "status": "error",
             "message": "Не удалось инициализировать прогресс пользователя. Проверь логи сервера."
-        }
+        }, None
     
-    all_lessons = await nocodb_client.get_all_lessons()
+    catalog = await lesson_catalog.get_catalog()
 
-    if not all_lessons:
+    if not catalog or not catalog.lessons:
          return {
             "status": "error",
             "message": "Список уроков пуст или недоступен."
-        }
-    
-    timeline_data = course_logic.calculate_timeline(all_lessons, user_progress)
+        }, None
+
+    return user_progress, catalog
+
+
+def _timeline_etag(telegram_id: str, user_progress: dict, catalog) -> str:
+    return http_cache.make_etag(catalog.etag, telegram_id, user_progress["blocks"], user_progress["completed"])
+
+
+def _timeline_payload(telegram_id: str, user_progress: dict, catalog) -> dict:
+    timeline_data = course_logic.build_timeline(
+        catalog.lessons_in_blocks(user_progress["blocks"]), user_progress["blocks"], set(user_progress["completed"])
+    )
     
     return {
         "status": "success",
         "timeline": timeline_data,
-        "user_name": user_progress.get("Telegram ID")
+        "user_name": telegram_id
     }
 
 
+@router.get("/timeline", response_model=schemas.CourseTimelineResult, response_model_exclude_unset=True)
+async def get_course_timeline(telegram_id: str, request: Request, response: Response):
+    """
+    Возвращает структуру курса с учетом прогресса.
+    ETag складывается из версии каталога и прогресса ученика (If-None-Match -> 304).
+    """
+    user_progress, catalog = await _timeline_state(telegram_id)
+    if catalog is None:
+        return user_progress
+    
+    etag = _timeline_etag(telegram_id, user_progress, catalog)
+    cached = http_cache.conditional(request, response, etag)
+    if cached is not None:
+        return cached
+    
+    return _timeline_payload(telegram_id, user_progress, catalog)
+
+
+# --- Страница курса с уже встроенным таймлайном ---
+
+# Скрипт приложения (имя может быть с хэшем после сборки статики)
+APP_SCRIPT_RE = re.compile(r"""<script\s+src=["'][^"']*assets/js/app[^"']*\.js["']""")
+
+# (путь, mtime) -> (начало страницы, конец страницы, ETag шаблона)
+_template_cache: dict[tuple[str, float], tuple[str, str, str]] = {}
+
+
+def _page_template() -> tuple[str, str, str]:
+    """
+    index.html раздаваемой статики, разрезанный там, куда вставляются данные:
+    прямо перед подключением app.js. Разбирается один раз на версию файла.
+    """
+    path = os.path.join(static_assets.served_directory, "index.html")
+    key = (path, os.stat(path).st_mtime)
+    template = _template_cache.get(key)
+    if template is None:
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        match = APP_SCRIPT_RE.search(html)
+        position = match.start() if match else html.rindex("</body>")
+        template = (html[:position], html[position:], http_cache.make_etag(html))
+        _template_cache.clear()
+        _template_cache[key] = template
+    return template
+
+
+def _inline_json(content: dict) -> str:
+    """JSON, который безопасно вставлять внутрь <script>."""
+    return (
+        fast_json.dumps(content).decode("utf-8")
+        .replace("<", "\\u003c").replace(">", "\\u003e").replace("&", "\\u0026")
+        .replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+    )
+
+
+@page_router.get("/course", include_in_schema=False)
+async def course_page_redirect(request: Request):
+    url = request.url.replace(path="/course/")
+    return RedirectResponse(url=str(url))
+
+
+@page_router.get("/course/", response_class=HTMLResponse)
+async def course_page(request: Request, telegram_id: str | None = None):
+    """
+    Страница курса. Если бот открыл её с ?telegram_id=..., таймлайн ученика
+    встраивается прямо в HTML, и страница рисуется без отдельного запроса к API.
+    """
+    head, tail, template_etag = _page_template()
+
+    etag = http_cache.make_etag(template_etag)
+    user_progress = catalog = None
+    if telegram_id:
+        user_progress, catalog = await _timeline_state(telegram_id)
+        if catalog is not None:
+            etag = http_cache.make_etag(template_etag, _timeline_etag(telegram_id, user_progress, catalog))
+
+    if http_cache.etag_matches(request, etag):
+        return http_cache.not_modified(etag)
+
+    inline_data = _timeline_payload(telegram_id, user_progress, catalog) if catalog is not None else None
+
+    html = head
+    if inline_data is not None:
+        html += f"<script>window.__COURSE_DATA__ = {_inline_json(inline_data)};</script>\n    "
+    html += tail
+
+    response = HTMLResponse(html)
+    http_cache.set_validators(response, etag)
+    return response
+
+
 @router.post("/complete")
 async def complete_lesson(data: schemas.LessonCompleteRequest):
     """
     Отмечает урок как пройденный.
     """
-    all_lessons = await nocodb_client.get_all_lessons()
-    lesson_db_id = None
-    
-    for lesson in all_lessons:
-        if lesson.get("Slug") == data.lesson_slug:
-            lesson_db_id = lesson.get("Id")
-            break
+    catalog = await lesson_catalog.get_catalog()
+    lesson_db_id = catalog.lesson_id(data.lesson_slug) if catalog else None
             
     if not lesson_db_id:
         return {"status": "error", "message": "Урок не найден"}
         
-    success = await nocodb_client.mark_lesson_as_completed(data.telegram_id, lesson_db_id)
+    success = await progress_cache.mark_completed(data.telegram_id, lesson_db_id, data.lesson_slug)
     
     if success:
         return {"status": "success"}
     else:
-        return {"status": "error", "message": "Не удалось сохранить прогресс"}
\ No newline at end of file
+        return {"status": "error", "message": "Не удалось сохранить прогресс"}
+
+
+@router.post("/admin/refresh_catalog")
+async def refresh_catalog(x_admin_token: str | None = Header(None)):
+    """
+    Перечитывает каталог уроков из NocoDB, не дожидаясь фонового обновления.
+    Требует заголовок X-Admin-Token, равный ADMIN_TOKEN (без ADMIN_TOKEN эндпоинт выключен).
+    """
+    # compare_digest — чтобы токен нельзя было подобрать по времени ответа
+    if not settings.ADMIN_TOKEN or not secrets.compare_digest((x_admin_token or "").encode(), settings.ADMIN_TOKEN.encode()):
+        return {"status": "error", "message": "Доступ запрещён"}
+    
+    catalog = await lesson_catalog.refresh()
+    
+    if not catalog:
+        return {"status": "error", "message": "Не удалось загрузить каталог уроков"}
+    
+    return {"status": "success", "lessons": len(catalog.lessons), "version": catalog.version}
@@ -1,7 +1,9 @@
 import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List
 
+from config import settings
+
 
 class BookingCreate(BaseModel):
     telegram_id: str
@@ -14,6 +16,24 @@ class BookingCreate(BaseModel):
     equipment: str | None = None 
     
 
+class RecurrenceRule(BaseModel):
+    start_date: str          # Первая дата, "dd.mm.yyyy"
+    count: int = Field(ge=1, le=settings.BULK_BOOKING_MAX_DATES)  # Сколько занятий
+    interval_days: int = Field(default=7, ge=1)                   # Шаг повторения (7 — каждую неделю)
+
+
+class BookingBulkCreate(BaseModel):
+    telegram_id: str
+    telegram: str
+    fullname: str
+    start_time: str
+    duration_hours: float
+    activity: str | None = ""
+    equipment: str | None = None
+    dates: List[str] = []                  # Явный список дат "dd.mm.yyyy"
+    recurrence: RecurrenceRule | None = None  # ...и/или правило повторения
+
+
 class BookingCancel(BaseModel):
     telegram_id: str
     booking_number: str
@@ -27,6 +47,19 @@ class FiringCalculationRequest(BaseModel):
     glaze_type: str  # "без глазури", "своя", "из мастерской"
 
 
+class FiringItem(BaseModel):
+    quantity: int
+    size: str
+    firing_type: str
+    glaze_type: str
+
+
+# Расчет сразу нескольких позиций ("корзина" изделий)
+class FiringQuoteRequest(BaseModel):
+    telegram_id: str
+    items: List[FiringItem]
+
+
 # Модель урока для отправки на фронтенд
 class LessonResponse(BaseModel):
     slug: str
@@ -43,4 +76,46 @@ class CourseTimelineResponse(BaseModel):
 
 class LessonCompleteRequest(BaseModel):
     telegram_id: str
-    lesson_slug: str
\ No newline at end of file
+    lesson_slug: str
+
+
+# --- Модели ответов (сериализуются pydantic-core один раз, без jsonable_encoder) ---
+
+class TextResult(BaseModel):
+    result: str
+
+
+class SlotInfo(BaseModel):
+    start_time: str
+    max_duration: float
+
+
+class SlotsResult(BaseModel):
+    result: str
+    slots: List[SlotInfo] = []
+
+
+class CalendarDay(BaseModel):
+    date: str
+    free_slots: int
+
+
+class CalendarResult(BaseModel):
+    result: str
+    days: List[CalendarDay] = []
+
+
+class TimelineItem(BaseModel):
+    slug: str | None
+    title: str | None
+    status: str          # "completed", "active", "locked"
+    is_new_block: bool
+    block_id: str | int | None
+    system_id: int | None
+
+
+class CourseTimelineResult(BaseModel):
+    status: str
+    timeline: List[TimelineItem] = []
+    user_name: str | None = None
+    message: str | None = None
@@ -0,0 +1,101 @@
+from abc import ABC, abstractmethod
+from typing import Any
+
+import shared_state
+from cache import TTLCache
+from config import settings
+
+
+class KeyValueStore(ABC):
+    """
+    Мини-интерфейс хранилища коротко живущих пользовательских данных
+    (например, карты "номер в списке -> Id брони" для отмены).
+    Реализации: MemoryStore (в процессе) и SharedStore (общее для нескольких воркеров).
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Any:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl_seconds: float | None = None) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryStore(KeyValueStore):
+    """Хранилище в памяти процесса поверх TTLCache: TTL, LRU и лимит по памяти."""
+
+    def __init__(self, name: str, ttl_seconds: float, max_entries: int, max_bytes: int | None = None):
+        self._cache = TTLCache(ttl_seconds, max_entries, max_bytes, name=name)
+
+    def get(self, key: str) -> Any:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: Any, ttl_seconds: float | None = None) -> None:
+        self._cache.set(key, value, ttl_seconds)
+
+    def delete(self, key: str) -> None:
+        self._cache.pop(key)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+class SharedStore(KeyValueStore):
+    """Хранилище в общем файле SQLite (shared_state) — одно на все воркеры."""
+
+    def __init__(self, name: str, ttl_seconds: float):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Any:
+        value = shared_state.kv_get(self.name, key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: float | None = None) -> None:
+        shared_state.kv_set(self.name, key, value, self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+
+    def delete(self, key: str) -> None:
+        shared_state.kv_delete(self.name, key)
+
+    def stats(self) -> dict:
+        return {"entries": shared_state.kv_count(self.name), "hits": self.hits, "misses": self.misses}
+
+
+# Общие хранилища процесса (хранилища в памяти видны через cache.all_caches())
+_shared_stores: list[SharedStore] = []
+
+
+def shared_stores() -> list[SharedStore]:
+    return list(_shared_stores)
+
+
+def make_store(name: str, ttl_seconds: float, max_entries: int, max_bytes: int | None = None) -> KeyValueStore:
+    """Общее хранилище, если включено SHARED_STATE_ENABLED, иначе — в памяти процесса."""
+    if shared_state.enabled():
+        store = SharedStore(name=name, ttl_seconds=ttl_seconds)
+        _shared_stores.append(store)
+        return store
+    return MemoryStore(name=name, ttl_seconds=ttl_seconds, max_entries=max_entries, max_bytes=max_bytes)
+
+
+# Telegram ID -> {"номер в списке": Id брони}, живёт, пока юзер выбирает, что отменить
+cancel_maps = make_store(
+    name="cancel_maps",
+    ttl_seconds=settings.CANCEL_MAP_TTL_SECONDS,
+    max_entries=settings.CANCEL_MAP_MAX_USERS,
+    max_bytes=settings.CANCEL_MAP_MAX_BYTES,
+)
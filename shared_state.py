@@ -0,0 +1,216 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from typing import Any
+
+from config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: межпроцессные замки недоступны, работаем в одном воркере
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Общее состояние для нескольких воркеров uvicorn (--workers N / WEB_CONCURRENCY):
+# файл SQLite в режиме WAL рядом с приложением, без отдельного сервиса.
+# Здесь живут карта отмены броней, "снимки дня" и замки допуска броней.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    namespace  TEXT NOT NULL,
+    key        TEXT NOT NULL,
+    value      TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS idx_kv_expires ON kv (expires_at);
+CREATE TABLE IF NOT EXISTS day_snapshots (
+    date_key     TEXT PRIMARY KEY,
+    version      INTEGER NOT NULL,
+    verified_at  REAL NOT NULL,
+    local_writes INTEGER NOT NULL,
+    bookings     TEXT NOT NULL,
+    events       TEXT NOT NULL
+);
+"""
+
+_db: sqlite3.Connection | None = None
+_db_pid: int | None = None
+# Сколько записей kv сделали с последней чистки просроченных
+_sets_since_purge = 0
+PURGE_EVERY_SETS = 100
+
+
+def enabled() -> bool:
+    return settings.SHARED_STATE_ENABLED
+
+
+def _conn() -> sqlite3.Connection:
+    """Соединение открывается лениво и заново после fork — у каждого воркера своё."""
+    global _db, _db_pid
+    if _db is None or _db_pid != os.getpid():
+        _db = sqlite3.connect(settings.SHARED_STATE_PATH, check_same_thread=False, isolation_level=None)
+        _db.execute("PRAGMA journal_mode=WAL")
+        _db.execute("PRAGMA synchronous=NORMAL")
+        _db.execute("PRAGMA busy_timeout=5000")
+        _db.executescript(SCHEMA)
+        _db_pid = os.getpid()
+    return _db
+
+
+def close() -> None:
+    global _db, _db_pid
+    if _db is not None and _db_pid == os.getpid():
+        _db.close()
+    _db = None
+    _db_pid = None
+
+
+# --- Ключ-значение с TTL (карта отмены броней) ---
+
+def kv_get(namespace: str, key: str) -> Any:
+    row = _conn().execute(
+        "SELECT value, expires_at FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+    ).fetchone()
+    if row is None:
+        return None
+    value, expires_at = row
+    if expires_at <= time.time():
+        kv_delete(namespace, key)
+        return None
+    return json.loads(value)
+
+
+def kv_set(namespace: str, key: str, value: Any, ttl_seconds: float) -> None:
+    global _sets_since_purge
+    db = _conn()
+    db.execute(
+        "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+        (namespace, key, json.dumps(value, ensure_ascii=False), time.time() + ttl_seconds),
+    )
+    _sets_since_purge += 1
+    if _sets_since_purge >= PURGE_EVERY_SETS:
+        _sets_since_purge = 0
+        db.execute("DELETE FROM kv WHERE expires_at <= ?", (time.time(),))
+
+
+def kv_delete(namespace: str, key: str) -> None:
+    _conn().execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key))
+
+
+def kv_count(namespace: str) -> int:
+    return _conn().execute(
+        "SELECT COUNT(*) FROM kv WHERE namespace = ? AND expires_at > ?", (namespace, time.time())
+    ).fetchone()[0]
+
+
+# --- Снимки дня ---
+# version общая для всех воркеров: каждое изменение снимка её увеличивает,
+# и воркер, у которого в памяти версия меньше, перечитывает снимок отсюда.
+# verified_at — time.time() последней сверки с NocoDB (0 — снимок недействителен).
+
+def snapshot_version(date_str: str) -> int:
+    row = _conn().execute("SELECT version FROM day_snapshots WHERE date_key = ?", (date_str,)).fetchone()
+    return row[0] if row else 0
+
+
+def load_snapshot(date_str: str) -> tuple[int, float, int, list, list] | None:
+    """(version, verified_at, local_writes, bookings, events) или None."""
+    row = _conn().execute(
+        "SELECT version, verified_at, local_writes, bookings, events FROM day_snapshots WHERE date_key = ?",
+        (date_str,),
+    ).fetchone()
+    if row is None:
+        return None
+    version, verified_at, local_writes, bookings, events = row
+    return version, verified_at, local_writes, json.loads(bookings), json.loads(events)
+
+
+def publish_snapshot(
+    date_str: str,
+    bookings: list,
+    events: list,
+    verified_at: float,
+    local_writes: int = 0,
+    expected_version: int | None = None,
+) -> int | None:
+    """
+    Записывает снимок и возвращает его новую версию.
+    Если expected_version задана и версия успела измениться (другой воркер записал
+    что-то новее), ничего не пишет и возвращает None.
+    """
+    db = _conn()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        current = snapshot_version(date_str)
+        if expected_version is not None and current != expected_version:
+            db.execute("ROLLBACK")
+            return None
+        version = current + 1
+        db.execute(
+            "INSERT OR REPLACE INTO day_snapshots (date_key, version, verified_at, local_writes, bookings, events) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (date_str, version, verified_at, local_writes,
+             json.dumps(bookings, ensure_ascii=False), json.dumps(events, ensure_ascii=False)),
+        )
+    except Exception:
+        db.execute("ROLLBACK")
+        raise
+    db.execute("COMMIT")
+    return version
+
+
+def mark_snapshot_verified(date_str: str, version: int, verified_at: float) -> None:
+    """Продлевает свежесть снимка после сверки, если его никто не изменил."""
+    _conn().execute(
+        "UPDATE day_snapshots SET verified_at = ?, local_writes = 0 WHERE date_key = ? AND version = ?",
+        (verified_at, date_str, version),
+    )
+
+
+def invalidate_snapshots_with_booking(booking_id) -> None:
+    """Помечает недействительными снимки, в которых лежит бронь (после её удаления)."""
+    _conn().execute(
+        "UPDATE day_snapshots SET version = version + 1, verified_at = 0 "
+        "WHERE EXISTS (SELECT 1 FROM json_each(day_snapshots.bookings) WHERE json_extract(value, '$.Id') = ?)",
+        (booking_id,),
+    )
+
+
+# --- Межпроцессные замки допуска броней ---
+
+def _lock_path(name: str) -> str:
+    directory = settings.SHARED_STATE_PATH + ".locks"
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, name.replace("/", "_") + ".lock")
+
+
+@asynccontextmanager
+async def process_lock(name: str):
+    """
+    Файловый замок (flock), общий для всех воркеров на машине.
+    Берётся неблокирующе с опросом, чтобы не останавливать цикл событий.
+    """
+    if fcntl is None:
+        yield
+        return
+
+    fd = os.open(_lock_path(name), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                await asyncio.sleep(settings.SHARED_LOCK_POLL_SECONDS)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
@@ -0,0 +1,281 @@
+"""
+Сборка и раздача статики веб-приложения курса (папка data, смонтирована на /course).
+
+Сборка (python static_assets.py или автоматически при старте, STATIC_BUILD_ON_STARTUP):
+  * файлы из data/assets получают в имени хэш содержимого (styles.css -> styles.1a2b3c4d5e.css);
+  * ссылки на них переписываются в CSS (url(...)) и в HTML (src/href);
+  * рядом кладутся сжатые копии .gz (и .br, если установлен пакет brotli);
+  * manifest.json: исходный путь -> путь с хэшем.
+
+Раздача (PrecompressedStaticFiles): отдаёт готовую сжатую копию по Accept-Encoding,
+файлы с хэшем — с "вечным" кэшем (immutable), остальные — с обязательной перепроверкой.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import stat
+import sys
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+import http_cache
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него отдаём только gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Папка, которую фактически раздаём на /course (её выбирает prepare)
+served_directory = "data"
+
+ASSETS_DIR = "assets"
+MANIFEST_NAME = "manifest.json"
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+# Сжатые копии делаем только для файлов, которые хорошо жмутся
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".html", ".svg", ".json", ".txt", ".ttf", ".otf"}
+# (кодировка в Accept-Encoding, суффикс файла) в порядке предпочтения
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+CSS_URL_RE = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+HTML_REF_RE = re.compile(r"""(\b(?:src|href)\s*=\s*)(["'])([^"']+)\2""")
+
+
+# --- Сборка ---
+
+def _sha(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _hashed_name(relative_path: str, data: bytes) -> str:
+    root, ext = posixpath.splitext(relative_path)
+    return f"{root}.{_sha(data)[:10]}{ext}"
+
+
+def _source_files(source_dir: str) -> list[str]:
+    """Все файлы исходной папки (относительные пути через "/"), кроме скрытых."""
+    files = []
+    for root, dirs, names in os.walk(source_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(names):
+            if name.startswith("."):
+                continue
+            path = os.path.relpath(os.path.join(root, name), source_dir)
+            files.append(path.replace(os.sep, "/"))
+    return files
+
+
+def _sources_digest(source_dir: str, files: list[str]) -> str:
+    digest = hashlib.sha256()
+    for path in files:
+        digest.update(path.encode("utf-8"))
+        with open(os.path.join(source_dir, path), "rb") as f:
+            digest.update(_sha(f.read()).encode("ascii"))
+    return digest.hexdigest()
+
+
+def _rewrite_css(css: str, css_path: str, manifest: dict[str, str]) -> str:
+    css_dir = posixpath.dirname(css_path)
+
+    def replace(match: re.Match) -> str:
+        quote, url = match.group(1), match.group(2)
+        if "://" in url or url.startswith(("data:", "/", "#")):
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(css_dir, url))
+        hashed = manifest.get(target)
+        if hashed is None:
+            return match.group(0)
+        return f"url({quote}{posixpath.relpath(hashed, css_dir)}{quote})"
+
+    return CSS_URL_RE.sub(replace, css)
+
+
+def _rewrite_html(html: str, html_path: str, manifest: dict[str, str]) -> str:
+    html_dir = posixpath.dirname(html_path)
+
+    def replace(match: re.Match) -> str:
+        prefix, quote, url = match.groups()
+        if "://" in url or url.startswith(("data:", "/", "#")):
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(html_dir, url))
+        hashed = manifest.get(target)
+        if hashed is None:
+            return match.group(0)
+        return f"{prefix}{quote}{posixpath.relpath(hashed, html_dir or '.')}{quote}"
+
+    return HTML_REF_RE.sub(replace, html)
+
+
+def _write(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    if os.path.splitext(path)[1] not in COMPRESSIBLE_EXTENSIONS:
+        return
+    # Сжатая копия нужна, только если она заметно меньше
+    gzipped = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gzipped) < len(data) * 0.9:
+        with open(path + ".gz", "wb") as f:
+            f.write(gzipped)
+    if brotli is not None:
+        compressed = brotli.compress(data, quality=11)
+        if len(compressed) < len(data) * 0.9:
+            with open(path + ".br", "wb") as f:
+                f.write(compressed)
+
+
+def build(source_dir: str, build_dir: str, force: bool = False) -> dict:
+    """
+    Собирает статику из source_dir в build_dir и возвращает манифест.
+    Если исходники не менялись с прошлой сборки, ничего не делает.
+    """
+    files = _source_files(source_dir)
+    digest = _sources_digest(source_dir, files)
+
+    existing = load_manifest(build_dir)
+    if not force and existing and existing.get("sources") == digest:
+        return existing
+
+    assets = [path for path in files if path.startswith(ASSETS_DIR + "/")]
+    # CSS ссылается на шрифты, поэтому хэшируем его последним — уже с переписанными ссылками
+    assets.sort(key=lambda path: path.endswith(".css"))
+
+    manifest: dict[str, str] = {}
+    outputs: dict[str, bytes] = {}
+    for path in assets:
+        with open(os.path.join(source_dir, path), "rb") as f:
+            data = f.read()
+        if path.endswith(".css"):
+            data = _rewrite_css(data.decode("utf-8"), path, manifest).encode("utf-8")
+        hashed = _hashed_name(path, data)
+        manifest[path] = hashed
+        outputs[hashed] = data
+
+    for path in files:
+        if path in manifest:
+            continue
+        with open(os.path.join(source_dir, path), "rb") as f:
+            data = f.read()
+        if path.endswith(".html"):
+            data = _rewrite_html(data.decode("utf-8"), path, manifest).encode("utf-8")
+        outputs[path] = data
+
+    # Собираем во временную папку и подменяем целиком, чтобы не раздавать полусобранное
+    parent = os.path.dirname(os.path.abspath(build_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = f"{build_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    for path, data in outputs.items():
+        _write(os.path.join(tmp_dir, path), data)
+    result = {"sources": digest, "assets": manifest}
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    old_dir = f"{build_dir}.old-{os.getpid()}"
+    try:
+        if os.path.exists(build_dir):
+            os.replace(build_dir, old_dir)
+        os.replace(tmp_dir, build_dir)
+    except OSError:
+        # Параллельно собирал другой воркер — его результат ничем не хуже
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    logger.info(f"📦 Статика собрана в {build_dir}: файлов с хэшем {len(manifest)}")
+    return result
+
+
+def load_manifest(build_dir: str) -> dict | None:
+    try:
+        with open(os.path.join(build_dir, MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def prepare(source_dir: str, build_dir: str, enabled: bool = True) -> str:
+    """
+    Возвращает папку, которую надо раздавать: собранную статику,
+    а если сборка выключена или не удалась — исходную папку как есть.
+    """
+    global served_directory
+    served_directory = source_dir
+    if not enabled:
+        return source_dir
+    try:
+        build(source_dir, build_dir)
+    except Exception as e:
+        logger.error(f"❌ Не удалось собрать статику, раздаём исходники: {e}")
+        return source_dir
+    served_directory = build_dir
+    return build_dir
+
+
+# --- Раздача ---
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles, который отдаёт заранее сжатые копии (.br/.gz) по Accept-Encoding
+    и ставит кэш-заголовки: файлы с хэшем в имени — immutable, остальные — no-cache.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        manifest = load_manifest(str(self.directory)) if self.directory else None
+        self.immutable_paths = set(manifest["assets"].values()) if manifest else set()
+
+    def _cache_control(self, path: str) -> str:
+        return IMMUTABLE_CACHE if path.replace(os.sep, "/") in self.immutable_paths else REVALIDATE_CACHE
+
+    async def _compressed_response(self, path: str, scope: Scope) -> Response | None:
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        if not accept_encoding:
+            return None
+        for encoding, suffix in ENCODINGS:
+            if not http_cache.accepts_encoding(accept_encoding, encoding):
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+            if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+                continue
+            response = self.file_response(full_path, stat_result, scope)
+            if response.status_code != 304:
+                media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+                if media_type.startswith("text/") or media_type in ("application/javascript", "application/json"):
+                    media_type += "; charset=utf-8"
+                response.headers["Content-Type"] = media_type
+            response.headers["Content-Encoding"] = encoding
+            return response
+        return None
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = None
+        if scope["method"] in ("GET", "HEAD"):
+            response = await self._compressed_response(path, scope)
+        if response is None:
+            response = await super().get_response(path, scope)
+        if os.path.splitext(path)[1] in COMPRESSIBLE_EXTENSIONS:
+            response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = self._cache_control(path)
+        return response
+
+
+if __name__ == "__main__":
+    # python static_assets.py [исходная папка] [папка сборки]
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    source = sys.argv[1] if len(sys.argv) > 1 else "data"
+    target = sys.argv[2] if len(sys.argv) > 2 else "build/course"
+    built = build(source, target, force=True)
+    for original, hashed in built["assets"].items():
+        print(f"{original} -> {hashed}")
@@ -0,0 +1,12 @@
+import os
+import sys
+
+# Настройки читаются при импорте модулей API; живая NocoDB тестам не нужна
+os.environ.setdefault("NOCODB_URL", "http://nocodb.test")
+os.environ.setdefault("NOCODB_API_TOKEN", "test")
+os.environ.setdefault("STATIC_BUILD_ON_STARTUP", "false")
+os.environ.setdefault("TRACE_LOG_REQUESTS", "false")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
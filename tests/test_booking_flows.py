@@ -0,0 +1,267 @@
+"""
+Допуск броней, снимки дня и ETag поверх локальной замены NocoDB (benchmarks/fake_nocodb.py).
+"""
+import datetime
+
+import httpx
+import pytest
+
+import booking_admission
+import day_cache
+import fake_nocodb
+import main
+import member_cache
+import nocodb_client
+
+pytestmark = pytest.mark.anyio
+
+BOOKINGS = nocodb_client.BOOKINGS_TABLE_ID
+DAY = (datetime.date.today() + datetime.timedelta(days=3)).strftime("%d.%m.%Y")
+PAST_DAY = (datetime.date.today() - datetime.timedelta(days=1)).strftime("%d.%m.%Y")
+
+
+class ShortBulkReply(httpx.AsyncBaseTransport):
+    """NocoDB, которая записывает все строки bulk-запроса, но подтверждает только первую."""
+
+    def __init__(self, app):
+        self.inner = httpx.ASGITransport(app)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self.inner.handle_async_request(request)
+        if request.method != "POST":
+            return response
+        await response.aread()
+        created = response.json()
+        if not isinstance(created, list):
+            return response
+        return httpx.Response(response.status_code, json=created[:1], request=request)
+
+
+class ReadsDown(httpx.AsyncBaseTransport):
+    """NocoDB, которая отвечает 500 на все чтения, но принимает записи."""
+
+    def __init__(self, app):
+        self.inner = httpx.ASGITransport(app)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            return httpx.Response(500, json={"msg": "down"}, request=request)
+        return await self.inner.handle_async_request(request)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def _reset_day_cache():
+    day_cache._cache.clear()
+    day_cache._inflight.clear()
+    day_cache._dirty_while_loading.clear()
+    member_cache._abonements.clear()
+
+
+@pytest.fixture
+def fake_db():
+    db = fake_nocodb.FakeNocoDB()
+    for table_id in fake_nocodb.ALL_TABLES:
+        db.ensure_table(table_id)
+    return db
+
+
+async def _connect(transport: httpx.AsyncBaseTransport):
+    await nocodb_client.close_client()
+    await nocodb_client.open_client(transport)
+    _reset_day_cache()
+
+
+@pytest.fixture
+async def nocodb(fake_db):
+    await _connect(httpx.ASGITransport(fake_nocodb.create_app(fake_db)))
+    yield fake_db
+    await nocodb_client.close_client()
+    _reset_day_cache()
+
+
+def _add(db, start: str, end: str, telegram_id: str = "100000", **fields) -> dict:
+    return db.insert(BOOKINGS, {
+        "Telegram": f"@user{telegram_id}",
+        "Дата посещения": DAY,
+        "Время начала": start,
+        "Время конца": end,
+        "Оборудование": None,
+        "Что будет делать": "",
+        "Telegram ID": telegram_id,
+        **fields,
+    })
+
+
+def _record(start: str, end: str, telegram_id: str = "1") -> dict:
+    return {
+        "Telegram": "@new",
+        "Дата посещения": DAY,
+        "Время начала": start,
+        "Время конца": end,
+        "Оборудование": None,
+        "Что будет делать": "",
+        "Telegram ID": telegram_id,
+    }
+
+
+def _fill(db, start: str, end: str) -> None:
+    for user in fake_nocodb.user_ids(booking_admission.booking_logic.TOTAL_SPOTS):
+        _add(db, start, end, telegram_id=user)
+
+
+# --- Допуск ---
+
+async def test_admission_rejects_full_slot_and_admits_free_one(nocodb):
+    _fill(nocodb, "12:00:00", "14:00:00")
+    count = len(nocodb.table(BOOKINGS))
+
+    result = await booking_admission.admit_booking(_record("13:00:00", "14:00:00"), 1.0)
+    assert result.status == booking_admission.NO_CAPACITY
+    assert result.max_duration == 0.0
+    assert len(nocodb.table(BOOKINGS)) == count
+
+    result = await booking_admission.admit_booking(_record("14:00:00", "15:00:00"), 1.0)
+    assert result.status == booking_admission.ADMITTED
+    assert nocodb.table(BOOKINGS)[result.booking_id]["Время начала"] == "14:00:00"
+
+
+async def test_admission_fails_without_inserting_when_reads_are_down(fake_db):
+    _fill(fake_db, "12:00:00", "14:00:00")
+    count = len(fake_db.table(BOOKINGS))
+    await _connect(ReadsDown(fake_nocodb.create_app(fake_db)))
+    try:
+        result = await booking_admission.admit_booking(_record("12:00:00", "13:00:00"), 1.0)
+        assert result.status == booking_admission.FAILED
+        results = await booking_admission.admit_bookings_bulk([_record("12:00:00", "13:00:00")], 1.0)
+        assert [r.status for r in results] == [booking_admission.FAILED]
+        assert len(fake_db.table(BOOKINGS)) == count
+        # Неудачная загрузка не должна остаться в кэше
+        assert day_cache._cache.get(DAY) is None
+    finally:
+        await nocodb_client.close_client()
+        _reset_day_cache()
+
+
+async def test_zero_length_bookings_do_not_take_spots(nocodb):
+    _fill(nocodb, "12:00:00", "12:00:00")
+    result = await booking_admission.admit_booking(_record("12:00:00", "13:00:00"), 1.0)
+    assert result.status == booking_admission.ADMITTED
+
+
+async def test_bookings_past_midnight_take_spots_until_close(nocodb):
+    _fill(nocodb, "21:00:00", "01:00:00")
+    result = await booking_admission.admit_booking(_record("21:00:00", "22:00:00"), 1.0)
+    assert result.status == booking_admission.NO_CAPACITY
+    result = await booking_admission.admit_booking(_record("20:00:00", "21:00:00"), 1.0)
+    assert result.status == booking_admission.ADMITTED
+
+
+# --- Пакетная запись ---
+
+def _abonement(db, telegram_id: str, days_left: int = 30) -> None:
+    ends_on = datetime.date.today() + datetime.timedelta(days=days_left)
+    db.insert(nocodb_client.ABONEMENTS_TABLE_ID, {
+        "Telegram ID": telegram_id,
+        "Тип": "Безлимит",
+        "Дата окончания": ends_on.strftime("%d.%m.%Y"),
+        "Осталось дней": days_left,
+    })
+
+
+async def _post_bulk(telegram_id: str, **fields) -> dict:
+    payload = {
+        "telegram_id": telegram_id,
+        "telegram": "@new",
+        "fullname": "New",
+        "start_time": "12:00",
+        "duration_hours": 1,
+        **fields,
+    }
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(main.app), base_url="http://test") as client:
+        response = await client.post("/api/v1/bookings/bulk", json=payload)
+    return response.json()
+
+
+def _statuses(reply: dict) -> dict:
+    return {booking["date"]: booking["status"] for booking in reply["bookings"]}
+
+
+async def test_bulk_rejects_past_dates_and_dates_past_the_abonement(nocodb):
+    _abonement(nocodb, "1", days_left=10)
+    far_day = (datetime.date.today() + datetime.timedelta(days=40)).strftime("%d.%m.%Y")
+
+    reply = await _post_bulk("1", dates=[PAST_DAY, DAY, far_day])
+
+    assert reply["status"] == "partial"
+    assert _statuses(reply) == {
+        PAST_DAY: booking_admission.REJECTED,
+        DAY: booking_admission.ADMITTED,
+        far_day: booking_admission.REJECTED,
+    }
+    assert [b["Дата посещения"] for b in nocodb.table(BOOKINGS).values()] == [DAY]
+
+
+async def test_bulk_without_abonement_inserts_nothing(nocodb):
+    reply = await _post_bulk("999", dates=[DAY], recurrence={"start_date": DAY, "count": 3, "interval_days": 7})
+
+    assert reply["status"] == "error"
+    assert set(_statuses(reply).values()) == {booking_admission.REJECTED}
+    assert not nocodb.table(BOOKINGS)
+
+
+async def test_bulk_short_reply_is_resolved_by_rereading_dates(fake_db):
+    dates = [(datetime.date.today() + datetime.timedelta(days=d)).strftime("%d.%m.%Y") for d in (2, 3, 4)]
+    await _connect(ShortBulkReply(fake_nocodb.create_app(fake_db)))
+    try:
+        results = await booking_admission.admit_bookings_bulk(
+            [{**_record("12:00:00", "13:00:00"), "Дата посещения": date_str} for date_str in dates], 1.0
+        )
+    finally:
+        await nocodb_client.close_client()
+        _reset_day_cache()
+
+    created = {b["Дата посещения"]: b_id for b_id, b in fake_db.table(BOOKINGS).items()}
+    assert [r.status for r in results] == [booking_admission.ADMITTED] * 3
+    assert [r.booking_id for r in results] == [created[date_str] for date_str in dates]
+
+
+# --- Сверка снимков ---
+
+async def test_reconcile_after_local_write_picks_up_admin_edit(nocodb):
+    edited = _add(nocodb, "12:00:00", "13:00:00")
+    result = await booking_admission.admit_booking(_record("15:00:00", "16:00:00"), 1.0)
+    assert result.status == booking_admission.ADMITTED
+    assert day_cache._cache.get(DAY).local_writes == 1
+
+    # Админ правит бронь в NocoDB: число записей то же, что и в нашем снимке
+    nocodb.update(BOOKINGS, {"Id": edited["Id"], "Время конца": "18:00:00"})
+    await day_cache.reconcile()
+
+    snapshot = day_cache._cache.get(DAY)
+    assert snapshot.local_writes == 0
+    assert {b["Id"]: b["Время конца"] for b in snapshot.bookings}[edited["Id"]] == "18:00:00"
+    assert booking_admission.booking_logic.get_max_duration("12:00", snapshot.timeline) > 0
+
+
+# --- ETag списка броней ---
+
+async def test_daily_bookings_etag_changes_after_eviction(nocodb):
+    _add(nocodb, "12:00:00", "13:00:00")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(main.app), base_url="http://test") as client:
+        response = await client.get("/api/v1/daily_bookings", params={"date": DAY})
+        etag = response.headers["etag"]
+        response = await client.get("/api/v1/daily_bookings", params={"date": DAY}, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+        # Бронь появилась в обход API, а дата выпала из кэша и загрузится заново
+        _add(nocodb, "15:00:00", "16:00:00", telegram_id="100001")
+        day_cache.invalidate(DAY)
+
+        response = await client.get("/api/v1/daily_bookings", params={"date": DAY}, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert "@user100001" in response.json()["result"]
@@ -0,0 +1,100 @@
+"""
+Эндпоинты курса поверх локальной замены NocoDB (benchmarks/fake_nocodb.py).
+"""
+import httpx
+import pytest
+
+import fake_nocodb
+import lesson_catalog
+import main
+import nocodb_client
+import progress_cache
+
+pytestmark = pytest.mark.anyio
+
+PROGRESS = nocodb_client.PROGRESS_TABLE_ID
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def _reset():
+    lesson_catalog._catalog = None
+    progress_cache._progress._cache.clear()
+
+
+@pytest.fixture
+async def nocodb():
+    db = fake_nocodb.FakeNocoDB()
+    for table_id in fake_nocodb.ALL_TABLES:
+        db.ensure_table(table_id)
+    for lesson in fake_nocodb.generate_lessons(6, 2):
+        db.insert(nocodb_client.LESSONS_TABLE_ID, lesson)
+    await nocodb_client.close_client()
+    await nocodb_client.open_client(httpx.ASGITransport(fake_nocodb.create_app(db)))
+    _reset()
+    yield db
+    await nocodb_client.close_client()
+    _reset()
+
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(main.app), base_url="http://test") as client:
+        yield client
+
+
+def _progress_ids(db, telegram_id: str) -> list[int]:
+    return [record_id for record_id, record in db.table(PROGRESS).items() if record.get("Telegram ID") == telegram_id]
+
+
+async def test_complete_without_progress_record_is_an_error(nocodb, client):
+    response = await client.post("/api/v1/course/complete", json={"telegram_id": "777", "lesson_slug": "lesson-1"})
+
+    assert response.json()["status"] == "error"
+    assert _progress_ids(nocodb, "777") == []
+
+
+async def test_complete_links_lesson_for_existing_progress(nocodb, client):
+    progress = nocodb.insert(PROGRESS, {"Telegram ID": "5", "Access Blocks": "1"})
+
+    response = await client.post("/api/v1/course/complete", json={"telegram_id": "5", "lesson_slug": "lesson-2"})
+
+    assert response.json() == {"status": "success"}
+    linked = nocodb.linked_records(nocodb_client.COMPLETED_LESSONS_LINK_ID, progress["Id"])
+    assert [lesson.get("Slug") for lesson in linked] == ["lesson-2"]
+
+
+def test_lessons_in_blocks_keeps_catalog_order():
+    lessons = [{"Id": i, "Slug": f"l{i}", "Block ID": block} for i, block in enumerate(["1", "2", "1", "3", "2"])]
+    catalog = lesson_catalog.LessonCatalog(lessons)
+
+    assert [lesson["Id"] for lesson in catalog.lessons_in_blocks(["2", "1"])] == [0, 1, 2, 4]
+    assert catalog.lessons_in_blocks(["9"]) == []
+
+
+async def test_bad_lessons_payload_keeps_previous_catalog(nocodb, monkeypatch):
+    catalog = await lesson_catalog.get_catalog()
+
+    async def broken(raise_errors=False):
+        raise KeyError("Id")
+
+    monkeypatch.setattr(nocodb_client, "get_all_lessons", broken)
+    assert await lesson_catalog.refresh() is catalog
+
+    lesson_catalog._catalog = None
+    assert await lesson_catalog.get_catalog() is None
+
+
+@pytest.mark.parametrize("params", [{}, {"telegram_id": "5"}])
+async def test_course_page_answers_304_with_and_without_telegram_id(nocodb, client, params):
+    nocodb.insert(PROGRESS, {"Telegram ID": "5", "Access Blocks": "1"})
+
+    response = await client.get("/course/", params=params)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    response = await client.get("/course/", params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 304
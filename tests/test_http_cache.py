@@ -0,0 +1,31 @@
+import httpx
+import pytest
+
+import http_cache
+import main
+
+
+@pytest.mark.parametrize("header, encoding, accepted", [
+    ("gzip, br", "gzip", True),
+    ("gzip;q=0", "gzip", False),
+    ("br;q=1.0, gzip;q=0", "br", True),
+    ("br;q=1.0, gzip;q=0", "gzip", False),
+    ("GZIP; Q=0.5", "gzip", True),
+    ("*", "br", True),
+    ("*;q=0, gzip", "br", False),
+    ("*, gzip;q=0", "gzip", False),
+    ("deflate", "gzip", False),
+    ("", "gzip", False),
+])
+def test_accepts_encoding(header, encoding, accepted):
+    assert http_cache.accepts_encoding(header, encoding) is accepted
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+@pytest.mark.parametrize("header, compressed", [("gzip", True), ("gzip;q=0", False)])
+async def test_gzip_middleware_honours_q_zero(anyio_backend, header, compressed):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(main.app), base_url="http://test") as client:
+        response = await client.get("/openapi.json", headers={"Accept-Encoding": header})
+    assert response.status_code == 200
+    assert (response.headers.get("content-encoding") == "gzip") is compressed
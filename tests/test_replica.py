@@ -0,0 +1,77 @@
+import httpx
+import pytest
+
+import fake_nocodb
+import nocodb_client
+import replica
+from config import settings
+
+pytestmark = pytest.mark.anyio
+
+BOOKINGS = nocodb_client.BOOKINGS_TABLE_ID
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def synced(tmp_path, monkeypatch):
+    """Реплика во временном файле, полностью синхронизированная с заполненной заменой NocoDB."""
+    db = fake_nocodb.seed(fake_nocodb.FakeNocoDB(), seed_value=3, users=20, days=5, bookings_per_day=(3, 6))
+    fake = fake_nocodb.create_app(db)
+    monkeypatch.setattr(settings, "REPLICA_PATH", str(tmp_path / "replica.sqlite3"))
+    await nocodb_client.close_client()
+    await nocodb_client.open_client(httpx.ASGITransport(fake))
+    replica._db = replica._open()
+    await replica.sync_once(full=True)
+    yield db, fake
+    await replica.stop()
+    await nocodb_client.close_client()
+
+
+def _replica_ids() -> set[int]:
+    return {record["Id"] for record in replica.find(BOOKINGS)}
+
+
+async def test_list_record_ids_pages_by_id(synced, monkeypatch):
+    db, fake = synced
+    monkeypatch.setattr(nocodb_client, "MAX_PAGE_SIZE", 7)
+    assert await nocodb_client.list_record_ids(BOOKINGS) == sorted(db.table(BOOKINGS))
+
+
+async def test_deletion_sweep_removes_deleted_records(synced):
+    db, fake = synced
+    victim = next(iter(db.table(BOOKINGS)))
+    db.delete(BOOKINGS, victim)
+
+    assert await replica._sync_deletions(BOOKINGS) == 1
+    assert _replica_ids() == set(db.table(BOOKINGS))
+
+
+async def test_deletion_sweep_rechecks_ids_missing_from_listing(synced, monkeypatch):
+    db, fake = synced
+    all_ids = sorted(db.table(BOOKINGS))
+
+    async def listing_with_gap(table_id):
+        # Как будто строка пропала из выдачи (например, сдвиг страниц), но в NocoDB она есть
+        return [record_id for record_id in all_ids if record_id != all_ids[1]]
+
+    monkeypatch.setattr(nocodb_client, "list_record_ids", listing_with_gap)
+    assert await replica._sync_deletions(BOOKINGS) == 0
+    assert _replica_ids() == set(all_ids)
+
+
+async def test_sweep_runs_on_its_own_interval(synced, monkeypatch):
+    db, fake = synced
+    monkeypatch.setattr(settings, "REPLICA_DELETION_SWEEP_SECONDS", 3600.0)
+    victim = next(iter(db.table(BOOKINGS)))
+    db.delete(BOOKINGS, victim)
+
+    await replica.sync_once()
+    assert victim in _replica_ids()
+
+    replica._swept_at[BOOKINGS] = 0.0
+    await replica.sync_once()
+    assert victim not in _replica_ids()
@@ -0,0 +1,161 @@
+"""
+Таймлайн на массивах против прежнего движка (словарь слотов), перенесённого сюда как эталон.
+"""
+import datetime
+import random
+
+import pytest
+
+import booking_logic
+from config import settings
+
+pytestmark = pytest.mark.skipif(
+    (settings.WORKSHOP_OPEN_HOUR, settings.WORKSHOP_CLOSE_HOUR, settings.TIME_STEP_MINUTES) != (10, 22, 30),
+    reason="эталонный движок написан для дня 10–22 с шагом 30 минут",
+)
+
+FUTURE_DAY = datetime.date.today() + datetime.timedelta(days=7)
+WHEEL = booking_logic.POTTERY_WHEEL_NAME
+
+
+# --- Прежний движок (до перехода на Timeline) ---
+
+def _legacy_str_to_time(time_str: str) -> datetime.time:
+    return datetime.datetime.strptime(time_str, "%H:%M:%S").time()
+
+
+def _legacy_timeline(bookings: list, events: list) -> dict:
+    timeline = {}
+    current = datetime.datetime.combine(datetime.date.today(), datetime.time(10))
+    end = datetime.datetime.combine(datetime.date.today(), datetime.time(22))
+    while current < end:
+        timeline[current.time()] = {"people_count": 0, "is_blocked_by_event": False, "pottery_wheels_used": 0}
+        current += datetime.timedelta(minutes=30)
+
+    for event in events:
+        today = datetime.date.today()
+        start_dt = datetime.datetime.combine(today, _legacy_str_to_time(event["Начало"]))
+        end_dt = datetime.datetime.combine(today, _legacy_str_to_time(event["Конец"]))
+        buffer = datetime.timedelta(minutes=30)
+        buffered_start, buffered_end = (start_dt - buffer).time(), (end_dt + buffer).time()
+        for slot_time in timeline:
+            if buffered_start <= slot_time < buffered_end:
+                timeline[slot_time]["is_blocked_by_event"] = True
+
+    for booking in bookings:
+        start, end = _legacy_str_to_time(booking["Время начала"]), _legacy_str_to_time(booking["Время конца"])
+        for slot_time in timeline:
+            if start <= slot_time < end:
+                timeline[slot_time]["people_count"] += 1
+                if booking.get("Оборудование") == WHEEL:
+                    timeline[slot_time]["pottery_wheels_used"] += 1
+    return timeline
+
+
+def _legacy_slot_ok(load: dict, equipment: str | None) -> bool:
+    ok = not load["is_blocked_by_event"] and load["people_count"] < 8
+    if equipment == WHEEL:
+        ok = ok and load["pottery_wheels_used"] < 2
+    return ok
+
+
+def _legacy_start_times(timeline: dict, equipment: str | None) -> list[str]:
+    return [slot.strftime("%H:%M") for slot, load in timeline.items() if _legacy_slot_ok(load, equipment)]
+
+
+def _legacy_max_duration(start: str, timeline: dict, equipment: str | None) -> float:
+    slots = sorted(timeline)
+    index = slots.index(datetime.datetime.strptime(start, "%H:%M").time())
+    minutes = 0
+    for slot in slots[index:]:
+        if not _legacy_slot_ok(timeline[slot], equipment):
+            break
+        minutes += 30
+    return minutes / 60.0
+
+
+# --- Помощники ---
+
+def _hms(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}:00"
+
+
+def _booking(start: int, end: int, wheel: bool = False) -> dict:
+    return {"Время начала": _hms(start), "Время конца": _hms(end), "Оборудование": WHEEL if wheel else None}
+
+
+def _event(start: int, end: int) -> dict:
+    return {"Начало": _hms(start), "Конец": _hms(end)}
+
+
+def _assert_same(bookings: list, events: list) -> None:
+    legacy = _legacy_timeline(bookings, events)
+    timeline = booking_logic.calculate_timeline_load(bookings, events)
+    for equipment in (None, WHEEL):
+        expected = _legacy_start_times(legacy, equipment)
+        assert booking_logic.get_available_start_times(timeline, FUTURE_DAY, equipment) == expected
+        for slot in (s.strftime("%H:%M") for s in legacy):
+            assert booking_logic.get_max_duration(slot, timeline, equipment) == _legacy_max_duration(slot, legacy, equipment)
+
+
+# --- Тесты ---
+
+def test_matches_legacy_engine_on_random_days():
+    rng = random.Random(20261018)
+    for _ in range(500):
+        bookings = []
+        for _ in range(rng.randint(0, 14)):
+            start = rng.randrange(10 * 60, 22 * 60, 15)
+            # Около 10% — записи нулевой длины
+            end = start if rng.random() < 0.1 else min(start + rng.randrange(15, 240, 15), 23 * 60 + 45)
+            bookings.append(_booking(start, end, wheel=rng.random() < 0.3))
+        events = []
+        for _ in range(rng.randint(0, 2)):
+            # Буфер мероприятия не должен переходить через полночь: прежний движок такие не учитывал
+            start = rng.randrange(30, 23 * 60, 15)
+            events.append(_event(start, rng.randrange(start, 23 * 60 + 30, 15)))
+        _assert_same(bookings, events)
+
+
+def test_zero_length_bookings_take_no_slots():
+    bookings = [_booking(12 * 60, 12 * 60) for _ in range(8)]
+    _assert_same(bookings, [])
+    timeline = booking_logic.calculate_timeline_load(bookings, [])
+    assert len(booking_logic.get_available_start_times(timeline, FUTURE_DAY)) == timeline.size
+
+
+def test_zero_length_booking_applied_in_place_takes_no_slots():
+    timeline = booking_logic.calculate_timeline_load([], [])
+    for _ in range(8):
+        timeline.apply_booking(_booking(12 * 60, 12 * 60))
+    assert booking_logic.get_max_duration("10:00", timeline) == 12.0
+
+
+def test_zero_length_event_blocks_its_buffer_like_before():
+    _assert_same([], [_event(15 * 60, 15 * 60)])
+
+
+def test_booking_past_midnight_occupies_slots_until_close():
+    # Прежний движок молча пропускал такие записи; теперь конец раньше начала — это следующие сутки
+    bookings = [_booking(21 * 60, 60) for _ in range(8)]
+    timeline = booking_logic.calculate_timeline_load(bookings, [])
+    times = booking_logic.get_available_start_times(timeline, FUTURE_DAY)
+    assert times[-1] == "20:30"
+    assert booking_logic.get_max_duration("20:00", timeline) == 1.0
+
+
+def test_event_buffer_past_midnight_blocks_until_close():
+    timeline = booking_logic.calculate_timeline_load([], [_event(21 * 60 + 30, 23 * 60 + 50)])
+    assert booking_logic.get_available_start_times(timeline, FUTURE_DAY)[-1] == "20:30"
+
+
+def test_in_place_updates_match_full_recalculation():
+    rng = random.Random(7)
+    bookings = [_booking(s, s + rng.randrange(30, 180, 30), rng.random() < 0.3) for s in range(600, 1200, 45)]
+    timeline = booking_logic.calculate_timeline_load([], [])
+    for booking in bookings:
+        timeline.apply_booking(booking)
+    timeline.apply_booking(bookings[0], -1)
+    expected = booking_logic.calculate_timeline_load(bookings[1:], [])
+    assert list(timeline.people) == list(expected.people)
+    assert list(timeline.wheels) == list(expected.wheels)
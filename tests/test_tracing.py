@@ -0,0 +1,40 @@
+import logging
+
+import httpx
+import pytest
+
+import main
+import tracing
+from config import settings
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def summaries(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "TRACE_LOG_REQUESTS", True)
+    caplog.set_level(logging.INFO, logger=tracing.logger.name)
+    return lambda: [record.getMessage() for record in caplog.records if record.getMessage().startswith("🧭")]
+
+
+async def _get(path: str) -> httpx.Response:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(main.app), base_url="http://test") as client:
+        return await client.get(path)
+
+
+async def test_static_asset_writes_no_trace_line(summaries):
+    response = await _get("/course/assets/css/styles.css")
+    assert response.status_code == 200
+    assert summaries() == []
+
+
+async def test_api_request_writes_trace_line(summaries):
+    response = await _get("/")
+    assert "server-timing" in response.headers
+    assert len(summaries()) == 1
+    assert "route=/ " in summaries()[0]
@@ -0,0 +1,225 @@
+"""
+Трассировка запросов к API: какие вызовы NocoDB сделал конкретный запрос и сколько они заняли.
+
+Трасса живёт в contextvars, поэтому видна во всех корутинах запроса, включая параллельные
+(gather копирует контекст в задачи). Для каждого запроса:
+  * заголовок Server-Timing (видно в DevTools браузера и в curl -v);
+  * одна строка-сводка в лог (key=value);
+  * если запрос дольше TRACE_SLOW_REQUEST_MS — в лог выводится всё дерево вызовов.
+"""
+import logging
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from starlette.staticfiles import StaticFiles
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Больше узлов в одну трассу не пишем (защита от циклов по сотне дат и т. п.)
+MAX_SPANS = 500
+# Запросы, которые не трассируем: их слишком много и они не ходят в NocoDB
+SKIP_PATHS = {"/metrics"}
+
+
+class Span:
+    __slots__ = ("name", "start", "duration", "attrs", "children")
+
+    def __init__(self, name: str, start: float, attrs: dict | None = None):
+        self.name = name
+        self.start = start          # секунд от начала запроса
+        self.duration = 0.0
+        self.attrs = attrs or {}
+        self.children: list[Span] = []
+
+
+class Trace:
+    __slots__ = ("trace_id", "started", "root", "nocodb", "spans")
+
+    def __init__(self, name: str):
+        self.trace_id = secrets.token_hex(4)
+        self.started = time.perf_counter()
+        self.root = Span(name, 0.0)
+        self.nocodb: list[Span] = []
+        self.spans = 1
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def add(self, parent: Span | None, node: Span) -> bool:
+        if self.spans >= MAX_SPANS:
+            return False
+        self.spans += 1
+        (parent or self.root).children.append(node)
+        return True
+
+
+_trace: ContextVar[Trace | None] = ContextVar("trace", default=None)
+_parent: ContextVar[Span | None] = ContextVar("trace_parent", default=None)
+
+
+def current() -> Trace | None:
+    return _trace.get()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Участок кода внутри запроса; вызовы NocoDB внутри него попадут в его детей."""
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+    started = time.perf_counter()
+    node = Span(name, started - trace.started, attrs)
+    if not trace.add(_parent.get(), node):
+        yield None
+        return
+    token = _parent.set(node)
+    try:
+        yield node
+    finally:
+        node.duration = time.perf_counter() - started
+        _parent.reset(token)
+
+
+def add_span(name: str, started: float, **attrs) -> None:
+    """Записывает уже закончившийся участок (started — значение time.perf_counter())."""
+    trace = _trace.get()
+    if trace is None:
+        return
+    node = Span(name, started - trace.started, attrs)
+    node.duration = time.perf_counter() - started
+    trace.add(_parent.get(), node)
+
+
+def record_nocodb(table: str, operation: str, params, status: str, started: float, duration: float, size: int) -> None:
+    """Вызов NocoDB (зовёт nocodb_client._request)."""
+    trace = _trace.get()
+    if trace is None:
+        return
+    where = params.get("where") if isinstance(params, dict) else None
+    node = Span("nocodb", started - trace.started, {
+        "table": table,
+        "op": operation,
+        "where": where,
+        "status": status,
+        "bytes": size,
+    })
+    node.duration = duration
+    if trace.add(_parent.get(), node):
+        trace.nocodb.append(node)
+
+
+# --- Вывод ---
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.1f}"
+
+
+def server_timing(trace: Trace) -> str:
+    """Значение заголовка Server-Timing: всего, NocoDB целиком и по таблицам, ожидание замков."""
+    by_table: dict[str, list] = {}
+    for call in trace.nocodb:
+        entry = by_table.setdefault(call.attrs["table"], [0, 0.0])
+        entry[0] += 1
+        entry[1] += call.duration
+
+    parts = [f"app;dur={_ms(trace.elapsed())}"]
+    if trace.nocodb:
+        total = sum(call.duration for call in trace.nocodb)
+        parts.append(f'nocodb;dur={_ms(total)};desc="{len(trace.nocodb)} calls"')
+        for table, (count, duration) in by_table.items():
+            parts.append(f'nocodb-{table};dur={_ms(duration)};desc="{count}"')
+    lock_wait = sum(node.duration for node in _walk(trace.root) if node.name == "lock_wait")
+    if lock_wait:
+        parts.append(f"lock;dur={_ms(lock_wait)}")
+    return ", ".join(parts)
+
+
+def _walk(node: Span):
+    for child in node.children:
+        yield child
+        yield from _walk(child)
+
+
+def _summary(trace: Trace, method: str, route: str, status: int, total: float) -> str:
+    tables: dict[str, int] = {}
+    for call in trace.nocodb:
+        tables[call.attrs["table"]] = tables.get(call.attrs["table"], 0) + 1
+    errors = sum(1 for call in trace.nocodb if not call.attrs["status"].startswith(("2", "3")))
+    return (
+        f"🧭 trace={trace.trace_id} method={method} route={route} status={status} "
+        f"total_ms={_ms(total)} nocodb_calls={len(trace.nocodb)} "
+        f"nocodb_ms={_ms(sum(call.duration for call in trace.nocodb))} "
+        f"nocodb_bytes={sum(call.attrs['bytes'] for call in trace.nocodb)} "
+        f"nocodb_errors={errors} "
+        f"tables={','.join(f'{table}:{count}' for table, count in tables.items()) or '-'}"
+    )
+
+
+def _format_tree(node: Span, depth: int = 0) -> list[str]:
+    lines = []
+    for child in sorted(node.children, key=lambda span: span.start):
+        attrs = " ".join(
+            f"{key}={str(value)[:200]}" for key, value in child.attrs.items() if value not in (None, "")
+        )
+        lines.append(f"{'  ' * depth}+{_ms(child.start)}ms {_ms(child.duration)}ms {child.name} {attrs}".rstrip())
+        lines.extend(_format_tree(child, depth + 1))
+    return lines
+
+
+# --- Middleware ---
+
+class TracingMiddleware:
+    """Заводит трассу на каждый HTTP-запрос, ставит Server-Timing и пишет сводку в лог."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in SKIP_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(f"{scope['method']} {scope['path']}")
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(trace).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        trace_token = _trace.set(trace)
+        parent_token = _parent.set(None)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _parent.reset(parent_token)
+            _trace.reset(trace_token)
+            trace.root.duration = trace.elapsed()
+            # Статику не логируем: там нет вызовов NocoDB, а файлов на странице много.
+            # Mount не ставит scope["route"], зато роутер кладёт приложение монтирования в endpoint
+            if not isinstance(scope.get("endpoint"), StaticFiles):
+                route = scope.get("route")
+                self._log(trace, scope["method"], getattr(route, "path", None) or scope["path"], status_code)
+
+    @staticmethod
+    def _log(trace: Trace, method: str, route: str, status: int) -> None:
+        total = trace.root.duration
+        if settings.TRACE_LOG_REQUESTS:
+            logger.info(_summary(trace, method, route, status, total))
+        slow_ms = settings.TRACE_SLOW_REQUEST_MS
+        if slow_ms > 0 and total * 1000 >= slow_ms:
+            tree = "\n".join(_format_tree(trace.root))
+            logger.warning(
+                f"🐢 Медленный запрос trace={trace.trace_id} {trace.root.name}: {_ms(total)}ms "
+                f"(порог {slow_ms:g}ms)\n{tree}"
+            )